@@ -0,0 +1,84 @@
+"""Mesure le coût du scan de la bibliothèque au démarrage.
+
+Compare l'ancien `os.listdir` + filtre `.endswith(".mp3")` avec l'index
+persistant (`library.LibraryIndex`) en scan à froid, à chaud et après
+l'ajout de quelques fichiers.
+
+    python benchmarks/bench_library_scan.py --tracks 50000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from library import LibraryIndex
+
+
+def make_folder(root, count):
+    folder = os.path.join(root, "audio")
+    os.makedirs(folder)
+    for i in range(count):
+        with open(os.path.join(folder, f"Artiste {i % 500:03d} - Titre {i:06d}.mp3"), "wb"):
+            pass
+    return folder
+
+
+def timed(label, func, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best * 1000:9.1f} ms  ({len(result)} pistes)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=50000)
+    parser.add_argument("--folder", help="Dossier existant à mesurer (ex. un partage réseau) au lieu d'un dossier synthétique")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-library-")
+    try:
+        folder = args.folder or make_folder(root, args.tracks)
+        db_path = os.path.join(root, "library.db")
+
+        timed("avant : os.listdir + filtre", lambda: [f for f in os.listdir(folder) if f.endswith(".mp3")])
+
+        def cold():
+            index = LibraryIndex(db_path)
+            try:
+                return index.scan(folder, cold=True)
+            finally:
+                index.close()
+
+        def warm():
+            index = LibraryIndex(db_path)
+            try:
+                return index.scan(folder)
+            finally:
+                index.close()
+
+        timed("après : scan à froid (threads)", cold, repeat=1)
+        timed("après : démarrage à chaud (index)", warm)
+
+        if not args.folder:
+            def incremental():
+                for i in range(10):
+                    with open(os.path.join(folder, f"Nouveau {time.perf_counter_ns()}-{i}.mp3"), "wb"):
+                        pass
+                return warm()
+
+            timed("après : démarrage avec 10 ajouts", incremental)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Banc d'essai des chemins critiques de MusicPlayer sur des bibliothèques synthétiques.
+
+Pour chaque taille (1k, 10k, 100k pistes par défaut), crée un dossier audio
+de fichiers vides, un `playlists.json` (ancien format, migré au premier
+lancement) et un `config.json` dans un dossier de travail jetable, puis
+mesure sans affichage (plateforme Qt « offscreen ») : le scan du dossier,
+la construction de la fenêtre, `load_playlists` / `save_playlists`,
+`update_files_combo`, `update_available_tracks_combo`, la sélection d'une
+piste dans la liste et `refresh_all_file_lists`.
+
+Les résultats sont écrits en JSON et deux fichiers peuvent être comparés :
+
+    python benchmarks/bench_player.py --output avant.json
+    python benchmarks/bench_player.py --output apres.json
+    python benchmarks/bench_player.py --compare avant.json apres.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+SMALL_PLAYLISTS = 20
+SMALL_PLAYLIST_SIZE = 50
+# Au-delà de ce rapport (après / avant), la comparaison signale une régression
+REGRESSION_RATIO = 1.10
+
+
+def make_workdir(count, seed=1):
+    """Dossier de travail : musique synthétique, playlists.json et config.json ; retourne son chemin."""
+    workdir = tempfile.mkdtemp(prefix=f"bench-player-{count}-")
+    folder = os.path.join(workdir, "musique")
+    os.makedirs(folder)
+    names = [f"Artiste {i % 500:03d} - Titre {i:06d}.mp3" for i in range(count)]
+    for name in names:
+        with open(os.path.join(folder, name), "wb"):
+            pass
+
+    rng = random.Random(seed)
+    playlists = {"Grande": rng.sample(names, count // 2)}
+    for i in range(SMALL_PLAYLISTS):
+        playlists[f"Playlist {i:02d}"] = rng.sample(names, min(SMALL_PLAYLIST_SIZE, count))
+    with open(os.path.join(workdir, "playlists.json"), "w", encoding="utf-8") as f:
+        json.dump(playlists, f, ensure_ascii=False)
+    # Pas d'analyse de sonie : ses processus de fond fausseraient les mesures
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({"audio_folder_path": folder, "shuffle_seed": 1, "loudness_normalization": False}, f)
+    return workdir
+
+
+def measure(func, repeat, setup=None):
+    """Temps (ms) de `func()` sur `repeat` essais : meilleur et médian."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"best_ms": round(min(timings), 3), "median_ms": round(statistics.median(timings), 3), "runs": repeat}
+
+
+def bench_size(count, repeat):
+    import main
+    from library import LibraryIndex
+
+    workdir = make_workdir(count)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    results = {}
+    try:
+        folder = os.path.join(workdir, "musique")
+
+        def scan_cold():
+            index = LibraryIndex()
+            try:
+                index.scan(folder, cold=True)
+            finally:
+                index.close()
+
+        def listing_from_index():
+            index = LibraryIndex()
+            try:
+                index.cached(folder)
+            finally:
+                index.close()
+
+        results["scan_cold"] = measure(scan_cold, max(1, repeat // 2))
+        results["init_index_listing"] = measure(listing_from_index, repeat)
+
+        # Première construction : migration de playlists.json, puis suite du démarrage sans tâches de fond
+        players = []
+        results["construct"] = measure(lambda: players.append(main.MusicPlayer()), 1)
+        player = players[-1]
+        results["scan_library_warm"] = measure(player.scan_library, repeat)
+        player.setup_edit_panel()
+        player.load_initial_playlist()
+
+        def load_playlists():
+            # Lecture seule : sans modification, ce second magasin n'ouvre pas le journal
+            store = player.load_playlists()
+            store["Grande"]
+
+        results["load_playlists"] = measure(load_playlists, repeat)
+
+        track = player.all_files_in_folder[0]
+
+        def append_and_save():
+            tracks = player.playlists["Playlist 00"]
+            tracks.append(track)
+            player.playlists.record_append("Playlist 00", track)
+            player.save_playlists()
+
+        results["save_playlists"] = measure(append_and_save, repeat)
+        results["save_playlists_compact"] = measure(player.playlists.compact, repeat)
+
+        # Changement de playlist : la grande, puis « Toutes les pistes »
+        def select(name):
+            player.current_playlist_name = name
+            player.current_playlist_files = player.playlists[name]
+            player.play_queue.set_tracks(player.current_playlist_files)
+
+        for name, key in (("Grande", "playlist"), ("Toutes les pistes", "all_tracks")):
+            results[f"update_files_combo[{key}]"] = measure(player.update_files_combo, repeat,
+                                                             setup=lambda name=name: select(name))
+            results[f"update_available_tracks_combo[{key}]"] = measure(player.update_available_tracks_combo, repeat)
+            results[f"change_playlist[{key}]"] = measure(lambda name=name: player.change_playlist(name), repeat)
+
+        results["select_track_from_row"] = measure(
+            lambda: player.select_track_from_row(len(player.current_playlist_files) // 2), repeat)
+
+        added = []
+
+        def new_track():
+            name = f"Nouveau {len(added):04d}.mp3"
+            with open(os.path.join(folder, name), "wb"):
+                pass
+            added.append(name)
+
+        results["refresh_all_file_lists"] = measure(lambda: player.refresh_all_file_lists(added[-1]), repeat,
+                                                    setup=new_track)
+        player.close()
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def environment():
+    from PyQt6.QtCore import QT_VERSION_STR
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "qt": QT_VERSION_STR, "platform": platform.platform(),
+            "commit": commit, "date": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"avant : {old['environment'].get('commit')}  après : {new['environment'].get('commit')}")
+    regressions = 0
+    for size, operations in new["results"].items():
+        print(f"\n{size} pistes")
+        for name, timing in operations.items():
+            before = old["results"].get(size, {}).get(name)
+            if before is None:
+                print(f"  {name:<42} {'':>10} {timing['median_ms']:10.2f} ms  (nouveau)")
+                continue
+            ratio = timing["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+            flag = ""
+            if ratio > REGRESSION_RATIO:
+                flag = "  ← plus lent"
+                regressions += 1
+            print(f"  {name:<42} {before['median_ms']:10.2f} {timing['median_ms']:10.2f} ms  ×{ratio:.2f}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench_player.json", help="Fichier JSON des résultats")
+    parser.add_argument("--compare", nargs=2, metavar=("AVANT", "APRES"), help="Compare deux fichiers de résultats")
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+
+    report = {"environment": environment(), "results": {}}
+    for count in args.sizes:
+        print(f"{count} pistes...")
+        results = bench_size(count, args.repeat)
+        report["results"][str(count)] = results
+        for name, timing in results.items():
+            print(f"  {name:<42} {timing['best_ms']:10.2f} ms (médiane {timing['median_ms']:.2f})")
+        app.processEvents()
+
+    output = os.path.abspath(args.output)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Résultats : {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Micro-benchmark de la recherche par trigrammes (search.TrigramIndex).
+
+Construit un index sur une bibliothèque synthétique et mesure la latence
+des requêtes (exactes, partielles et avec fautes de frappe).
+
+    python benchmarks/bench_search.py --tracks 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import TrigramIndex
+
+WORDS = [
+    "love", "night", "dream", "fire", "heart", "summer", "rain", "city", "light", "dance",
+    "blue", "wild", "gold", "river", "moon", "shadow", "echo", "storm", "paradise", "ocean",
+    "electric", "midnight", "forever", "broken", "lost", "sky", "remix", "live", "acoustic", "official",
+    "étoile", "soleil", "nuit", "rêve", "amour", "océan", "lumière", "ville", "cœur", "été",
+]
+ARTISTS = [f"{random.Random(i).choice(WORDS).title()} {w.title()}" for i, w in enumerate(WORDS * 12)]
+
+QUERIES = ["midnight", "moon river", "ocean remix", "étoile", "soleil nuit", "paradis", "midnigth",
+           "eletric dance", "lo", "gold storm live", "heart broken acoustic", "zzzz",
+           # Une ou deux lettres : chaque frappe du début d'une recherche
+           "e", "zz", "e l", "s n"]
+
+
+def make_names(count, seed=1):
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4)))
+        names.append(f"{rng.choice(ARTISTS)} - {title} {i}.mp3")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    names = make_names(args.tracks)
+    index = TrigramIndex()
+    start = time.perf_counter()
+    for name in names:
+        index.add(name)
+    print(f"construction de l'index : {(time.perf_counter() - start) * 1000:.0f} ms pour {len(index)} pistes")
+
+    start = time.perf_counter()
+    for i in range(100):
+        index.add(f"Nouvelle piste {i}.mp3")
+    print(f"ajout incrémental       : {(time.perf_counter() - start) * 1000 / 100:.3f} ms par piste")
+
+    print(f"{'requête':<24} {'médiane':>9} {'max':>9}  résultats")
+    worst = 0.0
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = index.search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        worst = max(worst, statistics.median(timings))
+        print(f"{query:<24} {statistics.median(timings):8.2f}ms {max(timings):8.2f}ms  {len(results)}"
+              f"  {results[0] if results else ''}")
+    print(f"pire médiane : {worst:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Test de charge du serveur HTTP de la bibliothèque sur localhost.
+
+Crée une bibliothèque synthétique (fichiers de données aléatoires) dans un
+dossier jetable, lance `server.py` dans un processus à part, puis ouvre
+`--clients` connexions persistantes qui enchaînent chacune `--requests`
+requêtes : surtout des plages (`Range`, comme un lecteur qui avance ou
+cherche), quelques fichiers entiers et quelques listes de pistes. Affiche le
+débit, les latences et la mémoire maximale du serveur (Linux).
+
+    python benchmarks/bench_server.py --clients 200 --requests 50 --output server.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RANGE_SIZE = 64 * 1024
+# Proportions des requêtes : plage, fichier entier, liste des pistes
+MIX = (("range", 0.8), ("full", 0.1), ("tracks", 0.1))
+READ_CHUNK = 64 * 1024
+
+
+def make_library(workdir, count, size_kib, seed=1):
+    folder = os.path.join(workdir, "musique")
+    os.makedirs(folder)
+    rng = random.Random(seed)
+    block = os.urandom(64 * 1024)
+    names = []
+    for i in range(count):
+        name = f"Artiste {i % 37} - Titre {i:05d}.mp3"
+        size = size_kib * 1024 + rng.randrange(1024)
+        with open(os.path.join(folder, name), "wb") as f:
+            for offset in range(0, size, len(block)):
+                f.write(block[:size - offset])
+        names.append((name, size))
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({"audio_folder_path": folder}, f)
+    return names
+
+
+def start_server(workdir, max_connections):
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--port", "0",
+                                "--max-connections", str(max_connections)],
+                               cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if "http://" not in line:
+        process.kill()
+        raise RuntimeError(process.stderr.read().strip() or "le serveur n'a pas démarré")
+    host, port = line.split("http://", 1)[1].split("/", 1)[0].rsplit(":", 1)
+    return process, host, int(port)
+
+
+def peak_rss_kib(pid):
+    """Mémoire résidente maximale du processus (VmHWM), None hors Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def read_response(reader):
+    """(statut, longueur du corps) ; le corps est lu par blocs et jeté."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connexion fermée par le serveur")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    remaining = length
+    while remaining:
+        chunk = await reader.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            raise ConnectionError("corps tronqué")
+        remaining -= len(chunk)
+    return status, length
+
+
+async def client(host, port, names, requests, rng, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            kind = rng.choices([kind for kind, _ in MIX], [weight for _, weight in MIX])[0]
+            headers = ""
+            expected = 200
+            if kind == "tracks":
+                path = "/api/tracks"
+            else:
+                name, size = rng.choice(names)
+                path = "/audio/" + quote(name)
+                if kind == "range":
+                    start = rng.randrange(max(1, size - RANGE_SIZE))
+                    headers = f"Range: bytes={start}-{start + RANGE_SIZE - 1}\r\n"
+                    expected = 206
+            started = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{headers}\r\n".encode("latin-1"))
+            status, length = await read_response(reader)
+            results["latencies"].append((time.perf_counter() - started) * 1000)
+            results["bytes"] += length
+            if status != expected:
+                results["errors"][str(status)] = results["errors"].get(str(status), 0) + 1
+    except (ConnectionError, OSError) as e:
+        results["errors"][type(e).__name__] = results["errors"].get(type(e).__name__, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load(host, port, names, clients, requests, seed):
+    results = {"latencies": [], "bytes": 0, "errors": {}}
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, names, requests, random.Random(rng.random()), results)
+                           for _ in range(clients)))
+    results["elapsed_s"] = time.perf_counter() - started
+    return results
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=200)
+    parser.add_argument("--size-kib", type=int, default=4096, help="Taille moyenne d'un fichier")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=50, help="Requêtes par client")
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-server-") as workdir:
+        names = make_library(workdir, args.tracks, args.size_kib, args.seed)
+        process, host, port = start_server(workdir, args.max_connections)
+        try:
+            idle_rss = peak_rss_kib(process.pid)
+            results = asyncio.run(load(host, port, names, args.clients, args.requests, args.seed))
+            peak_rss = peak_rss_kib(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+
+    latencies = results["latencies"]
+    summary = {
+        "clients": args.clients, "requests": len(latencies), "errors": results["errors"],
+        "requests_per_s": len(latencies) / results["elapsed_s"],
+        "mib_per_s": results["bytes"] / 1024 / 1024 / results["elapsed_s"],
+        "latency_ms": {"p50": percentile(latencies, 0.5), "p90": percentile(latencies, 0.9),
+                       "p99": percentile(latencies, 0.99), "mean": statistics.fmean(latencies) if latencies else 0.0},
+        "server_rss_kib": {"idle": idle_rss, "peak": peak_rss},
+    }
+    print(f"{args.clients} clients × {args.requests} requêtes sur {args.tracks} pistes de ~{args.size_kib} Kio")
+    print(f"  {summary['requests']} requêtes en {results['elapsed_s']:.2f} s : "
+          f"{summary['requests_per_s']:.0f} req/s, {summary['mib_per_s']:.1f} Mio/s")
+    latency = summary["latency_ms"]
+    print(f"  latence : p50 {latency['p50']:.2f} ms, p90 {latency['p90']:.2f} ms, p99 {latency['p99']:.2f} ms")
+    if peak_rss is not None:
+        print(f"  mémoire du serveur : {idle_rss / 1024:.1f} Mio au repos, {peak_rss / 1024:.1f} Mio au maximum")
+    print("  erreurs : " + (", ".join(f"{key} × {value}" for key, value in results["errors"].items()) or "aucune"))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
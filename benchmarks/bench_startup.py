@@ -0,0 +1,156 @@
+"""Mesure du démarrage à froid : imports et délai jusqu'au premier affichage de la fenêtre.
+
+Chaque essai lance un nouvel interpréteur (`-X importtime`, plateforme Qt
+« offscreen ») dans un dossier de travail jetable, sur une bibliothèque
+synthétique. Le premier essai part d'un index vide (premier lancement), les
+suivants réutilisent l'index. Affiche les imports les plus coûteux faits avant
+le premier affichage et vérifie que yt-dlp et QtMultimedia n'en font pas partie.
+
+    python benchmarks/bench_startup.py --tracks 10000 --runs 5 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Séparateur écrit sur stderr au premier affichage, entre les lignes de -X importtime
+PAINT_MARKER = "--- premier affichage ---"
+# Modules qui ne doivent pas être chargés avant le premier affichage
+DEFERRED_MODULES = ("yt_dlp", "PyQt6.QtMultimedia")
+
+
+def make_library(workdir, count):
+    folder = os.path.join(workdir, "musique")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(folder, f"Artiste {i % 97} - Titre {i:06d}.mp3"), "wb"):
+            pass
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({"audio_folder_path": folder, "shuffle_seed": 1}, f)
+
+
+def child(workdir):
+    """Exécuté dans l'interpréteur mesuré : démarre la fenêtre et rapporte les temps."""
+    started = time.time()
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    times = {}
+
+    import main
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+    times["import_main"] = time.time()
+
+    app = QApplication(sys.argv[:1])
+    player = main.MusicPlayer()
+    times["constructed"] = time.time()
+
+    def on_first_paint():
+        times["first_paint"] = time.time()
+        loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+        times["deferred_loaded_before_paint"] = loaded
+        print(PAINT_MARKER, file=sys.stderr, flush=True)
+        # finish_startup est déjà en file : ce minuteur passe juste après lui
+        QTimer.singleShot(0, on_ready)
+
+    def on_ready():
+        times["ready"] = time.time()
+        player.close()
+        app.quit()
+
+    player.first_painted.connect(on_first_paint)
+    player.show()
+    app.exec()
+    times["child_started"] = started
+    print(json.dumps(times))
+
+
+def parse_importtime(stderr, max_depth=2):
+    """[(cumulé en ms, module)] des imports faits avant le premier affichage.
+
+    L'indentation de -X importtime donne la profondeur : 1 pour un import de
+    premier niveau (dont `main`), 2 pour ce que `main` importe directement.
+    """
+    before_paint = stderr.split(PAINT_MARKER, 1)[0]
+    imports = []
+    for line in before_paint.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if cumulative.strip().isdigit() and depth <= max_depth:
+            imports.append((int(cumulative) / 1000, name.strip()))
+    return imports
+
+
+def run_once(workdir):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    launched = time.time()
+    result = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", workdir],
+                            capture_output=True, text=True, env=env, cwd=workdir)
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "échec du lancement")
+    times = json.loads(lines[-1])
+    return {
+        "interpreter_ms": (times["child_started"] - launched) * 1000,
+        "import_main_ms": (times["import_main"] - times["child_started"]) * 1000,
+        "construct_ms": (times["constructed"] - times["import_main"]) * 1000,
+        "first_paint_ms": (times["first_paint"] - launched) * 1000,
+        "ready_ms": (times["ready"] - launched) * 1000,
+        "deferred_loaded_before_paint": times["deferred_loaded_before_paint"],
+        "imports": parse_importtime(result.stderr),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Nombre d'imports les plus lents affichés")
+    parser.add_argument("--output", help="Fichier JSON des résultats (comparable entre deux versions)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+        make_library(workdir, args.tracks)
+        runs = [run_once(workdir) for _ in range(max(2, args.runs))]
+
+    first, warm = runs[0], runs[1:]
+    print(f"{args.tracks} pistes, {len(runs)} lancements (le premier sur un index vide)")
+    print(f"{'':<22} {'1er lancement':>14} {'médiane ensuite':>16}")
+    for key, label in (("interpreter_ms", "interpréteur"), ("import_main_ms", "import de main"),
+                       ("construct_ms", "construction"), ("first_paint_ms", "premier affichage"),
+                       ("ready_ms", "fenêtre prête")):
+        print(f"{label:<22} {first[key]:12.0f}ms {statistics.median(run[key] for run in warm):14.0f}ms")
+
+    print(f"\nImports les plus lents avant le premier affichage (lancement {len(runs)}) :")
+    for cumulative, name in sorted(runs[-1]["imports"], reverse=True)[:args.top]:
+        print(f"    {cumulative:8.1f} ms  {name}")
+    loaded = runs[-1]["deferred_loaded_before_paint"]
+    print("Chargés avant le premier affichage : " + (", ".join(loaded) if loaded else "ni yt_dlp ni QtMultimedia"))
+
+    if args.output:
+        summary = {
+            "tracks": args.tracks,
+            "first_run": {key: value for key, value in first.items() if key != "imports"},
+            "median": {key: statistics.median(run[key] for run in warm)
+                       for key in ("interpreter_ms", "import_main_ms", "construct_ms", "first_paint_ms", "ready_ms")},
+            "deferred_loaded_before_paint": loaded,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
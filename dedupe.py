@@ -0,0 +1,416 @@
+"""Cherche les pistes en double du dossier audio : copies exactes et réencodages.
+
+Les fichiers sont d'abord regroupés par taille puis par empreinte partielle du
+contenu (début + fin) et confirmés par un hachage complet. Les réencodages
+(autre débit, autre format, autre mise en ligne) sont trouvés par une empreinte
+acoustique NumPy, comparée seulement entre pistes de durées voisines. Hachages
+et empreintes sont calculés par un pool de processus et gardés dans la base de
+l'index (clé chemin + mtime).
+
+    python dedupe.py "~/Musique/Audio files fake spotify"
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import multiprocessing
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from library import LIBRARY_DB_FILE, LibraryRoots, tree_bounds
+
+try:
+    import numpy as np
+except ImportError:
+    # Sans NumPy seules les copies exactes sont détectées
+    np = None
+
+FINGERPRINT_AVAILABLE = np is not None
+
+# Octets lus au début et à la fin du fichier pour l'empreinte partielle
+PARTIAL_BYTES = 64 * 1024
+HASH_CHUNK = 1024 * 1024
+# Empreinte acoustique : mono à basse fréquence, trames de 2048 échantillons (≈ 0,37 s)
+FINGERPRINT_RATE = 5512
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+FINGERPRINT_SECONDS = 90
+# 17 bandes logarithmiques de 300 Hz à 2 kHz : 16 bits par trame
+BAND_EDGES_HZ = (300.0, 2000.0)
+BAND_COUNT = 17
+SILENCE_LEVEL = 0.01
+# Seuils de comparaison
+DURATION_TOLERANCE_S = 2.0
+PROFILE_SIMILARITY = 0.98
+MAX_BIT_ERROR_RATE = 0.25
+MAX_OFFSET_FRAMES = 10
+MIN_OVERLAP_FRAMES = 100
+# Fichiers par tâche envoyée au pool
+HASH_BATCH_SIZE = 50
+FINGERPRINT_BATCH_SIZE = 4
+
+EXACT = "identique"
+REENCODED = "réencodage"
+# Dossier (ignoré par l'index : nom en point) où sont déplacés les fichiers en trop, dans leur racine
+QUARANTINE_DIR = ".doublons"
+
+
+# Travail exécuté dans les processus du pool
+
+def partial_hash(path, size):
+    """Hachage de la taille, du début et de la fin du fichier : deux lectures, quelle que soit la taille."""
+    digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_BYTES))
+        if size > 2 * PARTIAL_BYTES:
+            f.seek(-PARTIAL_BYTES, os.SEEK_END)
+            digest.update(f.read(PARTIAL_BYTES))
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_batch(items, full):
+    """Hachages (partiels ou complets) d'un lot de (chemin, taille)."""
+    results = []
+    for path, size in items:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            results.append((path, mtime, full_hash(path) if full else partial_hash(path, size)))
+        except OSError:
+            continue  # Fichier disparu entre-temps
+    return results
+
+
+def _decode(path):
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-vn",
+               "-ac", "1", "-ar", str(FINGERPRINT_RATE), "-f", "f32le", "-"]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or "décodage impossible")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def compute_fingerprint(samples):
+    """(durée utile en s, profil spectral normé, bits par trame en uint16) d'un signal mono.
+
+    Le silence de début et de fin est retiré : deux mises en ligne du même morceau
+    s'alignent alors à quelques trames près. Chaque bit est le signe de la variation,
+    d'une trame à l'autre, de l'écart d'énergie entre deux bandes voisines.
+    """
+    loud = np.flatnonzero(np.abs(samples) > SILENCE_LEVEL)
+    if not len(loud):
+        return 0.0, None, None
+    samples = samples[loud[0]:loud[-1] + 1]
+    duration = len(samples) / FINGERPRINT_RATE
+    head = samples[:FINGERPRINT_SECONDS * FINGERPRINT_RATE]
+    if len(head) < FRAME_SIZE + HOP_SIZE * 2:
+        return duration, None, None
+
+    frames = np.lib.stride_tricks.sliding_window_view(head, FRAME_SIZE)[::HOP_SIZE] * np.hanning(FRAME_SIZE)
+    power = np.square(np.abs(np.fft.rfft(frames, axis=1)))
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / FINGERPRINT_RATE)
+    edges = np.searchsorted(freqs, np.geomspace(*BAND_EDGES_HZ, BAND_COUNT + 1))
+    energies = np.add.reduceat(power[:, edges[0]:edges[-1]], edges[:-1] - edges[0], axis=1)
+
+    profile = np.log10(energies.mean(axis=0) + 1e-12)
+    profile -= profile.mean()
+    norm = np.linalg.norm(profile)
+    profile = (profile / norm if norm else profile).astype(np.float32)
+
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    packed = (bits * (1 << np.arange(BAND_COUNT - 1))).sum(axis=1).astype(np.uint16)
+    return duration, profile, packed
+
+
+def fingerprint_batch(paths):
+    results = []
+    for path in paths:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            duration, profile, bits = compute_fingerprint(_decode(path))
+        except FileNotFoundError:
+            continue  # Fichier disparu entre-temps (ou FFmpeg absent)
+        except (OSError, RuntimeError, ValueError):
+            # Illisible : enregistré sans empreinte pour ne pas le redécoder à chaque recherche
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            duration, profile, bits = 0.0, None, None
+        results.append((path, mtime, duration,
+                        profile.tobytes() if profile is not None else None,
+                        bits.tobytes() if bits is not None else None))
+    return results
+
+
+# Comparaison
+
+def bit_error_rate(a, b, max_offset=MAX_OFFSET_FRAMES):
+    """Plus faible proportion de bits différents entre deux empreintes, sur quelques décalages."""
+    best = 1.0
+    for offset in range(-max_offset, max_offset + 1):
+        x = a[max(0, offset):]
+        y = b[max(0, -offset):]
+        count = min(len(x), len(y))
+        if count < MIN_OVERLAP_FRAMES:
+            continue
+        errors = np.unpackbits(np.bitwise_xor(x[:count], y[:count]).view(np.uint8)).sum()
+        best = min(best, errors / (16 * count))
+    return best
+
+
+class _Groups:
+    """Union-find sur les chemins : les paires trouvées deviennent des groupes."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+    def groups(self):
+        result = {}
+        for item in self.parent:
+            result.setdefault(self.find(item), []).append(item)
+        return [sorted(group) for group in result.values() if len(group) > 1]
+
+
+class DedupeStore:
+    """Cache des hachages et des empreintes dans la base de l'index, clé chemin + mtime."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS content_hashes (
+                path TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                mtime INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (path, kind)
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                duration REAL NOT NULL,
+                profile BLOB,
+                bits BLOB
+            );
+        """)
+
+    def hashes(self, kind, mtimes):
+        """Hachages encore valables parmi `mtimes` ({chemin: mtime})."""
+        rows = self.conn.execute("SELECT path, mtime, hash FROM content_hashes WHERE kind = ?", (kind,))
+        return {path: value for path, mtime, value in rows if mtimes.get(path) == mtime}
+
+    def store_hashes(self, kind, results):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO content_hashes (path, kind, mtime, hash) VALUES (?, ?, ?, ?)",
+                [(path, kind, mtime, value) for path, mtime, value in results]
+            )
+
+    def fingerprints(self, mtimes):
+        rows = self.conn.execute("SELECT path, mtime, duration, profile, bits FROM fingerprints")
+        return {path: (duration, profile, bits) for path, mtime, duration, profile, bits in rows
+                if mtimes.get(path) == mtime}
+
+    def store_fingerprints(self, results):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (path, mtime, duration, profile, bits) VALUES (?, ?, ?, ?, ?)",
+                results
+            )
+
+
+class DuplicateFinder:
+    """Recherche des doublons d'un dossier déjà indexé (à exécuter hors du thread GUI).
+
+    Ouvre sa propre connexion à la base : une connexion SQLite ne se partage pas entre threads.
+    """
+
+    def __init__(self, db_path=LIBRARY_DB_FILE, workers=None):
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+
+    def find(self, roots):
+        """Retourne [(EXACT ou REENCODED, [noms])] pour les pistes indexées sous les racines `roots`.
+
+        Les doublons sont aussi cherchés d'une racine à l'autre.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            store = DedupeStore(conn)
+            tracks = []
+            for root in roots.paths():
+                tracks += conn.execute("SELECT path, size, mtime FROM tracks WHERE path >= ? AND path < ?",
+                                       tree_bounds(root)).fetchall()
+            mtimes = {path: mtime for path, _, mtime in tracks}
+            with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                exact = self._exact_groups(pool, store, tracks, mtimes)
+                # Un seul représentant par groupe de copies exactes pour la comparaison acoustique
+                duplicates = {path for group in exact for path in group[1:]}
+                reencoded = []
+                if FINGERPRINT_AVAILABLE:
+                    candidates = [path for path, _, _ in tracks if path not in duplicates]
+                    reencoded = self._reencoded_groups(pool, conn, store, candidates, mtimes)
+        finally:
+            conn.close()
+
+        groups = _Groups()
+        for group in exact + reencoded:
+            for path in group[1:]:
+                groups.union(group[0], path)
+        exact_sets = [set(group) for group in exact]
+        result = []
+        for group in groups.groups():
+            kind = EXACT if set(group) in exact_sets else REENCODED
+            result.append((kind, [roots.name_for_path(path) for path in group]))
+        return sorted(result, key=lambda item: item[1][0])
+
+    def _hash_all(self, pool, store, kind, items, mtimes):
+        cached = store.hashes(kind, mtimes)
+        todo = [(path, size) for path, size in items if path not in cached]
+        batches = [todo[i:i + HASH_BATCH_SIZE] for i in range(0, len(todo), HASH_BATCH_SIZE)]
+        for results in pool.map(hash_batch, batches, [kind == "full"] * len(batches)):
+            store.store_hashes(kind, results)
+            cached.update((path, value) for path, _, value in results)
+        return cached
+
+    def _exact_groups(self, pool, store, tracks, mtimes):
+        by_size = {}
+        for path, size, _ in tracks:
+            by_size.setdefault(size, []).append(path)
+        same_size = [(path, size) for size, paths in by_size.items() if len(paths) > 1 for path in paths]
+
+        partial = self._hash_all(pool, store, "partial", same_size, mtimes)
+        by_partial = {}
+        for path, size in same_size:
+            if path in partial:
+                by_partial.setdefault((size, partial[path]), []).append((path, size))
+        suspects = [item for items in by_partial.values() if len(items) > 1 for item in items]
+
+        # Le hachage complet ne sert qu'à confirmer : il n'est lu que pour les collisions
+        full = self._hash_all(pool, store, "full", suspects, mtimes)
+        by_full = {}
+        for path, _ in suspects:
+            if path in full:
+                by_full.setdefault(full[path], []).append(path)
+        return [sorted(paths) for paths in by_full.values() if len(paths) > 1]
+
+    def _reencoded_groups(self, pool, conn, store, candidates, mtimes):
+        # Durées connues par les tags : on n'empreinte que les pistes qui ont une voisine de durée proche
+        rows = conn.execute("SELECT m.path, m.duration_ms FROM metadata m JOIN tracks t "
+                            "ON t.path = m.path AND t.mtime = m.mtime") \
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'metadata'").fetchone() else []
+        tag_durations = {path: duration / 1000 for path, duration in rows if duration}
+        candidates = _near_durations(candidates, tag_durations)
+
+        cached = store.fingerprints(mtimes)
+        todo = [path for path in candidates if path not in cached]
+        batches = [todo[i:i + FINGERPRINT_BATCH_SIZE] for i in range(0, len(todo), FINGERPRINT_BATCH_SIZE)]
+        for results in pool.map(fingerprint_batch, batches):
+            store.store_fingerprints(results)
+            cached.update((path, (duration, profile, bits)) for path, _, duration, profile, bits in results)
+
+        prints = []
+        for path in candidates:
+            duration, profile, bits = cached.get(path, (0.0, None, None))
+            if bits is not None:
+                prints.append((duration, path, np.frombuffer(profile, np.float32), np.frombuffer(bits, np.uint16)))
+        prints.sort(key=lambda item: item[0])
+
+        pairs = []
+        for i, (duration, path, profile, bits) in enumerate(prints):
+            # Fenêtre de durée, puis filtre grossier (profil spectral) avant les bits
+            end = i + 1
+            while end < len(prints) and prints[end][0] - duration <= DURATION_TOLERANCE_S:
+                end += 1
+            if end == i + 1:
+                continue
+            window = prints[i + 1:end]
+            similarity = np.stack([item[2] for item in window]) @ profile
+            for item, score in zip(window, similarity):
+                if score >= PROFILE_SIMILARITY and bit_error_rate(bits, item[3]) <= MAX_BIT_ERROR_RATE:
+                    pairs.append([path, item[1]])
+        return pairs
+
+
+def _near_durations(paths, durations):
+    """Garde les chemins sans durée connue et ceux qui ont une voisine à moins de la tolérance."""
+    known = sorted((durations[path], path) for path in paths if path in durations)
+    keep = {path for path in paths if path not in durations}
+    for i, (duration, path) in enumerate(known):
+        if (i > 0 and duration - known[i - 1][0] <= DURATION_TOLERANCE_S) or \
+                (i + 1 < len(known) and known[i + 1][0] - duration <= DURATION_TOLERANCE_S):
+            keep.add(path)
+    return [path for path in paths if path in keep]
+
+
+def pick_keeper(names, metadata, sizes, protected=None):
+    """Fichier gardé d'un groupe : celui en lecture, sinon le meilleur débit, sinon le plus gros."""
+    if protected in names:
+        return protected
+
+    def score(name):
+        info = metadata.get(name) or {}
+        return (info.get("bitrate") or 0, sizes.get(name, 0), name)
+
+    return max(names, key=score)
+
+
+def quarantine(path, root):
+    """Déplace `path` dans QUARANTINE_DIR de sa racine `root` (même arborescence) ; retourne la destination.
+
+    Rien n'est supprimé : une fusion se défait en remettant le fichier à sa place.
+    """
+    relative = os.path.relpath(path, root)
+    destination = os.path.join(root, QUARANTINE_DIR, relative)
+    stem, extension = os.path.splitext(destination)
+    suffix = 2
+    while os.path.lexists(destination):
+        destination = f"{stem} ({suffix}){extension}"
+        suffix += 1
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    shutil.move(path, destination)
+    return destination
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", help="Dossier audio (déjà indexé par le lecteur)")
+    parser.add_argument("--db", default=LIBRARY_DB_FILE, help="Base de l'index de la bibliothèque")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Processus de calcul")
+    args = parser.parse_args()
+
+    roots = LibraryRoots(os.path.expanduser(args.folder))
+    groups = DuplicateFinder(args.db, max(1, args.jobs)).find(roots)
+    if not groups:
+        print("Aucun doublon.")
+        return 0
+    for kind, names in groups:
+        print(f"[{kind}]")
+        for name in names:
+            print(f"    {name}")
+    print(f"{len(groups)} groupe(s), {sum(len(names) - 1 for _, names in groups)} fichier(s) en trop.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
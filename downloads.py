@@ -0,0 +1,601 @@
+import os
+import json
+import itertools
+import threading
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from playlist_store import atomic_write
+from library import AUDIO_EXTENSIONS
+from instrumentation import metrics
+
+# États possibles d'un téléchargement
+PENDING = "En attente"
+RUNNING = "En cours"
+FINISHED = "Terminé"
+FAILED = "Échec"
+CANCELLED = "Annulé"
+
+DEFAULT_MAX_CONCURRENT = 2
+# Fragments (HLS/DASH) téléchargés en parallèle par chaque téléchargement
+DEFAULT_CONCURRENT_FRAGMENTS = 4
+
+# Vidéos déjà téléchargées (identifiant → infos et fichier produit)
+DOWNLOAD_CACHE_FILE = "downloads_cache.json"
+# File d'attente et imports en cours, rechargés au démarrage suivant
+DOWNLOAD_STATE_FILE = "downloads_state.json"
+# Champs volumineux des infos yt-dlp inutiles une fois le fichier produit
+_HEAVY_INFO_FIELDS = ("formats", "requested_formats", "thumbnails", "subtitles",
+                      "automatic_captions", "heatmap", "requested_downloads")
+
+
+def _yt_dlp():
+    """yt-dlp, importé au premier téléchargement : son import est long et la plupart des sessions n'en font aucun."""
+    import yt_dlp
+    return yt_dlp
+
+
+def is_playlist_url(url):
+    """Vrai pour une URL de playlist seule (une vidéo lue dans une playlist reste une vidéo)."""
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    return parsed.path.rstrip("/").endswith("/playlist") or ("list" in query and "v" not in query)
+
+
+class DownloadCache:
+    """Cache des téléchargements, clé = extracteur + identifiant de la vidéo.
+
+    Les noms réservés sont des noms sans extension : l'extension finale n'est
+    connue qu'après téléchargement en mode format d'origine.
+
+    Garde pour chaque vidéo ses infos yt-dlp (allégées) et le nom du fichier MP3,
+    ainsi que les URL déjà résolues : une URL connue dont le fichier existe encore
+    est servie sans aucun accès réseau. Partagé entre les threads de travail.
+    """
+
+    def __init__(self, path=DOWNLOAD_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._videos = {}
+        self._urls = {}
+        # Noms de fichiers réservés par les téléchargements en cours
+        self._claimed = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._videos = data.get("videos", {})
+                self._urls = data.get("urls", {})
+            except (OSError, ValueError):
+                print(f"Cache de téléchargements illisible, ignoré : {path}")
+
+    @staticmethod
+    def key_of(info):
+        return f"{info.get('extractor_key') or info.get('ie_key') or 'generic'}:{info['id']}"
+
+    def lookup_url(self, url, folder):
+        """Nom du fichier déjà téléchargé pour cette URL, ou None."""
+        with self._lock:
+            key = self._urls.get(url)
+        return self.lookup(key, folder) if key else None
+
+    def lookup(self, key, folder):
+        """Nom du fichier déjà téléchargé pour cette vidéo s'il est encore dans `folder`, ou None."""
+        with self._lock:
+            entry = self._videos.get(key)
+        if entry and os.path.exists(os.path.join(folder, entry["filename"])):
+            return entry["filename"]
+        return None
+
+    def claim(self, stem, key, folder):
+        """Réserve le nom `stem` pour la vidéo `key` ; False s'il appartient à une autre vidéo."""
+        with self._lock:
+            owner = self._claimed.get(stem)
+            if owner is None:
+                owner = next((k for k, entry in self._videos.items()
+                              if os.path.splitext(entry["filename"])[0] == stem), None)
+            if owner is None and any(os.path.exists(os.path.join(folder, stem + ext)) for ext in AUDIO_EXTENSIONS):
+                owner = "?"  # Fichier présent mais d'origine inconnue
+            if owner not in (None, key):
+                return False
+            self._claimed[stem] = key
+            return True
+
+    def release(self, stem):
+        with self._lock:
+            self._claimed.pop(stem, None)
+
+    def add(self, key, url, filename, info):
+        light = {k: v for k, v in info.items() if k not in _HEAVY_INFO_FIELDS}
+        with self._lock:
+            self._videos[key] = {"filename": filename, "info": light}
+            self._urls[url] = key
+            data = json.dumps({"videos": self._videos, "urls": self._urls}, ensure_ascii=False)
+        if self.path:
+            atomic_write(self.path, data.encode("utf-8"))
+
+    def remember_url(self, url, key):
+        with self._lock:
+            self._urls[url] = key
+
+
+class ImportBatch:
+    """Import groupé : les vidéos de plusieurs URL (playlists développées), à ranger dans une playlist.
+
+    `entries[i]` reçoit les URL des vidéos de `sources[i]` une fois la playlist
+    développée ; `outcomes` associe chaque vidéo à son fichier ("" en cas d'échec).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, sources, playlist=None):
+        self.id = next(self._ids)
+        self.sources = list(sources)
+        self.playlist = playlist
+        self.entries = [None] * len(self.sources)
+        self.outcomes = {}
+
+    def urls(self):
+        seen = set()
+        urls = []
+        for entry in self.entries:
+            for url in entry or ():
+                if url not in seen:
+                    seen.add(url)
+                    urls.append(url)
+        return urls
+
+    def is_complete(self):
+        return all(entry is not None for entry in self.entries) and all(url in self.outcomes for url in self.urls())
+
+    def filenames(self):
+        """Fichiers obtenus, dans l'ordre des playlists d'origine."""
+        names = []
+        for url in self.urls():
+            name = self.outcomes.get(url)
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def to_state(self):
+        return {"sources": self.sources, "playlist": self.playlist,
+                "entries": self.entries, "outcomes": self.outcomes}
+
+    @classmethod
+    def from_state(cls, state):
+        batch = cls(state["sources"], state.get("playlist"))
+        batch.entries = state["entries"]
+        batch.outcomes = state["outcomes"]
+        return batch
+
+
+class DownloadJob:
+    """Un téléchargement dans la file : URL, état, progression et résultat.
+
+    Avec `expand_index`, la tâche ne télécharge rien : elle développe la playlist
+    `sources[expand_index]` de l'import `batch` en vidéos.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, batch=None, expand_index=None):
+        self.id = next(self._ids)
+        self.url = url
+        self.batch = batch
+        self.expand_index = expand_index
+        self.status = PENDING
+        self.progress = ""
+        self.filename = None
+        self.error = None
+        # Lu par le thread de travail depuis le hook de progression
+        self.cancel_requested = False
+
+    def describe(self):
+        name = self.filename or self.url
+        details = self.progress if self.status == RUNNING else (self.error or "")
+        text = f"#{self.id} [{self.status}] {name}"
+        return f"{text} — {details}" if details else text
+
+
+class _WorkerSignals(QObject):
+    """Signaux émis depuis les threads de travail (livrés dans le thread GUI)."""
+
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(int, str)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+    expanded = pyqtSignal(int, list, str)
+
+
+class ExpandWorker(QRunnable):
+    """Développe une URL de playlist en URL de vidéos, sans rien télécharger."""
+
+    def __init__(self, job, signals, ydl_factory=None):
+        super().__init__()
+        self.job = job
+        self.signals = signals
+        self.ydl_factory = ydl_factory
+
+    def run(self):
+        job = self.job
+        try:
+            yt_dlp = _yt_dlp()
+        except ImportError:
+            self.signals.failed.emit(job.id, "yt-dlp n'est pas installé (pip install yt-dlp).")
+            return
+        # "in_playlist" : seule la liste est lue, pas la page de chaque vidéo
+        ydl_opts = {'extract_flat': 'in_playlist', 'quiet': True, 'skip_download': True}
+        try:
+            with (self.ydl_factory or yt_dlp.YoutubeDL)(ydl_opts) as ydl:
+                info = ydl.extract_info(job.url, download=False)
+            urls = []
+            for entry in info.get('entries') or []:
+                url = entry and (entry.get('webpage_url') or entry.get('url'))
+                if url:
+                    urls.append(url)
+            if job.cancel_requested:
+                self.signals.cancelled.emit(job.id)
+            else:
+                self.signals.expanded.emit(job.id, urls, info.get('title') or "")
+        except yt_dlp.utils.DownloadError as e:
+            self.signals.failed.emit(job.id, f"Erreur yt-dlp : {e}")
+        except Exception as e:
+            self.signals.failed.emit(job.id, f"Une erreur inattendue est survenue : {e}")
+
+
+class DownloadWorker(QRunnable):
+    """Exécute un téléchargement yt-dlp hors du thread GUI."""
+
+    def __init__(self, job, audio_folder_path, signals, cache, ydl_factory=None, native_codec=False,
+                 concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS):
+        super().__init__()
+        self.job = job
+        self.audio_folder_path = audio_folder_path
+        self.native_codec = native_codec
+        self.concurrent_fragments = concurrent_fragments
+        self.signals = signals
+        self.cache = cache
+        self.ydl_factory = ydl_factory
+
+    def progress_hook(self, d):
+        # Appelé par yt-dlp dans le thread de travail : jamais de widget ici
+        if self.job.cancel_requested:
+            raise _yt_dlp().utils.DownloadCancelled()
+        if d['status'] == 'downloading':
+            self.signals.progress.emit(self.job.id, d.get('_percent_str', 'N/A').strip())
+        elif d['status'] == 'finished':
+            # Débit réseau du fichier, hors conversion (yt-dlp fournit la durée du téléchargement)
+            size = d.get('total_bytes') or d.get('downloaded_bytes')
+            if size and d.get('elapsed'):
+                metrics.observe("downloads.throughput_kib_s", size / 1024 / d['elapsed'])
+                metrics.count("downloads.bytes", size)
+            self.signals.progress.emit(self.job.id, "extraction de l'audio..." if self.native_codec else "conversion en MP3...")
+
+    def run(self):
+        job = self.job
+        cached = self.cache.lookup_url(job.url, self.audio_folder_path)
+        if cached is not None:
+            self.signals.finished.emit(job.id, cached)
+            return
+
+        try:
+            yt_dlp = _yt_dlp()
+        except ImportError:
+            self.signals.failed.emit(job.id, "yt-dlp n'est pas installé (pip install yt-dlp).")
+            return
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': os.path.join(self.audio_folder_path, '%(title)s.%(ext)s'),
+            # "best" : le flux audio d'origine (Opus, AAC...) est copié sans réencodage
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'best' if self.native_codec else 'mp3',
+                'preferredquality': '192',
+            }],
+            'quiet': True,
+            'noprogress': True,
+            'noplaylist': True,
+            'concurrent_fragment_downloads': self.concurrent_fragments,
+            'ffmpeg_location': 'ffmpeg',
+            'progress_hooks': [self.progress_hook],
+        }
+
+        stem = None
+        try:
+            with (self.ydl_factory or yt_dlp.YoutubeDL)(ydl_opts) as ydl:
+                # Une seule extraction : sans traitement ici, réutilisée telle quelle pour le téléchargement
+                info = ydl.extract_info(job.url, download=False, process=False)
+                key = self.cache.key_of(info)
+
+                cached = self.cache.lookup(key, self.audio_folder_path)
+                if cached is not None:
+                    # Même vidéo sous une autre URL : déjà dans le dossier
+                    self.cache.remember_url(job.url, key)
+                    self.signals.finished.emit(job.id, cached)
+                    return
+
+                stem = self.target_stem(ydl, info)
+                if not self.cache.claim(stem, key, self.audio_folder_path):
+                    # Titre déjà pris par une autre vidéo : l'identifiant départage les deux
+                    ydl.params['outtmpl']['default'] = os.path.join(
+                        self.audio_folder_path, '%(title)s [%(id)s].%(ext)s')
+                    stem = self.target_stem(ydl, info)
+                    self.cache.claim(stem, key, self.audio_folder_path)
+                final_filename = stem + '.mp3'
+
+                if job.cancel_requested:
+                    raise yt_dlp.utils.DownloadCancelled()
+                result = ydl.process_ie_result(info, download=True)
+
+                result = result or {}
+                downloads = result.get('requested_downloads') or [result]
+                if downloads[0].get('filepath'):
+                    final_filename = os.path.basename(downloads[0]['filepath'])
+                self.cache.add(key, job.url, final_filename, ydl.sanitize_info(result or info))
+
+            self.signals.finished.emit(job.id, final_filename)
+
+        except yt_dlp.utils.DownloadCancelled:
+            self.signals.cancelled.emit(job.id)
+        except yt_dlp.utils.DownloadError as e:
+            self.signals.failed.emit(job.id, f"Erreur yt-dlp : {e}")
+        except FileNotFoundError:
+            self.signals.failed.emit(job.id, "FFmpeg n'est pas trouvé. Veuillez l'installer et vous assurer qu'il est dans votre PATH.")
+        except Exception as e:
+            self.signals.failed.emit(job.id, f"Une erreur inattendue est survenue : {e}")
+        finally:
+            if stem is not None:
+                self.cache.release(stem)
+
+    @staticmethod
+    def target_stem(ydl, info):
+        """Nom du fichier produit, sans extension."""
+        return os.path.basename(ydl.prepare_filename(info).rsplit('.', 1)[0])
+
+
+class DownloadManager(QObject):
+    """File de téléchargements servie par un pool de threads à concurrence limitée.
+
+    Les tâches non terminées et les imports groupés sont enregistrés dans
+    `state_path` à chaque changement d'état ; `restore()` les relance au démarrage.
+    Le nombre de connexions est borné par `max_concurrent` × `concurrent_fragments`.
+    """
+
+    job_added = pyqtSignal(object)
+    job_changed = pyqtSignal(object)
+    job_finished = pyqtSignal(object)
+    batch_finished = pyqtSignal(object)
+
+    def __init__(self, audio_folder_path, max_concurrent=DEFAULT_MAX_CONCURRENT, cache=None,
+                 ydl_factory=None, native_codec=False,
+                 concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS, state_path=DOWNLOAD_STATE_FILE, parent=None):
+        super().__init__(parent)
+        self.audio_folder_path = audio_folder_path
+        # Vrai : garder le flux audio d'origine au lieu de réencoder en MP3
+        self.native_codec = native_codec
+        self.concurrent_fragments = max(1, concurrent_fragments)
+        self.cache = cache if cache is not None else DownloadCache()
+        # Remplaçable par un faux YoutubeDL pour tester sans réseau ; None : yt-dlp, importé au premier besoin
+        self.ydl_factory = ydl_factory
+        self.state_path = state_path
+        self.max_concurrent = max(1, max_concurrent)
+        self.jobs = {}
+        self.batches = {}
+        self._pending = deque()
+        self._running = set()
+        # Pendant la fermeture, l'état enregistré garde les tâches qu'on annule
+        self._closing = False
+        # > 0 : écritures de l'état regroupées (ajout de toute une playlist)
+        self._saves_held = 0
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.max_concurrent)
+
+        self.signals = _WorkerSignals(self)
+        self.signals.progress.connect(self._on_progress)
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+        self.signals.cancelled.connect(self._on_cancelled)
+        self.signals.expanded.connect(self._on_expanded)
+
+    def add(self, url, batch=None, expand_index=None):
+        job = DownloadJob(url, batch, expand_index)
+        self.jobs[job.id] = job
+        self._pending.append(job.id)
+        self.job_added.emit(job)
+        self._start_pending()
+        self._save_state()
+        return job
+
+    def import_urls(self, sources, playlist=None):
+        """Import groupé : les playlists sont développées, chaque vidéo devient une tâche.
+
+        À la fin, `batch_finished` donne l'import ; son nom de playlist est `playlist`,
+        ou à défaut le titre de la première playlist développée.
+        """
+        batch = ImportBatch(sources, playlist)
+        self.batches[batch.id] = batch
+        self._saves_held += 1
+        try:
+            for index, url in enumerate(batch.sources):
+                if is_playlist_url(url):
+                    self.add(url, batch.id, index)
+                else:
+                    batch.entries[index] = [url]
+                    self.add(url, batch.id)
+            self._check_batch(batch)
+        finally:
+            self._release_saves()
+        return batch
+
+    def restore(self):
+        """Relance les tâches et imports interrompus par la fermeture précédente."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            print(f"État des téléchargements illisible, ignoré : {self.state_path}")
+            return
+        batches = []
+        self._saves_held += 1
+        try:
+            for batch_state in state.get("batches", []):
+                batch = ImportBatch.from_state(batch_state)
+                self.batches[batch.id] = batch
+                batches.append(batch)
+            for job_state in state.get("jobs", []):
+                position = job_state.get("batch")
+                self.add(job_state["url"], batches[position].id if position is not None else None,
+                         job_state.get("expand_index"))
+            for batch in batches:
+                self._check_batch(batch)
+        finally:
+            self._release_saves()
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if job.status == PENDING:
+            self._pending.remove(job_id)
+            self._set_status(job, CANCELLED)
+        elif job.status == RUNNING:
+            # Le worker s'arrêtera au prochain appel du hook de progression
+            job.cancel_requested = True
+            job.progress = "annulation..."
+            self.job_changed.emit(job)
+
+    def retry(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in (FAILED, CANCELLED):
+            return
+        job.cancel_requested = False
+        job.error = None
+        job.progress = ""
+        batch = self.batches.get(job.batch)
+        if batch is not None:
+            if job.expand_index is not None:
+                batch.entries[job.expand_index] = None
+            else:
+                batch.outcomes.pop(job.url, None)
+        self._set_status(job, PENDING)
+        self._pending.append(job_id)
+        self._start_pending()
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = max(1, value)
+        self.pool.setMaxThreadCount(self.max_concurrent)
+        self._start_pending()
+
+    def active_count(self):
+        return len(self._running) + len(self._pending)
+
+    def shutdown(self, timeout_ms=3000):
+        """Annule tout et attend (brièvement) la fin des workers ; l'état reste enregistré pour `restore()`."""
+        self._save_state()
+        self._closing = True
+        for job_id in list(self._pending):
+            self.cancel(job_id)
+        for job_id in list(self._running):
+            self.cancel(job_id)
+        self.pool.waitForDone(timeout_ms)
+
+    def _start_pending(self):
+        while self._pending and len(self._running) < self.max_concurrent:
+            job = self.jobs[self._pending.popleft()]
+            self._running.add(job.id)
+            self._set_status(job, RUNNING)
+            if job.expand_index is not None:
+                self.pool.start(ExpandWorker(job, self.signals, self.ydl_factory))
+            else:
+                self.pool.start(DownloadWorker(job, self.audio_folder_path, self.signals, self.cache,
+                                               self.ydl_factory, self.native_codec, self.concurrent_fragments))
+
+    def _set_status(self, job, status):
+        job.status = status
+        self.job_changed.emit(job)
+        batch = self.batches.get(job.batch)
+        if batch is not None and status in (FINISHED, FAILED, CANCELLED) and not self._closing:
+            if job.expand_index is None:
+                batch.outcomes[job.url] = job.filename if status == FINISHED else ""
+            elif status != FINISHED:
+                batch.entries[job.expand_index] = []
+            self._check_batch(batch)
+        self._save_state()
+
+    def _check_batch(self, batch):
+        if batch.is_complete() and self.batches.pop(batch.id, None) is not None:
+            self.batch_finished.emit(batch)
+            self._save_state()
+
+    def _release_saves(self):
+        self._saves_held -= 1
+        self._save_state()
+
+    def _save_state(self):
+        if not self.state_path or self._closing or self._saves_held:
+            return
+        batch_ids = list(self.batches)
+        jobs = []
+        for job in self.jobs.values():
+            if job.status not in (PENDING, RUNNING):
+                continue
+            position = batch_ids.index(job.batch) if job.batch in self.batches else None
+            jobs.append({"url": job.url, "batch": position, "expand_index": job.expand_index})
+        state = {"jobs": jobs, "batches": [self.batches[batch_id].to_state() for batch_id in batch_ids]}
+        atomic_write(self.state_path, json.dumps(state, ensure_ascii=False).encode("utf-8"))
+
+    def _release(self, job_id):
+        self._running.discard(job_id)
+        self._start_pending()
+
+    def _on_progress(self, job_id, progress):
+        job = self.jobs[job_id]
+        if job.cancel_requested:
+            return
+        job.progress = progress
+        self.job_changed.emit(job)
+
+    def _on_finished(self, job_id, filename):
+        job = self.jobs[job_id]
+        job.filename = filename
+        job.progress = ""
+        self._set_status(job, FINISHED)
+        self.job_finished.emit(job)
+        self._release(job_id)
+
+    def _on_expanded(self, job_id, urls, title):
+        job = self.jobs[job_id]
+        job.filename = f"{title or job.url} ({len(urls)} vidéos)"
+        job.progress = ""
+        batch = self.batches.get(job.batch)
+        if batch is not None:
+            batch.entries[job.expand_index] = urls
+            if not batch.playlist and title:
+                batch.playlist = title
+            queued = {other.url for other in self.jobs.values()
+                      if other.batch == batch.id and other.expand_index is None and other.status != CANCELLED}
+            self._saves_held += 1
+            try:
+                for url in urls:
+                    if url not in queued and url not in batch.outcomes:
+                        queued.add(url)
+                        self.add(url, batch.id)
+            finally:
+                self._release_saves()
+        self._set_status(job, FINISHED)
+        self._release(job_id)
+
+    def _on_failed(self, job_id, message):
+        job = self.jobs[job_id]
+        job.error = message
+        self._set_status(job, FAILED)
+        self._release(job_id)
+
+    def _on_cancelled(self, job_id):
+        job = self.jobs[job_id]
+        job.progress = ""
+        self._set_status(job, CANCELLED)
+        self._release(job_id)
@@ -0,0 +1,76 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTreeWidget, QTreeWidgetItem, QComboBox,
+    QDialogButtonBox, QHeaderView
+)
+from PyQt6.QtCore import Qt
+from dedupe import EXACT, QUARANTINE_DIR
+
+
+class DuplicatesDialog(QDialog):
+    """Revue de tous les groupes de doublons : fusion ou non, et fichier gardé, groupe par groupe.
+
+    Les copies exactes sont cochées d'office ; les réencodages, trouvés par empreinte
+    acoustique, peuvent être des faux positifs et restent décochés.
+    """
+
+    def __init__(self, plan, describe=None, parent=None):
+        """`plan` : [(type, nom gardé proposé, [noms])] ; `describe(nom)` donne l'info-bulle d'un fichier."""
+        super().__init__(parent)
+        self.setWindowTitle("Doublons")
+        self.resize(720, 480)
+        layout = QVBoxLayout(self)
+
+        extra = sum(len(names) - 1 for _, _, names in plan)
+        layout.addWidget(QLabel(
+            f"{len(plan)} groupe(s) de doublons, {extra} fichier(s) en trop.\n"
+            f"Les fichiers en trop des groupes cochés sont déplacés dans le dossier « {QUARANTINE_DIR} » "
+            "de leur racine (rien n'est supprimé) et les playlists pointent vers le fichier gardé."
+        ))
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Groupe", "Fichier gardé"])
+        self.tree.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self._groups = []
+        for kind, keeper, names in plan:
+            item = QTreeWidgetItem([f"[{kind}] {len(names)} fichiers"])
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(0, Qt.CheckState.Checked if kind == EXACT else Qt.CheckState.Unchecked)
+            for name in names:
+                child = QTreeWidgetItem([name])
+                if describe is not None:
+                    child.setToolTip(0, describe(name) or name)
+                item.addChild(child)
+            self.tree.addTopLevelItem(item)
+            keeper_combo = QComboBox()
+            keeper_combo.addItems(names)
+            keeper_combo.setCurrentIndex(names.index(keeper))
+            self.tree.setItemWidget(item, 1, keeper_combo)
+            item.setExpanded(True)
+            self._groups.append((item, keeper_combo, names))
+        layout.addWidget(self.tree)
+
+        selection = QHBoxLayout()
+        check_all = QPushButton("Tout cocher")
+        check_all.clicked.connect(lambda: self.set_all_checked(True))
+        uncheck_all = QPushButton("Tout décocher")
+        uncheck_all.clicked.connect(lambda: self.set_all_checked(False))
+        selection.addWidget(check_all)
+        selection.addWidget(uncheck_all)
+        selection.addStretch()
+        layout.addLayout(selection)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.button(QDialogButtonBox.StandardButton.Ok).setText("Fusionner les groupes cochés")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def set_all_checked(self, checked):
+        state = Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked
+        for item, _, _ in self._groups:
+            item.setCheckState(0, state)
+
+    def selected_plan(self):
+        """[(nom gardé, [noms])] des groupes cochés."""
+        return [(combo.currentText(), names) for item, combo, names in self._groups
+                if item.checkState(0) == Qt.CheckState.Checked]
@@ -0,0 +1,192 @@
+import re
+import json
+import time
+import threading
+from collections import deque
+
+# Dernières observations gardées par mesure
+RING_SIZE = 512
+QUANTILES = (0.5, 0.9, 0.99)
+PROMETHEUS_PREFIX = "spotify_du_pauvre"
+
+
+class _NullSpan:
+    """Span des mesures désactivées : partagé, il ne fait rien."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000, **self.labels)
+        return False
+
+
+class Series:
+    """Observations d'une mesure : nombre et somme depuis le début, plus les dernières valeurs."""
+
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self, ring_size):
+        self.count = 0
+        self.total = 0.0
+        # (horodatage, valeur)
+        self.samples = deque(maxlen=ring_size)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append((time.time(), value))
+
+    def quantiles(self):
+        values = sorted(value for _, value in self.samples)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+    def last(self):
+        return self.samples[-1][1] if self.samples else None
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """Compteurs et durées de l'application, consultables et exportables à la demande.
+
+    Désactivé, chaque appel s'arrête au premier test (`span` rend un objet
+    partagé qui ne fait rien) : l'instrumentation peut rester dans le code.
+    Les étiquettes (`kind="manuel"`) distinguent les variantes d'une même mesure.
+    """
+
+    def __init__(self, enabled=False, ring_size=RING_SIZE):
+        self.enabled = enabled
+        self.ring_size = ring_size
+        self.started = time.time()
+        self._counters = {}
+        self._series = {}
+        # Les threads de téléchargement peuvent aussi compter
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = Series(self.ring_size)
+            series.add(value)
+
+    def span(self, name, **labels):
+        """`with metrics.span("playlists.save_ms"):` mesure la durée du bloc en ms."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def start(self):
+        """Jeton d'une mesure qui se termine ailleurs (ex. au changement d'état du lecteur)."""
+        return time.perf_counter() if self.enabled else None
+
+    def finish(self, name, token, **labels):
+        if token is not None:
+            self.observe(name, (time.perf_counter() - token) * 1000, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._series.clear()
+            self.started = time.time()
+
+    # Export
+
+    def snapshot(self):
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            series = []
+            for (name, labels), values in sorted(self._series.items()):
+                series.append({
+                    "name": name, "labels": dict(labels), "count": values.count, "sum": values.total,
+                    "last": values.last(),
+                    "quantiles": {str(q): value for q, value in values.quantiles().items()},
+                    "recent": [[timestamp, value] for timestamp, value in values.samples],
+                })
+        return {"started": self.started, "exported": time.time(), "enabled": self.enabled,
+                "counters": counters, "series": series}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Format texte d'exposition Prometheus : compteurs `_total`, durées en résumés."""
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+
+        def declare(metric, kind):
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for counter in snapshot["counters"]:
+            metric = _metric_name(prefix, counter["name"]) + "_total"
+            declare(metric, "counter")
+            lines.append(f"{metric}{_labels(counter['labels'])} {counter['value']}")
+        for series in snapshot["series"]:
+            metric = _metric_name(prefix, series["name"])
+            declare(metric, "summary")
+            for q, value in series["quantiles"].items():
+                lines.append(f"{metric}{_labels(series['labels'], quantile=q)} {value}")
+            lines.append(f"{metric}_sum{_labels(series['labels'])} {series['sum']}")
+            lines.append(f"{metric}_count{_labels(series['labels'])} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(prefix, name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{name}")
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Registre partagé par tous les modules (activé par la fenêtre selon la configuration)
+metrics = Metrics()
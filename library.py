@@ -0,0 +1,515 @@
+import os
+import bisect
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import metrics
+
+# Fichier de l'index persistant de la bibliothèque
+LIBRARY_DB_FILE = "library.db"
+# Formats lus par la bibliothèque : MP3 et flux d'origine gardés sans réencodage
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".aac", ".opus", ".ogg", ".webm", ".flac", ".wav")
+DEFAULT_SCAN_WORKERS = 8
+# En dessous de ce nombre de fichiers, les threads coûtent plus qu'ils ne rapportent
+PARALLEL_STAT_THRESHOLD = 256
+# Préfixe des pistes d'une racine secondaire : « @étiquette/chemin/relatif.mp3 »
+ROOT_PREFIX = "@"
+# 1 : index récursif (les versions précédentes n'indexaient que le dossier lui-même)
+INDEX_VERSION = 1
+
+
+def insert_sorted(names, name):
+    """Insère `name` dans la liste triée `names` s'il n'y est pas ; retourne sa position ou -1."""
+    index = bisect.bisect_left(names, name)
+    if index < len(names) and names[index] == name:
+        return -1
+    names.insert(index, name)
+    return index
+
+
+def remove_sorted(names, name):
+    """Retire `name` de la liste triée `names` ; retourne sa position ou -1 s'il était absent."""
+    index = bisect.bisect_left(names, name)
+    if index < len(names) and names[index] == name:
+        del names[index]
+        return index
+    return -1
+
+
+def _prefix(root):
+    return root if root.endswith(os.sep) else root + os.sep
+
+
+def tree_bounds(root):
+    """Bornes (incluse, exclue) des chemins sous `root`, pour une requête par intervalle sur la clé."""
+    prefix = _prefix(root)
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+def relative_name(root, path):
+    """Nom de piste de `path` relatif à `root`, avec « / » pour séparateur sur tous les systèmes."""
+    name = path[len(_prefix(root)):]
+    return name.replace(os.sep, "/") if os.sep != "/" else name
+
+
+def _stat_entries(folder, names):
+    """Retourne (nom, taille, mtime_ns) pour chaque fichier ; ignore ceux disparus entre-temps."""
+    results = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        results.append((name, st.st_size, st.st_mtime_ns))
+    return results
+
+
+def _stat_all(folder, names, workers):
+    if len(names) < PARALLEL_STAT_THRESHOLD or workers <= 1:
+        return _stat_entries(folder, names)
+
+    # Sur un partage réseau chaque stat est un aller-retour : on les parallélise par paquets
+    chunk_size = -(-len(names) // workers)
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(_stat_entries, [folder] * len(chunks), chunks):
+            results.extend(part)
+    return results
+
+
+def _walk(root, dirs, files, cold, workers, targets=None):
+    """Parcourt l'arborescence de `root` sans toucher à la base (exécuté dans un thread par disque).
+
+    `dirs` ({dossier: mtime}) et `files` ({dossier: noms}) décrivent l'état indexé.
+    Un dossier au mtime inchangé n'est pas listé : ses sous-dossiers sont ceux de
+    l'index (en créer ou en supprimer change le mtime du parent). Dans un dossier
+    listé, les fichiers déjà indexés sont aussi stat (`DirEntry.stat`) : un fichier
+    réécrit sur place change le mtime de son dossier, pas son nom. Retourne
+    ({dossier vu: mtime}, {dossier listé: noms présents},
+    [(dossier, nom, taille, mtime)] des nouveaux, [(dossier, nom, taille, mtime)] des déjà indexés).
+
+    `targets` limite le parcours à ces dossiers (ceux qu'un observateur a signalés) :
+    un sous-dossier déjà indexé n'y est pas relu, seuls les nouveaux sont parcourus ;
+    ailleurs l'index fait foi.
+    """
+    children = {}
+    for path in dirs:
+        if path != root:
+            children.setdefault(os.path.dirname(path), []).append(path)
+
+    seen = {}
+    if targets is None:
+        stack = [root]
+    else:
+        targets = set(targets)
+        stack = sorted(targets)
+        seen = {path: mtime for path, mtime in dirs.items() if not _inside(path, root, targets)}
+
+    def keep(path):
+        """`path`, encore présent, et ses sous-dossiers indexés restent tels quels (hors `targets`)."""
+        pending = [path]
+        while pending:
+            path = pending.pop()
+            if path in targets:
+                continue
+            seen[path] = dirs[path]
+            pending.extend(children.get(path, ()))
+
+    listed = {}
+    new_names = {}
+    known_files = []
+    while stack:
+        path = stack.pop()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            # Disparu : ses pistes seront retirées
+            continue
+        if not cold and dirs.get(path) == mtime:
+            seen[path] = mtime
+            if targets is None:
+                stack.extend(children.get(path, ()))
+            else:
+                for child in children.get(path, ()):
+                    keep(child)
+            continue
+
+        names = set()
+        subdirs = []
+        known = () if cold else files.get(path, ())
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        # Liens symboliques vers des dossiers ignorés : pas de boucle ni de double comptage
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                            names.add(entry.name)
+                            if entry.name in known:
+                                st = entry.stat()
+                                known_files.append((path, entry.name, st.st_size, st.st_mtime_ns))
+                    except OSError:
+                        continue
+        except OSError:
+            # Illisible : traité comme disparu, il sera relu au prochain scan
+            continue
+        seen[path] = mtime
+        listed[path] = names
+        for subdir in subdirs:
+            if targets is None or subdir not in dirs:
+                stack.append(subdir)
+            else:
+                keep(subdir)
+        added = names if cold else names - files.get(path, set())
+        if added:
+            new_names[path] = sorted(added)
+
+    new_files = []
+    for path, names in new_names.items():
+        new_files.extend((path, name, size, mtime) for name, size, mtime in _stat_all(path, names, workers))
+    return seen, listed, new_files, known_files
+
+
+def _inside(path, root, targets):
+    """Vrai si `path` est l'un des `targets` ou se trouve sous l'un d'eux (sans remonter au-delà de `root`)."""
+    while True:
+        if path in targets:
+            return True
+        if path == root:
+            return False
+        parent = os.path.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+
+
+class LibraryRoots:
+    """Racines de la bibliothèque et noms stables des pistes.
+
+    Le nom d'une piste est son chemin relatif à sa racine (« / » pour séparateur).
+    Dans le dossier principal il n'a pas de préfixe, ce qui garde valables les
+    playlists existantes ; dans une racine secondaire il commence par « @étiquette/ ».
+    Une racine peut ainsi être ajoutée ou déplacée sans changer les noms des autres.
+    """
+
+    def __init__(self, primary, extra=None):
+        self.primary = os.path.abspath(primary)
+        self.extra = {}
+        for label, path in (extra or {}).items():
+            self.add(label, path)
+
+    def add(self, label, path):
+        """Ajoute une racine ; False si elle recoupe une racine existante (même dossier, parent ou enfant)."""
+        path = os.path.abspath(path)
+        real = os.path.realpath(path)
+        for root in self.paths():
+            other = os.path.realpath(root)
+            if real == other or real.startswith(_prefix(other)) or other.startswith(_prefix(real)):
+                return False
+        self.extra[label] = path
+        return True
+
+    def new_label(self, path):
+        """Étiquette libre tirée du nom du dossier."""
+        base = os.path.basename(os.path.abspath(path)).replace("/", "_") or "racine"
+        label, suffix = base, 2
+        while label in self.extra:
+            label = f"{base}-{suffix}"
+            suffix += 1
+        return label
+
+    def items(self):
+        """[(étiquette, chemin)] ; le dossier principal a l'étiquette vide."""
+        return [("", self.primary)] + list(self.extra.items())
+
+    def paths(self):
+        return [path for _, path in self.items()]
+
+    def name_of(self, label, relative):
+        return f"{ROOT_PREFIX}{label}/{relative}" if label else relative
+
+    def path_of(self, name):
+        if name.startswith(ROOT_PREFIX):
+            label, _, relative = name[len(ROOT_PREFIX):].partition("/")
+            root = self.extra.get(label)
+            if root is not None:
+                return os.path.join(root, *relative.split("/"))
+        return os.path.join(self.primary, *name.split("/"))
+
+    def name_for_path(self, path):
+        """Nom de piste d'un chemin absolu, None s'il n'est sous aucune racine."""
+        path = os.path.abspath(path)
+        for label, root in self.items():
+            if path.startswith(_prefix(root)):
+                return self.name_of(label, relative_name(root, path))
+        return None
+
+    def label_of(self, root):
+        for label, path in self.items():
+            if path == root:
+                return label
+        return None
+
+    def root_of(self, path):
+        """Racine qui contient `path` (fichier ou dossier), None sinon."""
+        path = os.path.abspath(path)
+        for root in self.paths():
+            if path == root or path.startswith(_prefix(root)):
+                return root
+        return None
+
+
+class LibraryIndex:
+    """Index SQLite des fichiers audio (chemin, taille, mtime) d'une ou plusieurs racines, sous-dossiers compris.
+
+    Chaque dossier garde son mtime : au scan suivant, un dossier inchangé n'est pas
+    relu (ses pistes et sous-dossiers viennent de l'index), seul un dossier modifié
+    est listé et ses nouveaux fichiers stat. Les noms retournés sont relatifs à la
+    racine, avec « / » pour séparateur. Plusieurs racines sont parcourues en
+    parallèle, un thread par disque ; la base n'est écrite que par le thread appelant.
+    """
+
+    def __init__(self, db_path=LIBRARY_DB_FILE, workers=DEFAULT_SCAN_WORKERS):
+        self.db_path = db_path
+        self.workers = workers
+        self.conn = sqlite3.connect(db_path)
+        # État indexé des racines déjà chargées : {dossier: mtime} et {dossier: noms}
+        self._dirs = {}
+        self._files = {}
+        self._loaded_roots = set()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tracks_dir ON tracks(dir, name);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL
+            );
+        """)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+            # Index d'avant les sous-dossiers : chaque dossier connu est relu une fois
+            with self.conn:
+                self.conn.execute("UPDATE dirs SET mtime = -1")
+                self.conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def scan(self, folder, cold=False):
+        """Retourne les noms des fichiers audio de `folder` et de ses sous-dossiers.
+
+        Seuls les dossiers modifiés depuis le dernier scan sont relus. `cold=True`
+        ignore l'index et re-stat tous les fichiers en parallèle.
+        """
+        folder = os.path.abspath(folder)
+        os.stat(folder)
+        return self.scan_roots([folder], cold)[folder]
+
+    def scan_roots(self, roots, cold=False):
+        """`scan` de plusieurs racines en parallèle : {racine: noms}. Une racine absente garde ses noms indexés."""
+        roots = [os.path.abspath(root) for root in roots]
+        with metrics.span("library.scan_ms", kind="cold" if cold else "warm"):
+            for root, result in self._walk_roots(roots, cold).items():
+                self._apply(root, result)
+        return {root: self.tracks_in(root) for root in roots}
+
+    def cached(self, folder):
+        """Noms indexés pour `folder`, sans accès au disque ; `refresh` les met ensuite à jour."""
+        folder = os.path.abspath(folder)
+        self._load(folder)
+        return self.tracks_in(folder)
+
+    def is_current(self, folder):
+        """Vrai si aucun dossier de l'arborescence n'a changé depuis le dernier scan."""
+        folder = os.path.abspath(folder)
+        self._load(folder)
+        dirs = self._dirs_under(folder)
+        if folder not in dirs:
+            return False
+        for path, mtime in dirs.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def refresh(self, folder):
+        """Re-synchronise une arborescence modifiée et retourne (ajoutés, supprimés, renommés, réécrits).
+
+        Les renommages (et déplacements d'un sous-dossier à l'autre) sont détectés en
+        appariant un fichier disparu et un fichier apparu de même taille et même
+        mtime ; ils sont retournés en paires (ancien, nouveau). Les réécrits sont les
+        fichiers modifiés sur place (réencodage, tags) : même nom, autre taille ou mtime.
+        """
+        folder = os.path.abspath(folder)
+        os.stat(folder)
+        return self.refresh_roots([folder])[folder]
+
+    def refresh_roots(self, roots):
+        """`refresh` de plusieurs racines en parallèle : {racine: (ajoutés, supprimés, renommés, réécrits)}."""
+        roots = [os.path.abspath(root) for root in roots]
+        with metrics.span("library.scan_ms", kind="refresh"):
+            changes = {root: self._apply(root, result) for root, result in self._walk_roots(roots, False).items()}
+        return {root: changes.get(root, ([], [], [], [])) for root in roots}
+
+    def refresh_dirs(self, changed):
+        """`refresh` limité aux dossiers signalés : {racine: dossiers} → {racine: (ajoutés, supprimés, renommés, réécrits)}.
+
+        Seuls ces dossiers sont relus, et les sous-dossiers qui y sont apparus ; le reste
+        de l'arborescence n'est pas parcouru. Les renommages d'un dossier à l'autre sont
+        reconnus si les deux dossiers sont signalés ensemble.
+        """
+        changed = {os.path.abspath(root): [os.path.abspath(path) for path in dirs] for root, dirs in changed.items()}
+        with metrics.span("library.scan_ms", kind="dirs"):
+            changes = {root: self._apply(root, result)
+                       for root, result in self._walk_roots(list(changed), False, changed).items()}
+        return {root: changes.get(root, ([], [], [], [])) for root in changed}
+
+    def tracks_in(self, folder):
+        folder = os.path.abspath(folder)
+        low, high = tree_bounds(folder)
+        rows = self.conn.execute("SELECT path FROM tracks WHERE path >= ? AND path < ?", (low, high))
+        return sorted(relative_name(folder, path) for (path,) in rows)
+
+    def entries_in(self, folder):
+        """(nom, taille, mtime_ns) des pistes indexées de `folder`, triées par nom."""
+        folder = os.path.abspath(folder)
+        low, high = tree_bounds(folder)
+        rows = self.conn.execute("SELECT path, size, mtime FROM tracks WHERE path >= ? AND path < ?", (low, high))
+        return sorted((relative_name(folder, path), size, mtime) for path, size, mtime in rows)
+
+    def directories(self, folder):
+        """Dossiers indexés de l'arborescence (pour les surveiller)."""
+        folder = os.path.abspath(folder)
+        self._load(folder)
+        return list(self._dirs_under(folder))
+
+    # Interne
+
+    def _load(self, root):
+        if root in self._loaded_roots:
+            return
+        low, high = tree_bounds(root)
+        for path, mtime in self.conn.execute(
+                "SELECT path, mtime FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (root, low, high)):
+            self._dirs[path] = mtime
+        for folder, name in self.conn.execute("SELECT dir, name FROM tracks WHERE path >= ? AND path < ?",
+                                              (low, high)):
+            self._files.setdefault(folder, set()).add(name)
+        self._loaded_roots.add(root)
+
+    def _dirs_under(self, root):
+        prefix = _prefix(root)
+        return {path: mtime for path, mtime in self._dirs.items() if path == root or path.startswith(prefix)}
+
+    def _forget(self, root):
+        """Oublie l'arborescence avant un scan à froid."""
+        low, high = tree_bounds(root)
+        with self.conn:
+            self.conn.execute("DELETE FROM tracks WHERE path >= ? AND path < ?", (low, high))
+            self.conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (root, low, high))
+        for path in self._dirs_under(root):
+            del self._dirs[path]
+            self._files.pop(path, None)
+        self._loaded_roots.add(root)
+
+    def _walk_roots(self, roots, cold, targets=None):
+        jobs = {}
+        for root in roots:
+            try:
+                device = os.stat(root).st_dev
+            except OSError:
+                # Disque absent (démonté, partage coupé) : l'index garde ses pistes
+                continue
+            if cold:
+                self._forget(root)
+            else:
+                self._load(root)
+            # Un thread par disque : deux racines du même disque se gêneraient plus qu'elles n'iraient vite
+            jobs.setdefault(device, []).append((root, self._dirs_under(root)))
+
+        def run(group):
+            return [(root, _walk(root, dirs, self._files, cold, self.workers, targets and targets[root]))
+                    for root, dirs in group]
+
+        results = {}
+        if len(jobs) <= 1:
+            for group in jobs.values():
+                results.update(run(group))
+        else:
+            with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+                for part in executor.map(run, jobs.values()):
+                    results.update(part)
+        return results
+
+    def _apply(self, root, result):
+        """Reporte le parcours d'une racine dans l'index ; retourne (ajoutés, supprimés, renommés, réécrits).
+
+        La ligne d'un fichier réécrit sur place prend sa nouvelle taille et son nouveau
+        mtime, ce qui invalide les caches SQLite qui s'y joignent (tags, sonie, doublons) ;
+        l'appelant invalide ses copies en mémoire.
+        """
+        seen, listed, new_files, known_files = result
+        vanished = [path for path in self._dirs_under(root) if path not in seen]
+        if not vanished and not listed:
+            return [], [], [], []
+
+        removed = []
+        for path in vanished:
+            removed.extend(os.path.join(path, name) for name in self._files.pop(path, ()))
+            del self._dirs[path]
+        for path, names in listed.items():
+            removed.extend(os.path.join(path, name) for name in self._files.get(path, set()) - names)
+            self._files[path] = names
+            self._dirs[path] = seen[path]
+
+        # Signature (taille, mtime) des fichiers disparus, pour reconnaître les renommages
+        removed_by_stat = {}
+        for path in removed:
+            row = self.conn.execute("SELECT size, mtime FROM tracks WHERE path = ?", (path,)).fetchone()
+            if row is not None:
+                removed_by_stat[row] = path
+
+        # Fichiers déjà indexés dont la taille ou le mtime ont changé
+        indexed = {}
+        for folder in listed:
+            indexed.update(((folder, name), (size, mtime)) for name, size, mtime in self.conn.execute(
+                "SELECT name, size, mtime FROM tracks WHERE dir = ?", (folder,)))
+        rewritten = [(folder, name, size, mtime) for folder, name, size, mtime in known_files
+                     if indexed.get((folder, name)) != (size, mtime)]
+
+        added = []
+        renamed = []
+        for folder, name, size, mtime in new_files:
+            path = os.path.join(folder, name)
+            old_path = removed_by_stat.pop((size, mtime), None)
+            if old_path is not None:
+                renamed.append((old_path, path))
+            else:
+                added.append(path)
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in removed])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tracks (path, dir, name, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                [(os.path.join(folder, name), folder, name, size, mtime)
+                 for folder, name, size, mtime in new_files + rewritten]
+            )
+            self.conn.executemany("DELETE FROM dirs WHERE path = ?", [(path,) for path in vanished])
+            self.conn.executemany("INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)",
+                                  [(path, seen[path]) for path in listed])
+
+        renamed_old = {old for old, _ in renamed}
+        return (sorted(relative_name(root, path) for path in added),
+                sorted(relative_name(root, path) for path in removed if path not in renamed_old),
+                [(relative_name(root, old), relative_name(root, new)) for old, new in renamed],
+                sorted(relative_name(root, os.path.join(folder, name)) for folder, name, _, _ in rewritten))
@@ -0,0 +1,226 @@
+import os
+import math
+import subprocess
+from library import tree_bounds, relative_name
+
+try:
+    import numpy as np
+except ImportError:
+    # Sans NumPy pas d'analyse : toutes les pistes gardent un gain de 1
+    np = None
+
+AVAILABLE = np is not None
+
+# Analyse à 48 kHz : fréquence pour laquelle la norme donne les coefficients du filtre
+SAMPLE_RATE = 48000
+# Référence ReplayGain 2.0
+TARGET_LUFS = -18.0
+# Filtre de pondération K (ITU-R BS.1770-4) : étage « shelf » puis passe-haut, en (b, a)
+_K_STAGES = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+# Filtrage par blocs (overlap-save) : taille de FFT et longueur de la réponse impulsionnelle
+FFT_SIZE = 1 << 16
+FILTER_TAPS = 4096
+# Trames filtrées par passe (borne la mémoire)
+FRAMES_PER_PASS = 16
+# Échantillons lus par bloc pendant le décodage : un nombre entier de passes du filtre (~20 s, ~8 Mo)
+DECODE_FRAMES = (FFT_SIZE - FILTER_TAPS + 1) * FRAMES_PER_PASS
+# Pas des blocs de mesure (100 ms) ; un bloc de 400 ms couvre quatre pas
+HOP = SAMPLE_RATE // 10
+# Nombre de fichiers analysés par tâche envoyée au pool
+BATCH_SIZE = 4
+
+_filter_spectrum = None
+
+
+def _decode_blocks(path, frames=DECODE_FRAMES):
+    """Décode le fichier en stéréo float32 à 48 kHz, par tableaux d'au plus `frames` × 2.
+
+    La piste n'est jamais entière en mémoire : FFmpeg écrit dans un tube lu bloc par bloc.
+    """
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-vn",
+               "-ac", "2", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"]
+    # Avec « -v error », stderr reste bien en deçà du tampon du tube : pas de blocage
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(frames * 8)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 8 * 8], dtype=np.float32).reshape(-1, 2)
+        error = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(error.decode("utf-8", "replace").strip() or "décodage impossible")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def _k_weighting_response(size):
+    """Réponse en fréquence du filtre K sur les `size // 2 + 1` raies d'une FFT réelle."""
+    z = np.exp(-2j * np.pi * np.arange(size // 2 + 1) / size)
+    response = np.ones_like(z)
+    for b, a in _K_STAGES:
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return response
+
+
+def _k_weight(channel, history=None):
+    """Applique le filtre K par overlap-save : FFT par lots de trames, sans boucle par échantillon.
+
+    `history` : les FILTER_TAPS - 1 échantillons qui précèdent `channel` (des zéros au début du signal).
+    """
+    global _filter_spectrum
+    if _filter_spectrum is None:
+        # Réponse impulsionnelle tronquée (le reste est sous 1e-9) puis son spectre, une fois par processus
+        taps = np.fft.irfft(_k_weighting_response(FFT_SIZE), FFT_SIZE)[:FILTER_TAPS]
+        _filter_spectrum = np.fft.rfft(taps, FFT_SIZE).astype(np.complex64)
+
+    if not len(channel):
+        return np.zeros(0, np.float32)
+    if history is None:
+        history = np.zeros(FILTER_TAPS - 1, np.float32)
+    step = FFT_SIZE - FILTER_TAPS + 1
+    # Juste assez de zéros pour une dernière trame complète
+    padded = np.concatenate([history, channel, np.zeros(-len(channel) % step, np.float32)])
+    frames = np.lib.stride_tricks.sliding_window_view(padded, FFT_SIZE)[::step]
+    parts = []
+    for start in range(0, len(frames), FRAMES_PER_PASS):
+        spectrum = np.fft.rfft(frames[start:start + FRAMES_PER_PASS], axis=1) * _filter_spectrum
+        parts.append(np.fft.irfft(spectrum, FFT_SIZE, axis=1)[:, FILTER_TAPS - 1:].reshape(-1))
+    return np.concatenate(parts)[:len(channel)]
+
+
+class LoudnessMeter:
+    """Sonie intégrée et crête d'un signal à 48 kHz reçu par morceaux (`feed`), sans le garder.
+
+    Chaque canal garde les FILTER_TAPS - 1 derniers échantillons pour le filtre K,
+    et les échantillons d'un pas de 100 ms incomplet attendent le morceau suivant :
+    seule l'énergie de chaque pas est conservée (10 valeurs par seconde).
+    """
+
+    def __init__(self, channels=2):
+        self.peak = 0.0
+        self._history = [np.zeros(FILTER_TAPS - 1, np.float32) for _ in range(channels)]
+        self._partial = np.zeros(0)
+        self._energies = []
+
+    def feed(self, samples):
+        """Ajoute un morceau n × canaux, à la suite du précédent."""
+        if not len(samples):
+            return
+        self.peak = max(self.peak, float(np.abs(samples).max()))
+        power = np.zeros(len(samples))
+        for index, channel in enumerate(samples.T):
+            channel = np.ascontiguousarray(channel, dtype=np.float32)
+            power += np.square(_k_weight(channel, self._history[index]), dtype=np.float64)
+            self._history[index] = np.concatenate([self._history[index], channel])[-(FILTER_TAPS - 1):]
+        power = np.concatenate([self._partial, power])
+        count = len(power) // HOP
+        self._energies.append(power[:count * HOP].reshape(count, HOP).mean(axis=1))
+        self._partial = power[count * HOP:]
+
+    def loudness(self):
+        """LUFS des morceaux reçus, ou None pour un silence ou moins de 400 ms."""
+        return _gated_loudness(np.concatenate(self._energies) if self._energies else np.zeros(0))
+
+
+def integrated_loudness(samples):
+    """Sonie intégrée (LUFS) d'un signal n × canaux à 48 kHz, ou None pour un silence."""
+    meter = LoudnessMeter(samples.shape[1])
+    meter.feed(samples)
+    return meter.loudness()
+
+
+def _gated_loudness(energy):
+    """Blocs de 400 ms (pas de 100 ms) et double seuil de la norme, calculés sans boucle Python."""
+    if len(energy) < 4:
+        return None
+    blocks = np.convolve(energy, np.full(4, 0.25), mode="valid")
+    with np.errstate(divide="ignore"):
+        loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[loudness > ABSOLUTE_GATE_LUFS]
+    if not len(gated):
+        return None
+    relative_gate = -0.691 + 10 * math.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = blocks[loudness > max(ABSOLUTE_GATE_LUFS, relative_gate)]
+    return float(-0.691 + 10 * math.log10(gated.mean()))
+
+
+def analyze(path):
+    """Sonie intégrée et crête d'un fichier (exécuté dans un processus du pool)."""
+    mtime = os.stat(path).st_mtime_ns
+    meter = LoudnessMeter()
+    for samples in _decode_blocks(path):
+        meter.feed(samples)
+    return {"path": path, "mtime": mtime, "lufs": meter.loudness(), "peak": meter.peak}
+
+
+def analyze_batch(paths):
+    results = []
+    for path in paths:
+        try:
+            results.append(analyze(path))
+        except FileNotFoundError:
+            continue  # Fichier disparu entre-temps (ou FFmpeg absent)
+        except (OSError, RuntimeError, ValueError):
+            # Fichier illisible : enregistré sans mesure pour ne pas le réanalyser à chaque lecture
+            try:
+                results.append({"path": path, "mtime": os.stat(path).st_mtime_ns, "lufs": None, "peak": None})
+            except OSError:
+                continue
+    return results
+
+
+def track_gain(info, target=TARGET_LUFS):
+    """Facteur de volume (0..1) qui amène la piste à `target` sans dépasser 0 dBFS en crête.
+
+    La sortie audio ne peut pas amplifier : une piste plus douce que la cible reste à 1.
+    """
+    if not info or info.get("lufs") is None:
+        return 1.0
+    gain_db = target - info["lufs"]
+    if info.get("peak"):
+        gain_db = min(gain_db, -20 * math.log10(info["peak"]))
+    return min(1.0, 10 ** (gain_db / 20))
+
+
+class LoudnessStore:
+    """Cache des mesures de sonie dans la base de l'index, clé chemin + mtime."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS loudness (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                lufs REAL,
+                peak REAL
+            )
+        """)
+        self.conn.commit()
+
+    def load_folder(self, folder):
+        """Mesures encore valables des pistes indexées sous `folder` : {nom relatif: infos}."""
+        folder = os.path.abspath(folder)
+        rows = self.conn.execute("""
+            SELECT t.path, t.mtime, l.lufs, l.peak
+            FROM tracks t JOIN loudness l ON l.path = t.path AND l.mtime = t.mtime
+            WHERE t.path >= ? AND t.path < ?
+        """, tree_bounds(folder))
+        return {relative_name(folder, path): {"path": path, "mtime": mtime, "lufs": lufs, "peak": peak}
+                for path, mtime, lufs, peak in rows}
+
+    def store(self, infos):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO loudness (path, mtime, lufs, peak) VALUES (?, ?, ?, ?)",
+                [(info["path"], info["mtime"], info["lufs"], info["peak"]) for info in infos]
+            )
@@ -1,614 +1,1599 @@
-import sys
-import os
-import json
-from PyQt6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QComboBox, QSlider, QFrame, QLineEdit,
-    QMessageBox, QFileDialog
-)
-from PyQt6.QtCore import Qt, QUrl, QTime
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
-import yt_dlp
-
-# --- Configurations Globales ---
-PRIMARY_COLOR = "#1DB954"
-BACKGROUND_COLOR = "#121212"
-FOREGROUND_COLOR = "#FFFFFF"
-MILD_GRAY = "#282828"
-
-# Fichier de stockage des playlists
-PLAYLIST_FILE = "playlists.json"
-# Fichier de configuration pour stocker le chemin du dossier audio
-CONFIG_FILE = "config.json"
-DEFAULT_FOLDER_NAME = "Audio files fake spotify"  
-
-
-class MusicPlayer(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Spotify du pauvre (PyQt)")
-        self.setGeometry(100, 100, 400, 850)
-
-        # Assurer que le dossier audio existe
-        self.audio_folder_path = self.ensure_audio_folder()
-        if not self.audio_folder_path:
-            # Si l'utilisateur annule le dialogue, on quitte l'application
-            sys.exit(0)
-
-        # Variables d'état des Playlists
-        self.all_files_in_folder = [f for f in os.listdir(self.audio_folder_path) if f.endswith(".mp3")]
-
-        self.playlists = self.load_playlists()
-
-        if not self.playlists:
-            self.playlists = {"Toutes les pistes": self.all_files_in_folder.copy()}
-
-        self.current_playlist_name = list(self.playlists.keys())[0]
-        self.current_playlist_files = self.playlists[self.current_playlist_name]
-        self.current_track_index = -1
-        self.is_user_seeking = False
-
-        # Initialisation des composants PyQt
-        self.media_player = QMediaPlayer()
-        self.audio_output = QAudioOutput()
-        self.media_player.setAudioOutput(self.audio_output)
-
-        # Connexions
-        self.media_player.positionChanged.connect(self.update_progress)
-        self.media_player.durationChanged.connect(self.update_duration)
-        self.media_player.mediaStatusChanged.connect(self.handle_media_status)
-        self.media_player.playbackStateChanged.connect(self.update_play_pause_button)
-        self.audio_output.volumeChanged.connect(self.on_volume_changed)
-
-        self.setup_ui()
-        self.set_style()
-        self.load_initial_playlist()
-
-        self.update_available_tracks_combo()
-
-    def closeEvent(self, event):
-        """Surcharge l'événement de fermeture pour sauvegarder les playlists."""
-        self.save_playlists()
-        event.accept()
-
-    # NOUVELLE FONCTION DE GESTION DE DOSSIER
-
-    def ensure_audio_folder(self):
-        """Vérifie si le chemin du dossier audio est stocké ou demande à l'utilisateur de le définir."""
-        path = None
-
-        # 1. Tenter de charger le chemin depuis le fichier de configuration
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r') as f:
-                    config = json.load(f)
-                    path = config.get("audio_folder_path")
-                    if path and not os.path.isdir(path):
-                        # Le chemin stocké n'est plus valide, on le réinitialise
-                        QMessageBox.warning(self, "Chemin Invalide",
-                                            f"Le dossier audio stocké ({path}) n'existe plus. Veuillez en sélectionner un nouveau.")
-                        path = None
-            except:
-                path = None  # Fichier corrompu
-
-        # Si le chemin n'est pas défini, demander à l'utilisateur
-        if not path:
-            QMessageBox.information(self, "Configuration Initiale",
-                                    f"Veuillez sélectionner le dossier où seront stockés vos fichiers MP3 et où sera créé le dossier '{DEFAULT_FOLDER_NAME}'.")
-
-            # Ouvrir le dialogue de sélection de dossier
-            selected_directory = QFileDialog.getExistingDirectory(
-                self,
-                "Sélectionner le Dossier Racine pour la Musique",
-                os.path.expanduser("~")  # Démarre dans le répertoire utilisateur
-            )
-
-            if selected_directory:
-                # Créer le sous-dossier dédié
-                path = os.path.join(selected_directory, DEFAULT_FOLDER_NAME)
-                try:
-                    os.makedirs(path, exist_ok=True)
-                    self.save_config({"audio_folder_path": path})
-                    QMessageBox.information(self, "Dossier Créé",
-                                            f"Le dossier audio a été créé avec succès : {path}")
-                except Exception as e:
-                    QMessageBox.critical(self, "Erreur de Création",
-                                         f"Impossible de créer le dossier à : {path}\nErreur: {e}")
-                    return None
-            else:
-                QMessageBox.warning(self, "Annulation", "Configuration annulée. L'application va se fermer.")
-                return None
-
-        return path
-
-    def save_config(self, config_data):
-        """Sauvegarde les données de configuration, notamment le chemin du dossier audio."""
-        try:
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(config_data, f, indent=4)
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur de Sauvegarde Configuration",
-                                 f"Impossible de sauvegarder le fichier de configuration : {e}")
-
-    # SETUP UI
-
-    def set_style(self):
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {BACKGROUND_COLOR};
-                color: {FOREGROUND_COLOR};
-            }}
-            QLabel {{
-                color: {FOREGROUND_COLOR};
-                font-family: Roboto;
-            }}
-            QPushButton {{
-                background-color: {MILD_GRAY};
-                color: {FOREGROUND_COLOR};
-                border: none;
-                padding: 10px;
-                border-radius: 5px;
-            }}
-            QPushButton:hover {{
-                background-color: {PRIMARY_COLOR};
-                color: {BACKGROUND_COLOR};
-            }}
-            QComboBox, QLineEdit {{
-                background-color: {MILD_GRAY};
-                color: {FOREGROUND_COLOR};
-                border: 1px solid {PRIMARY_COLOR};
-                padding: 5px;
-                border-radius: 3px;
-            }}
-            #PlayPauseButton {{ 
-                font-weight: bold;
-            }}
-            #PlayPauseButton[status="Play"] {{
-                background-color: {PRIMARY_COLOR};
-                color: {BACKGROUND_COLOR};
-            }}
-            #PlayPauseButton[status="Pause"] {{
-                background-color: #FF5733; 
-                color: {FOREGROUND_COLOR};
-            }}
-            QFrame#EditFrame {{
-                border: 1px dashed {PRIMARY_COLOR};
-                padding: 10px;
-                margin-top: 20px;
-                margin-bottom: 20px;
-            }}
-            QSlider::groove:horizontal {{
-                border: 1px solid {MILD_GRAY};
-                height: 8px;
-                background: {MILD_GRAY};
-                margin: 2px 0;
-                border-radius: 4px;
-            }}
-            QSlider::handle:horizontal {{
-                background: {PRIMARY_COLOR};
-                border: 1px solid {PRIMARY_COLOR};
-                width: 18px;
-                margin: -5px 0;
-                border-radius: 9px;
-            }}
-            QSlider::sub-page:horizontal {{
-                background: {PRIMARY_COLOR};
-                border-radius: 4px;
-            }}
-        """)
-
-    def setup_ui(self):
-        central_widget = QWidget()
-        main_layout = QVBoxLayout(central_widget)
-        main_layout.setSpacing(15)
-        self.setCentralWidget(central_widget)
-
-        self.status_label = QLabel("Choisissez une playlist et une piste.")
-        self.status_label.setStyleSheet(f"font-size: 14pt; font-weight: bold; color: {PRIMARY_COLOR};")
-        main_layout.addWidget(self.status_label, alignment=Qt.AlignmentFlag.AlignCenter)
-
-        playlist_layout = QHBoxLayout()
-        playlist_layout.addWidget(QLabel("Playlist active:"))
-        self.playlist_combo = QComboBox()
-        self.playlist_combo.addItems(list(self.playlists.keys()))
-        self.playlist_combo.currentTextChanged.connect(self.change_playlist)
-        playlist_layout.addWidget(self.playlist_combo)
-        main_layout.addLayout(playlist_layout)
-
-        files_layout = QHBoxLayout()
-        files_layout.addWidget(QLabel("Piste à jouer:"))
-        self.combo = QComboBox()
-        self.combo.currentTextChanged.connect(self.select_track_from_list)
-        files_layout.addWidget(self.combo)
-        main_layout.addLayout(files_layout)
-
-        edit_frame = QFrame()
-        edit_frame.setObjectName("EditFrame")
-        edit_layout = QVBoxLayout(edit_frame)
-        edit_layout.setSpacing(10)
-
-        new_playlist_layout = QHBoxLayout()
-        self.new_playlist_name_input = QLineEdit()
-        self.new_playlist_name_input.setPlaceholderText("Nom de la nouvelle playlist")
-        self.create_playlist_btn = QPushButton("Créer Playlist")
-        self.create_playlist_btn.clicked.connect(self.create_new_playlist)
-
-        new_playlist_layout.addWidget(self.new_playlist_name_input)
-        new_playlist_layout.addWidget(self.create_playlist_btn)
-        edit_layout.addLayout(new_playlist_layout)
-
-        add_track_layout = QHBoxLayout()
-        add_track_label = QLabel("Piste à ajouter :")
-        self.all_tracks_combo = QComboBox()
-        self.add_track_btn = QPushButton("Ajouter à la Playlist active")
-        self.add_track_btn.clicked.connect(self.add_track_to_current_playlist)
-
-        add_track_layout.addWidget(add_track_label)
-        add_track_layout.addWidget(self.all_tracks_combo)
-        add_track_layout.addWidget(self.add_track_btn)
-        edit_layout.addLayout(add_track_layout)
-
-        download_group = QFrame()
-        download_group.setStyleSheet("background-color: #333333; padding: 10px; border-radius: 5px;")
-        download_layout = QVBoxLayout(download_group)
-        download_layout.addWidget(QLabel("Téléchargement YouTube (MP3):"))
-
-        download_input_layout = QHBoxLayout()
-        self.youtube_url_input = QLineEdit()
-        self.youtube_url_input.setPlaceholderText("Coller l'URL YouTube ici...")
-        self.download_btn = QPushButton("⇩ Télécharger MP3")
-        self.download_btn.clicked.connect(self.download_youtube_mp3)
-
-        download_input_layout.addWidget(self.youtube_url_input)
-        download_input_layout.addWidget(self.download_btn)
-
-        download_layout.addLayout(download_input_layout)
-        edit_layout.addWidget(download_group)
-
-        main_layout.addWidget(edit_frame)
-
-        self.progress_slider = QSlider(Qt.Orientation.Horizontal)
-        self.progress_slider.setRange(0, 100)
-        self.progress_slider.sliderPressed.connect(self.start_seek)
-        self.progress_slider.sliderReleased.connect(self.end_seek)
-        self.progress_slider.sliderMoved.connect(self.seek_preview)
-        main_layout.addWidget(self.progress_slider)
-
-        self.time_label = QLabel("00:00 / 00:00")
-        self.time_label.setStyleSheet("font-size: 18pt; font-weight: bold;")
-        main_layout.addWidget(self.time_label, alignment=Qt.AlignmentFlag.AlignCenter)
-
-        controls_frame = QFrame()
-        controls_layout = QHBoxLayout(controls_frame)
-
-        self.prev_btn = QPushButton("<< Préc.")
-        self.play_pause_btn = QPushButton("▶ PLAY")
-        self.play_pause_btn.setObjectName("PlayPauseButton")
-        self.next_btn = QPushButton("Suiv. >>")
-
-        controls_layout.addWidget(self.prev_btn)
-        controls_layout.addWidget(self.play_pause_btn)
-        controls_layout.addWidget(self.next_btn)
-
-        util_frame = QFrame()
-        util_layout = QHBoxLayout(util_frame)
-        self.stop_btn = QPushButton("■ STOP")
-
-        util_layout.addWidget(self.stop_btn, alignment=Qt.AlignmentFlag.AlignCenter)
-
-        main_layout.addWidget(controls_frame)
-        main_layout.addWidget(util_frame)
-
-        self.volume_slider = QSlider(Qt.Orientation.Horizontal)
-        self.volume_slider.setRange(0, 100)
-        self.volume_slider.setValue(100)
-        self.volume_slider.valueChanged.connect(self.set_volume)
-
-        volume_label = QLabel("Volume:")
-        volume_container = QHBoxLayout()
-        volume_container.addWidget(volume_label)
-        volume_container.addWidget(self.volume_slider)
-        main_layout.addLayout(volume_container)
-
-        self.play_pause_btn.clicked.connect(self.toggle_play_pause)
-        self.prev_btn.clicked.connect(self.prev_track)
-        self.next_btn.clicked.connect(self.next_track)
-        self.stop_btn.clicked.connect(self.stop_track)
-
-    # LOGIQUE DE FILTRAGE DES PISTES DISPONIBLES
-
-    def update_available_tracks_combo(self):
-        """Met à jour la liste déroulante des pistes disponibles pour l'ajout."""
-        self.all_tracks_combo.blockSignals(True)
-        self.all_tracks_combo.clear()
-
-        is_modifiable = self.current_playlist_name != "Toutes les pistes"
-
-        if is_modifiable:
-            tracks_in_active_playlist = set(self.current_playlist_files)
-            available_tracks = [
-                track for track in self.all_files_in_folder
-                if track not in tracks_in_active_playlist
-            ]
-        else:
-            available_tracks = []
-
-        if available_tracks:
-            self.all_tracks_combo.addItems(available_tracks)
-
-        self.add_track_btn.setEnabled(len(available_tracks) > 0 and is_modifiable)
-
-        self.all_tracks_combo.blockSignals(False)
-
-    # FONCTION DE TÉLÉCHARGEMENT YOUTUBE
-
-    def download_youtube_mp3(self):
-        """Télécharge la vidéo YouTube comme fichier MP3 dans le dossier défini."""
-        url = self.youtube_url_input.text().strip()
-
-        if not url:
-            QMessageBox.warning(self, "Erreur", "Veuillez entrer une URL YouTube.")
-            return
-
-        self.status_label.setText("Téléchargement en cours... Veuillez patienter.")
-        self.download_btn.setEnabled(False)
-
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': os.path.join(self.audio_folder_path, '%(title)s.%(ext)s'),
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'quiet': True,
-            'ignoreerrors': True,
-            'noplaylist': True,
-            'ffmpeg_location': 'ffmpeg',
-            'progress_hooks': [self.download_hook],
-        }
-
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                filename_base = ydl.prepare_filename(info).rsplit('.', 1)[0]
-                final_filename = os.path.basename(filename_base + '.mp3')
-
-                ydl.download([url])
-
-            self.status_label.setText(f"Téléchargement réussi : {final_filename}")
-
-            self.refresh_all_file_lists(final_filename)
-            self.youtube_url_input.clear()
-
-        except yt_dlp.utils.DownloadError as e:
-            QMessageBox.critical(self, "Erreur de Téléchargement", f"Erreur yt-dlp : {e}")
-            self.status_label.setText("Échec du téléchargement.")
-        except FileNotFoundError:
-            QMessageBox.critical(self, "Erreur FFmpeg",
-                                 "FFmpeg n'est pas trouvé. Veuillez l'installer et vous assurer qu'il est dans votre PATH.")
-            self.status_label.setText("Échec : FFmpeg manquant.")
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Une erreur inattendue est survenue : {e}")
-            self.status_label.setText("Échec du téléchargement.")
-        finally:
-            self.download_btn.setEnabled(True)
-
-    def download_hook(self, d):
-        if d['status'] == 'downloading':
-            p = d.get('_percent_str', 'N/A')
-            self.status_label.setText(f"Téléchargement en cours : {p}...")
-        elif d['status'] == 'finished':
-            self.status_label.setText("Téléchargement terminé, conversion en MP3...")
-
-    def refresh_all_file_lists(self, new_track_name):
-        if new_track_name not in self.all_files_in_folder:
-            self.all_files_in_folder.append(new_track_name)
-
-        self.playlists["Toutes les pistes"] = self.all_files_in_folder.copy()
-
-        self.save_playlists()
-
-        self.update_available_tracks_combo()
-
-        if self.current_playlist_name == "Toutes les pistes":
-            self.current_playlist_files = self.playlists["Toutes les pistes"]
-            self.update_files_combo()
-            self.combo.setCurrentText(new_track_name)
-
-    # FONCTIONS DE GESTION DE PLAYLIST
-
-    def save_playlists(self):
-        """Sauvegarde les playlists."""
-        try:
-            with open(PLAYLIST_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.playlists, f, indent=4)
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur de Sauvegarde", f"Impossible de sauvegarder les playlists : {e}")
-
-    def load_playlists(self):
-        """Charge les playlists et met à jour 'Toutes les pistes' avec le contenu actuel du dossier."""
-        if os.path.exists(PLAYLIST_FILE):
-            try:
-                with open(PLAYLIST_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    data["Toutes les pistes"] = self.all_files_in_folder.copy()
-                    return data
-            except json.JSONDecodeError:
-                QMessageBox.warning(self, "Erreur de Fichier",
-                                    "Le fichier de playlists est corrompu. Création d'une nouvelle liste.")
-                return None
-            except Exception as e:
-                QMessageBox.critical(self, "Erreur de Chargement", f"Impossible de charger les playlists : {e}")
-                return None
-        return None
-
-    def create_new_playlist(self):
-        name = self.new_playlist_name_input.text().strip()
-
-        if not name or name in self.playlists:
-            QMessageBox.warning(self, "Erreur", "Nom invalide ou déjà existant.")
-            return
-
-        self.playlists[name] = []
-        self.save_playlists()
-
-        self.playlist_combo.addItem(name)
-        self.playlist_combo.setCurrentText(name)
-        self.new_playlist_name_input.clear()
-        self.status_label.setText(f"Playlist '{name}' créée et sélectionnée.")
-
-    def add_track_to_current_playlist(self):
-        selected_track = self.all_tracks_combo.currentText()
-
-        if not selected_track:
-            QMessageBox.warning(self, "Attention", "Aucune piste disponible à ajouter.")
-            return
-
-        if self.current_playlist_name == "Toutes les pistes":
-            QMessageBox.warning(self, "Attention", "Vous ne pouvez pas modifier la playlist 'Toutes les pistes'.")
-            return
-
-        self.current_playlist_files.append(selected_track)
-        self.save_playlists()
-
-        self.update_available_tracks_combo()
-
-        self.update_files_combo()
-        self.status_label.setText(f"Piste ajoutée à '{self.current_playlist_name}'.")
-        self.combo.setCurrentText(selected_track)
-
-        # Fonctions de lecture
-
-    def format_time(self, milliseconds):
-        time_obj = QTime(0, 0, 0)
-        time_obj = time_obj.addMSecs(milliseconds)
-        return time_obj.toString("mm:ss")
-
-    def load_initial_playlist(self):
-        self.update_files_combo()
-        if self.current_playlist_files:
-            self.load_track(0)
-
-    def change_playlist(self, playlist_name):
-        if self.media_player.playbackState() != QMediaPlayer.PlaybackState.StoppedState:
-            self.media_player.stop()
-
-        self.current_playlist_name = playlist_name
-        self.current_playlist_files = self.playlists.get(playlist_name, [])
-        self.current_track_index = -1
-
-        self.update_files_combo()
-        self.update_available_tracks_combo()
-
-        self.status_label.setText(f"Playlist chargée : {playlist_name}")
-
-    def update_files_combo(self):
-        self.combo.blockSignals(True)
-        self.combo.clear()
-        if self.current_playlist_files:
-            self.combo.addItems(self.current_playlist_files)
-            if self.current_playlist_files:
-                self.combo.setCurrentIndex(0)
-        self.combo.blockSignals(False)
-
-    def select_track_from_list(self, track_name):
-        if track_name and track_name in self.current_playlist_files:
-            index = self.current_playlist_files.index(track_name)
-            self.load_track(index)
-
-    def load_track(self, index):
-        if not (0 <= index < len(self.current_playlist_files)): return
-
-        self.current_track_index = index
-        track_name = self.current_playlist_files[index]
-        path_audiofile = os.path.join(self.audio_folder_path, track_name)
-
-        self.status_label.setText(f"Piste sélectionnée : {track_name}")
-        self.combo.setCurrentText(track_name)
-        self.media_player.setSource(QUrl.fromLocalFile(path_audiofile))
-
-    def toggle_play_pause(self):
-        state = self.media_player.playbackState()
-
-        if state == QMediaPlayer.PlaybackState.PlayingState:
-            self.media_player.pause()
-            self.status_label.setText("Pause activée")
-        elif state == QMediaPlayer.PlaybackState.PausedState:
-            self.media_player.play()
-            self.status_label.setText(f"Lecture reprise : {self.current_playlist_files[self.current_track_index]}")
-        elif state == QMediaPlayer.PlaybackState.StoppedState:
-            if self.current_track_index == -1 and self.current_playlist_files:
-                self.load_track(0)
-            elif not self.current_playlist_files:
-                self.status_label.setText("Erreur : La playlist est vide. Ajoutez des pistes manuellement.")
-                return
-
-            self.media_player.play()
-            self.status_label.setText(f"Lecture en cours : {self.current_playlist_files[self.current_track_index]}")
-
-    def update_play_pause_button(self, state):
-        if state == QMediaPlayer.PlaybackState.PlayingState:
-            self.play_pause_btn.setText("⏸ PAUSE")
-            self.play_pause_btn.setProperty("status", "Pause")
-        else:
-            self.play_pause_btn.setText("▶ PLAY")
-            self.play_pause_btn.setProperty("status", "Play")
-        self.play_pause_btn.style().polish(self.play_pause_btn)
-
-    def stop_track(self):
-        self.media_player.stop()
-        self.status_label.setText("Lecture stoppée")
-
-    def next_track(self):
-        if not self.current_playlist_files: return
-        self.current_track_index = (self.current_track_index + 1) % len(self.current_playlist_files)
-        self.load_track(self.current_track_index)
-        self.media_player.play()
-
-    def prev_track(self):
-        if not self.current_playlist_files: return
-        self.current_track_index = (self.current_track_index - 1) % len(self.current_playlist_files)
-        self.load_track(self.current_track_index)
-        self.media_player.play()
-
-    def set_volume(self, volume):
-        self.audio_output.setVolume(volume / 100)
-
-    def on_volume_changed(self, volume):
-        pass
-
-    def update_duration(self, duration):
-        self.progress_slider.setMaximum(duration)
-        self.time_label.setText(f"00:00 / {self.format_time(duration)}")
-
-    def update_progress(self, position):
-        if not self.is_user_seeking:
-            self.progress_slider.setValue(position)
-            self.time_label.setText(f"{self.format_time(position)} / {self.format_time(self.media_player.duration())}")
-
-    def start_seek(self):
-        self.is_user_seeking = True
-
-    def seek_preview(self, position):
-        duration = self.media_player.duration()
-        self.time_label.setText(f"{self.format_time(position)} / {self.format_time(duration)}")
-
-    def end_seek(self):
-        seek_position = self.progress_slider.value()
-        self.media_player.setPosition(seek_position)
-        self.is_user_seeking = False
-
-    def handle_media_status(self, status):
-        if status == QMediaPlayer.MediaStatus.EndOfMedia:
-            print("Piste terminée : passage à la suivante.")
-            self.next_track()
-
-
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    player = MusicPlayer()
-    player.show()
-
-
-    sys.exit(app.exec())
+import sys
+import os
+import json
+import time
+import random
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+    QPushButton, QLabel, QComboBox, QSlider, QFrame, QLineEdit,
+    QMessageBox, QFileDialog, QListWidget, QListWidgetItem, QSpinBox, QListView,
+    QCheckBox, QInputDialog, QDialog
+)
+from PyQt6.QtCore import Qt, QUrl, QTimer, pyqtSignal
+from library import LibraryIndex, LibraryRoots
+from models import LazyListModel, AvailableTracksProxyModel
+from search import TrigramIndex
+from tasks import TaskPool
+from ui_updates import UiUpdateScheduler
+from instrumentation import metrics
+from metadata import MetadataStore, read_metadata_batch, describe, BATCH_SIZE as METADATA_BATCH_SIZE
+import loudness
+from loudness import LoudnessStore, analyze_batch, track_gain, BATCH_SIZE as LOUDNESS_BATCH_SIZE
+from play_queue import PlayQueue
+from readahead import ReadAheadCache, DEFAULT_READAHEAD_TRACKS
+from dedupe import DuplicateFinder, pick_keeper, quarantine, QUARANTINE_DIR
+import waveform
+from waveform import WaveformCache
+from waveform_slider import WaveformSlider
+from playback import GaplessPlayer, DEFAULT_CROSSFADE_MS
+from playlist_store import PlaylistStore, PLAYLIST_SNAPSHOT_FILE, PLAYLIST_JOURNAL_FILE
+from play_stats import PlayStatsStore
+from smart_playlists import SmartPlaylists, parse_rules, format_rules, RULES_HELP, METADATA, PLAYS
+from watcher import LibraryWatcher
+from downloads import (
+    DownloadManager, DEFAULT_MAX_CONCURRENT, DEFAULT_CONCURRENT_FRAGMENTS, RUNNING, FAILED, CANCELLED,
+    is_playlist_url
+)
+
+# --- Configurations Globales ---
+PRIMARY_COLOR = "#1DB954"
+BACKGROUND_COLOR = "#121212"
+FOREGROUND_COLOR = "#FFFFFF"
+MILD_GRAY = "#282828"
+
+# Pistes suivantes dont l'aperçu est calculé à l'avance
+WAVEFORM_PREFETCH = 3
+# Sortie des pistes de la fenêtre « ajoutée < N jours » des playlists intelligentes
+SMART_EXPIRY_CHECK_MS = 60 * 1000
+
+# Fichier de configuration pour stocker le chemin du dossier audio
+CONFIG_FILE = "config.json"
+DEFAULT_FOLDER_NAME = "Audio files fake spotify"  
+
+
+class MusicPlayer(QMainWindow):
+    # Émis une fois, au premier dessin de la fenêtre (mesure du démarrage)
+    first_painted = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Spotify du pauvre (PyQt)")
+        self.setGeometry(100, 100, 400, 850)
+
+        # Assurer que le dossier audio existe
+        self.audio_folder_path = self.ensure_audio_folder()
+        if not self.audio_folder_path:
+            # Si l'utilisateur annule le dialogue, on quitte l'application
+            sys.exit(0)
+
+        self.config = self.load_config()
+        # Mesures de performance : désactivées, elles ne coûtent qu'un test par point de mesure
+        metrics.enabled = self.config.get("instrumentation", False)
+        self.stats_panel = None
+
+        # Index persistant : seul un dossier modifié depuis le dernier lancement est relu
+        self.library = LibraryIndex()
+        # Dossier principal + dossiers ajoutés ({étiquette: chemin}), parcourus en parallèle
+        self.roots = LibraryRoots(self.audio_folder_path, self.config.get("library_roots"))
+
+        # Variables d'état des Playlists
+        # Liste de l'index telle quelle : les dossiers sont relus après le premier affichage
+        self.all_files_in_folder = self.library_names(
+            {root: self.library.cached(root) for root in self.roots.paths()})
+        self.startup_finished = False
+
+        self.playlists = self.load_playlists()
+        # Playlists intelligentes : matérialisées après le premier affichage, puis tenues à jour par événements
+        self.metadata = {}
+        self.track_stats = {}
+        self.play_stats_store = PlayStatsStore(self.library.conn)
+        self.smart_playlists = SmartPlaylists(self.playlists, self.metadata, self.track_stats,
+                                              edit=self.edit_smart_playlist)
+        self.play_counted = False
+
+        self.current_playlist_name = list(self.playlists.keys())[0]
+        self.current_playlist_files = self.playlists[self.current_playlist_name]
+
+        # File de lecture : position, « à suivre », aléatoire (graine fixe : ordre reproductible)
+        if "shuffle_seed" not in self.config:
+            self.config["shuffle_seed"] = random.randrange(2 ** 32)
+            self.save_config(self.config)
+        self.play_queue = PlayQueue(self.current_playlist_files, seed=self.config["shuffle_seed"])
+        self.play_queue.set_shuffle(self.config.get("shuffle", False))
+        self.is_user_seeking = False
+        # Écritures fréquentes (progression, téléchargements) regroupées par trame
+        self.ui_updates = UiUpdateScheduler(parent=self)
+        # Seconde affichée et durée déjà formatée : le texte n'est refait qu'au changement de seconde
+        self.shown_second = None
+        self.duration_text = "00:00"
+
+        # Initialisation des composants PyQt
+        # Deux lecteurs : la piste suivante est préchargée pour enchaîner sans blanc
+        self.media_player = GaplessPlayer(self.config.get("crossfade_ms", DEFAULT_CROSSFADE_MS), self)
+
+        # Connexions
+        self.media_player.positionChanged.connect(self.update_progress)
+        self.media_player.durationChanged.connect(self.update_duration)
+        self.media_player.mediaStatusChanged.connect(self.handle_media_status)
+        self.media_player.playbackStateChanged.connect(self.update_play_pause_button)
+        self.media_player.playbackStateChanged.connect(self.count_play)
+        self.media_player.advanced.connect(self.on_track_advanced)
+
+        # Gestionnaire de téléchargements (pool de threads, hors du thread GUI)
+        self.download_manager = DownloadManager(
+            self.audio_folder_path,
+            self.config.get("max_concurrent_downloads", DEFAULT_MAX_CONCURRENT),
+            native_codec=self.config.get("download_native_codec", False),
+            concurrent_fragments=self.config.get("concurrent_fragments", DEFAULT_CONCURRENT_FRAGMENTS),
+            parent=self
+        )
+        self.download_items = {}
+
+        # Métadonnées (tags, durée, débit) : cache SQLite + lecture en tâche de fond
+        self.metadata_store = MetadataStore(self.library.conn)
+        self.metadata_pool = TaskPool(processes=True, parent=self)
+        self.metadata_pool.finished.connect(self.on_metadata_batch)
+
+        # Sonie des pistes (normalisation du volume) : même principe, décodage complet dans un pool dédié
+        self.loudness = {}
+        self.loudness_store = LoudnessStore(self.library.conn)
+        self.loudness_enabled = loudness.AVAILABLE and self.config.get("loudness_normalization", True)
+        # La moitié des cœurs : le décodage ne doit pas affamer la lecture ni l'interface
+        self.loudness_pool = TaskPool(processes=True, max_workers=max(1, (os.cpu_count() or 2) // 2), parent=self)
+        self.loudness_pool.finished.connect(self.on_loudness_batch)
+
+        # Aperçus de forme d'onde : calculés par un pool, puis lus en mémoire projetée depuis le cache
+        self.waveform_cache = WaveformCache()
+        self.waveform_pool = TaskPool(processes=True, max_workers=2, parent=self)
+        self.waveform_pool.finished.connect(self.on_waveform_ready)
+
+        # Copies locales de la piste en cours et des suivantes (dossier sur un partage réseau) ; 0 Mo : désactivé
+        self.readahead = None
+        readahead_mb = self.config.get("readahead_mb", 0)
+        if readahead_mb > 0:
+            self.readahead = ReadAheadCache(readahead_mb * 1024 * 1024, self.config.get("readahead_spool_dir"), self)
+            self.readahead.loaded.connect(self.on_readahead_loaded)
+            self.media_player.stream_provider = self.readahead.stream_for
+
+        # Recherche de doublons : un thread qui pilote lui-même un pool de processus
+        self.dedupe_pool = TaskPool(parent=self)
+        self.dedupe_pool.finished.connect(self.on_duplicates_found)
+        self.dedupe_pool.failed.connect(self.on_duplicates_failed)
+
+        # Modèles des listes (vues virtualisées, mises à jour ligne par ligne)
+        self.library_model = LazyListModel(self.all_files_in_folder, sorted_items=True,
+                                           describe=self.describe_track, parent=self)
+        self.playlist_model = LazyListModel(describe=self.describe_track, parent=self)
+        self.available_model = AvailableTracksProxyModel(self)
+        self.available_model.setSourceModel(self.library_model)
+        self.playlist_names_model = LazyListModel(list(self.playlists.keys()), parent=self)
+        self.search_model = LazyListModel(describe=self.describe_track, parent=self)
+        # Index de recherche construit à la première frappe, puis tenu à jour
+        self.search_index = None
+
+        self.setup_ui()
+        self.set_style()
+        self.update_files_combo()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.startup_finished:
+            self.startup_finished = True
+            self.first_painted.emit()
+            # Tout le reste attend que la fenêtre soit à l'écran
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Suite du démarrage, après le premier affichage : panneau d'édition, scan, lecteur, tâches de fond."""
+        self.setup_edit_panel()
+        self.scan_library()
+        self.load_initial_playlist()
+
+        self.download_manager.job_added.connect(self.on_download_job_added)
+        self.download_manager.job_changed.connect(self.download_hook)
+        self.download_manager.job_finished.connect(self.on_download_finished)
+        self.download_manager.batch_finished.connect(self.on_import_finished)
+        # Reprend la file et les imports laissés en cours à la dernière fermeture
+        self.download_manager.restore()
+
+        # Les fichiers copiés dans le dossier depuis l'extérieur apparaissent sans redémarrage
+        self.library_watcher = LibraryWatcher(self.library, self.roots, parent=self)
+        self.library_watcher.changes_ready.connect(self.on_library_changed)
+
+        # La fenêtre n'attend jamais la lecture des tags ni l'analyse de sonie
+        self.start_metadata_pipeline()
+        self.start_loudness_pipeline()
+
+        self.rebuild_smart_playlists()
+        self.smart_expiry_timer = QTimer(self)
+        self.smart_expiry_timer.timeout.connect(self.smart_playlists.expire)
+        self.smart_expiry_timer.start(SMART_EXPIRY_CHECK_MS)
+
+    def closeEvent(self, event):
+        """Surcharge l'événement de fermeture pour sauvegarder les playlists."""
+        self.download_manager.shutdown()
+        self.metadata_pool.shutdown()
+        self.loudness_pool.shutdown()
+        self.waveform_pool.shutdown()
+        self.dedupe_pool.shutdown()
+        if self.readahead is not None:
+            self.readahead.close()
+        try:
+            self.playlists.close()
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur de Sauvegarde", f"Impossible de sauvegarder les playlists : {e}")
+        self.library.close()
+        event.accept()
+
+    # NOUVELLE FONCTION DE GESTION DE DOSSIER
+
+    def ensure_audio_folder(self):
+        """Vérifie si le chemin du dossier audio est stocké ou demande à l'utilisateur de le définir."""
+        # 1. Tenter de charger le chemin depuis le fichier de configuration
+        config = self.load_config()
+        path = config.get("audio_folder_path")
+        if path and not os.path.isdir(path):
+            # Le chemin stocké n'est plus valide, on le réinitialise
+            QMessageBox.warning(self, "Chemin Invalide",
+                                f"Le dossier audio stocké ({path}) n'existe plus. Veuillez en sélectionner un nouveau.")
+            path = None
+
+        # Si le chemin n'est pas défini, demander à l'utilisateur
+        if not path:
+            QMessageBox.information(self, "Configuration Initiale",
+                                    f"Veuillez sélectionner le dossier où seront stockés vos fichiers MP3 et où sera créé le dossier '{DEFAULT_FOLDER_NAME}'.")
+
+            # Ouvrir le dialogue de sélection de dossier
+            selected_directory = QFileDialog.getExistingDirectory(
+                self,
+                "Sélectionner le Dossier Racine pour la Musique",
+                os.path.expanduser("~")  # Démarre dans le répertoire utilisateur
+            )
+
+            if selected_directory:
+                # Créer le sous-dossier dédié
+                path = os.path.join(selected_directory, DEFAULT_FOLDER_NAME)
+                try:
+                    os.makedirs(path, exist_ok=True)
+                    config["audio_folder_path"] = path
+                    self.save_config(config)
+                    QMessageBox.information(self, "Dossier Créé",
+                                            f"Le dossier audio a été créé avec succès : {path}")
+                except Exception as e:
+                    QMessageBox.critical(self, "Erreur de Création",
+                                         f"Impossible de créer le dossier à : {path}\nErreur: {e}")
+                    return None
+            else:
+                QMessageBox.warning(self, "Annulation", "Configuration annulée. L'application va se fermer.")
+                return None
+
+        return path
+
+    def load_config(self):
+        """Charge le fichier de configuration (dictionnaire vide s'il est absent ou corrompu)."""
+        if os.path.exists(CONFIG_FILE):
+            try:
+                with open(CONFIG_FILE, 'r') as f:
+                    config = json.load(f)
+                    if isinstance(config, dict):
+                        return config
+            except:
+                pass  # Fichier corrompu
+        return {}
+
+    def save_config(self, config_data):
+        """Sauvegarde les données de configuration, notamment le chemin du dossier audio."""
+        try:
+            with open(CONFIG_FILE, 'w') as f:
+                json.dump(config_data, f, indent=4)
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur de Sauvegarde Configuration",
+                                 f"Impossible de sauvegarder le fichier de configuration : {e}")
+
+    # SETUP UI
+
+    def set_style(self):
+        self.setStyleSheet(f"""
+            QMainWindow {{
+                background-color: {BACKGROUND_COLOR};
+                color: {FOREGROUND_COLOR};
+            }}
+            QLabel {{
+                color: {FOREGROUND_COLOR};
+                font-family: Roboto;
+            }}
+            QPushButton {{
+                background-color: {MILD_GRAY};
+                color: {FOREGROUND_COLOR};
+                border: none;
+                padding: 10px;
+                border-radius: 5px;
+            }}
+            QPushButton:hover {{
+                background-color: {PRIMARY_COLOR};
+                color: {BACKGROUND_COLOR};
+            }}
+            QComboBox, QLineEdit {{
+                background-color: {MILD_GRAY};
+                color: {FOREGROUND_COLOR};
+                border: 1px solid {PRIMARY_COLOR};
+                padding: 5px;
+                border-radius: 3px;
+            }}
+            #PlayPauseButton {{ 
+                font-weight: bold;
+            }}
+            #PlayPauseButton[status="Play"] {{
+                background-color: {PRIMARY_COLOR};
+                color: {BACKGROUND_COLOR};
+            }}
+            #PlayPauseButton[status="Pause"] {{
+                background-color: #FF5733; 
+                color: {FOREGROUND_COLOR};
+            }}
+            QFrame#EditFrame {{
+                border: 1px dashed {PRIMARY_COLOR};
+                padding: 10px;
+                margin-top: 20px;
+                margin-bottom: 20px;
+            }}
+            QSlider::groove:horizontal {{
+                border: 1px solid {MILD_GRAY};
+                height: 8px;
+                background: {MILD_GRAY};
+                margin: 2px 0;
+                border-radius: 4px;
+            }}
+            QSlider::handle:horizontal {{
+                background: {PRIMARY_COLOR};
+                border: 1px solid {PRIMARY_COLOR};
+                width: 18px;
+                margin: -5px 0;
+                border-radius: 9px;
+            }}
+            QSlider::sub-page:horizontal {{
+                background: {PRIMARY_COLOR};
+                border-radius: 4px;
+            }}
+        """)
+
+    def setup_ui(self):
+        central_widget = QWidget()
+        main_layout = QVBoxLayout(central_widget)
+        main_layout.setSpacing(15)
+        self.setCentralWidget(central_widget)
+
+        self.status_label = QLabel("Choisissez une playlist et une piste.")
+        self.status_label.setStyleSheet(f"font-size: 14pt; font-weight: bold; color: {PRIMARY_COLOR};")
+        main_layout.addWidget(self.status_label, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        playlist_layout = QHBoxLayout()
+        playlist_layout.addWidget(QLabel("Playlist active:"))
+        self.playlist_combo = QComboBox()
+        self.playlist_combo.setModel(self.playlist_names_model)
+        self.playlist_combo.currentTextChanged.connect(self.change_playlist)
+        playlist_layout.addWidget(self.playlist_combo)
+        main_layout.addLayout(playlist_layout)
+
+        files_layout = QHBoxLayout()
+        files_layout.addWidget(QLabel("Piste à jouer:"))
+        self.combo = QComboBox()
+        self.combo.currentIndexChanged.connect(self.select_track_from_row)
+        files_layout.addWidget(self.combo)
+        self.rescan_btn = QPushButton("⟳")
+        self.rescan_btn.setToolTip("Rescanner entièrement le dossier audio")
+        self.rescan_btn.clicked.connect(self.rescan_library)
+        files_layout.addWidget(self.rescan_btn)
+        self.dedupe_btn = QPushButton("Doublons")
+        self.dedupe_btn.setToolTip("Chercher les pistes en double (copies et réencodages)")
+        self.dedupe_btn.clicked.connect(self.find_duplicates)
+        files_layout.addWidget(self.dedupe_btn)
+        self.add_root_btn = QPushButton("+ Dossier")
+        self.add_root_btn.setToolTip("Ajouter un autre dossier de musique à la bibliothèque")
+        self.add_root_btn.clicked.connect(self.add_library_root)
+        files_layout.addWidget(self.add_root_btn)
+        main_layout.addLayout(files_layout)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Rechercher une piste...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.on_search_text_changed)
+        main_layout.addWidget(self.search_input)
+
+        self.search_results = QListView()
+        self.search_results.setModel(self.search_model)
+        self.search_results.setMaximumHeight(150)
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.activated.connect(self.on_search_result_activated)
+        self.search_results.hide()
+        main_layout.addWidget(self.search_results)
+
+        queue_layout = QHBoxLayout()
+        self.play_next_btn = QPushButton("Lire ensuite")
+        self.play_next_btn.setToolTip("Lire la piste choisie (recherche ou liste) juste après celle-ci")
+        self.play_next_btn.clicked.connect(self.play_selected_next)
+        self.add_to_queue_btn = QPushButton("Ajouter à la file")
+        self.add_to_queue_btn.clicked.connect(self.add_selected_to_queue)
+        self.shuffle_btn = QPushButton("🔀 Aléatoire")
+        self.shuffle_btn.setCheckable(True)
+        self.shuffle_btn.setChecked(self.play_queue.shuffle)
+        self.shuffle_btn.toggled.connect(self.set_shuffle)
+        queue_layout.addWidget(self.play_next_btn)
+        queue_layout.addWidget(self.add_to_queue_btn)
+        queue_layout.addWidget(self.shuffle_btn)
+        main_layout.addLayout(queue_layout)
+
+        # Panneau d'édition et de téléchargement : construit après le premier affichage
+        self.main_layout = main_layout
+        self.edit_panel_index = main_layout.count()
+        self.edit_frame = None
+
+
+        self.progress_slider = WaveformSlider(PRIMARY_COLOR, "#555555")
+        self.progress_slider.setRange(0, 100)
+        self.progress_slider.sliderPressed.connect(self.start_seek)
+        self.progress_slider.sliderReleased.connect(self.end_seek)
+        self.progress_slider.sliderMoved.connect(self.seek_preview)
+        main_layout.addWidget(self.progress_slider)
+
+        self.time_label = QLabel("00:00 / 00:00")
+        self.time_label.setStyleSheet("font-size: 18pt; font-weight: bold;")
+        self.ui_updates.rates_changed.connect(self.show_update_rates)
+        main_layout.addWidget(self.time_label, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        controls_frame = QFrame()
+        controls_layout = QHBoxLayout(controls_frame)
+
+        self.prev_btn = QPushButton("<< Préc.")
+        self.play_pause_btn = QPushButton("▶ PLAY")
+        self.play_pause_btn.setObjectName("PlayPauseButton")
+        self.next_btn = QPushButton("Suiv. >>")
+
+        controls_layout.addWidget(self.prev_btn)
+        controls_layout.addWidget(self.play_pause_btn)
+        controls_layout.addWidget(self.next_btn)
+
+        util_frame = QFrame()
+        util_layout = QHBoxLayout(util_frame)
+        self.stop_btn = QPushButton("■ STOP")
+
+        util_layout.addWidget(self.stop_btn, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.stats_btn = QPushButton("Stats")
+        self.stats_btn.setToolTip("Mesures de performance (chargements, scans, sauvegardes, téléchargements)")
+        self.stats_btn.clicked.connect(self.show_stats_panel)
+        util_layout.addWidget(self.stats_btn, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        main_layout.addWidget(controls_frame)
+        main_layout.addWidget(util_frame)
+
+        self.volume_slider = QSlider(Qt.Orientation.Horizontal)
+        self.volume_slider.setRange(0, 100)
+        self.volume_slider.setValue(100)
+        self.volume_slider.valueChanged.connect(self.set_volume)
+
+        self.crossfade_spin = QSpinBox()
+        self.crossfade_spin.setRange(0, 12000)
+        self.crossfade_spin.setSingleStep(500)
+        self.crossfade_spin.setSuffix(" ms")
+        self.crossfade_spin.setValue(self.media_player.crossfade_ms)
+        self.crossfade_spin.valueChanged.connect(self.set_crossfade)
+
+        volume_label = QLabel("Volume:")
+        volume_container = QHBoxLayout()
+        volume_container.addWidget(volume_label)
+        volume_container.addWidget(self.volume_slider)
+        self.normalize_check = QCheckBox("Normaliser")
+        self.normalize_check.setToolTip("Égalise le volume perçu des pistes (analyse de sonie en tâche de fond)")
+        self.normalize_check.setEnabled(loudness.AVAILABLE)
+        self.normalize_check.setChecked(self.loudness_enabled)
+        self.normalize_check.toggled.connect(self.set_loudness_normalization)
+        volume_container.addWidget(self.normalize_check)
+        volume_container.addWidget(QLabel("Fondu :"))
+        volume_container.addWidget(self.crossfade_spin)
+        main_layout.addLayout(volume_container)
+
+        self.play_pause_btn.clicked.connect(self.toggle_play_pause)
+        self.prev_btn.clicked.connect(self.prev_track)
+        self.next_btn.clicked.connect(self.next_track)
+        self.stop_btn.clicked.connect(self.stop_track)
+
+    def setup_edit_panel(self):
+        """Création de playlist, ajout de pistes et téléchargements (absent du premier affichage)."""
+        if self.edit_frame is not None:
+            return
+        edit_frame = QFrame()
+        edit_frame.setObjectName("EditFrame")
+        edit_layout = QVBoxLayout(edit_frame)
+        edit_layout.setSpacing(10)
+
+        new_playlist_layout = QHBoxLayout()
+        self.new_playlist_name_input = QLineEdit()
+        self.new_playlist_name_input.setPlaceholderText("Nom de la nouvelle playlist")
+        self.create_playlist_btn = QPushButton("Créer Playlist")
+        self.create_playlist_btn.clicked.connect(self.create_new_playlist)
+        self.create_smart_playlist_btn = QPushButton("Intelligente...")
+        self.create_smart_playlist_btn.setToolTip("Playlist tenue à jour selon des règles (nom, ajout, durée, écoutes)")
+        self.create_smart_playlist_btn.clicked.connect(self.create_smart_playlist)
+
+        new_playlist_layout.addWidget(self.new_playlist_name_input)
+        new_playlist_layout.addWidget(self.create_playlist_btn)
+        new_playlist_layout.addWidget(self.create_smart_playlist_btn)
+        edit_layout.addLayout(new_playlist_layout)
+
+        add_track_layout = QHBoxLayout()
+        add_track_label = QLabel("Piste à ajouter :")
+        self.all_tracks_combo = QComboBox()
+        self.all_tracks_combo.setModel(self.available_model)
+        self.add_track_btn = QPushButton("Ajouter à la Playlist active")
+        self.add_track_btn.clicked.connect(self.add_track_to_current_playlist)
+
+        add_track_layout.addWidget(add_track_label)
+        add_track_layout.addWidget(self.all_tracks_combo)
+        add_track_layout.addWidget(self.add_track_btn)
+        edit_layout.addLayout(add_track_layout)
+
+        download_group = QFrame()
+        download_group.setStyleSheet("background-color: #333333; padding: 10px; border-radius: 5px;")
+        download_layout = QVBoxLayout(download_group)
+        download_layout.addWidget(QLabel("Téléchargement YouTube :"))
+
+        download_input_layout = QHBoxLayout()
+        self.youtube_url_input = QLineEdit()
+        self.youtube_url_input.setPlaceholderText("Coller une ou plusieurs URL YouTube (vidéos ou playlists)...")
+        self.download_btn = QPushButton("⇩ Télécharger")
+        self.download_btn.clicked.connect(self.download_youtube_mp3)
+
+        self.import_file_btn = QPushButton("Importer un fichier...")
+        self.import_file_btn.clicked.connect(self.import_url_file)
+
+        download_input_layout.addWidget(self.youtube_url_input)
+        download_input_layout.addWidget(self.download_btn)
+        download_input_layout.addWidget(self.import_file_btn)
+
+        download_layout.addLayout(download_input_layout)
+
+        self.native_codec_check = QCheckBox("Garder le format d'origine (sans réencodage en MP3)")
+        self.native_codec_check.setChecked(self.download_manager.native_codec)
+        self.native_codec_check.toggled.connect(self.set_native_codec)
+        download_layout.addWidget(self.native_codec_check)
+
+        # File d'attente visible des téléchargements
+        self.download_queue_list = QListWidget()
+        self.download_queue_list.setMaximumHeight(110)
+        download_layout.addWidget(self.download_queue_list)
+
+        download_queue_layout = QHBoxLayout()
+        self.cancel_download_btn = QPushButton("Annuler")
+        self.cancel_download_btn.clicked.connect(self.cancel_selected_download)
+        self.retry_download_btn = QPushButton("Réessayer")
+        self.retry_download_btn.clicked.connect(self.retry_selected_download)
+        self.max_downloads_spin = QSpinBox()
+        self.max_downloads_spin.setRange(1, 8)
+        self.max_downloads_spin.setValue(self.download_manager.max_concurrent)
+        self.max_downloads_spin.valueChanged.connect(self.set_max_concurrent_downloads)
+
+        download_queue_layout.addWidget(self.cancel_download_btn)
+        download_queue_layout.addWidget(self.retry_download_btn)
+        download_queue_layout.addWidget(QLabel("Simultanés :"))
+        download_queue_layout.addWidget(self.max_downloads_spin)
+        download_layout.addLayout(download_queue_layout)
+        edit_layout.addWidget(download_group)
+
+        self.main_layout.insertWidget(self.edit_panel_index, edit_frame)
+        self.edit_frame = edit_frame
+        self.update_available_tracks_combo()
+
+    # LOGIQUE DE FILTRAGE DES PISTES DISPONIBLES
+
+    def update_available_tracks_combo(self):
+        """Met à jour la liste déroulante des pistes disponibles pour l'ajout."""
+        if self.edit_frame is None:
+            return  # Fait à la construction du panneau
+        self.all_tracks_combo.blockSignals(True)
+
+        is_modifiable = self.is_modifiable(self.current_playlist_name)
+        # La playlist teste elle-même l'appartenance : rien à reconstruire au changement de playlist
+        self.available_model.set_excluded(self.current_playlist_files if is_modifiable else None)
+
+        self.update_add_track_button()
+
+        self.all_tracks_combo.blockSignals(False)
+
+    def is_modifiable(self, playlist_name):
+        """'Toutes les pistes' et les playlists intelligentes sont calculées : on n'y ajoute rien à la main."""
+        return not self.playlists.is_computed(playlist_name)
+
+    def update_add_track_button(self):
+        if self.edit_frame is not None:
+            is_modifiable = self.is_modifiable(self.current_playlist_name)
+            self.add_track_btn.setEnabled(is_modifiable and self.available_model.has_rows())
+
+    # FONCTION DE TÉLÉCHARGEMENT YOUTUBE
+
+    def download_youtube_mp3(self):
+        """Ajoute l'URL YouTube à la file de téléchargement (MP3 dans le dossier défini)."""
+        urls = self.youtube_url_input.text().split()
+
+        if not urls:
+            QMessageBox.warning(self, "Erreur", "Veuillez entrer une URL YouTube.")
+            return
+
+        if len(urls) > 1 or is_playlist_url(urls[0]):
+            # Playlist ou liste d'URL : import groupé, rangé dans une playlist du même nom
+            self.download_manager.import_urls(urls)
+        else:
+            self.download_manager.add(urls[0])
+        self.youtube_url_input.clear()
+
+    def import_url_file(self):
+        """Importe un fichier texte d'URL (une par ligne) dans une playlist."""
+        path, _ = QFileDialog.getOpenFileName(self, "Fichier d'URL", "", "Texte (*.txt);;Tous les fichiers (*)")
+        if not path:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.critical(self, "Erreur", f"Impossible de lire le fichier : {e}")
+            return
+        if not urls:
+            QMessageBox.warning(self, "Attention", "Aucune URL dans ce fichier.")
+            return
+
+        default_name = os.path.splitext(os.path.basename(path))[0]
+        name, ok = QInputDialog.getText(self, "Import groupé", "Playlist de destination :", text=default_name)
+        if not ok:
+            return
+        self.download_manager.import_urls(urls, name.strip() or None)
+        self.status_label.setText(f"Import de {len(urls)} URL lancé.")
+
+    def on_import_finished(self, batch):
+        """Range les fichiers d'un import groupé dans sa playlist (une seule sauvegarde)."""
+        names = batch.filenames()
+        name = batch.playlist
+        if not name or not names or not self.is_modifiable(name):
+            self.status_label.setText(f"Import terminé : {len(names)} piste(s).")
+            return
+
+        if name not in self.playlists:
+            self.playlists.create(name)
+            self.playlist_names_model.append(name)
+        tracks = self.playlists[name]
+        new_tracks = [track for track in names if track not in tracks]
+
+        if name == self.current_playlist_name:
+            self.playlist_model.extend(new_tracks)
+            self.play_queue.rows_appended(len(new_tracks))
+            self.preload_next_track()
+            for track in new_tracks:
+                self.available_model.refresh(track)
+            self.update_add_track_button()
+        else:
+            tracks.extend(new_tracks)
+        if new_tracks:
+            self.playlists.record_extend(name, new_tracks)
+            self.smart_playlists.playlist_changed(name, new_tracks)
+        self.save_playlists()
+
+        self.status_label.setText(f"Import terminé : {len(new_tracks)} piste(s) ajoutée(s) à '{name}'.")
+
+    def on_download_job_added(self, job):
+        item = QListWidgetItem(job.describe())
+        item.setData(Qt.ItemDataRole.UserRole, job.id)
+        self.download_queue_list.addItem(item)
+        self.download_items[job.id] = item
+        self.status_label.setText("Téléchargement ajouté à la file.")
+
+    def download_hook(self, job):
+        """Reçoit les changements d'état des téléchargements (signal Qt, thread GUI)."""
+        item = self.download_items.get(job.id)
+        if item is not None:
+            self.ui_updates.set_text(item, job.describe())
+            tooltip = job.error or job.url
+            if item.toolTip() != tooltip:
+                item.setToolTip(tooltip)
+
+        if job.status == RUNNING and job.progress:
+            # Chaque tick de yt-dlp arrive ici : seul le dernier de la trame est affiché
+            self.ui_updates.set_text(self.status_label, f"Téléchargement en cours : {job.progress}")
+        elif job.status == FAILED:
+            metrics.count("downloads.jobs", status="failed")
+            self.ui_updates.cancel(self.status_label)
+            self.status_label.setText("Échec du téléchargement.")
+        elif job.status == CANCELLED:
+            metrics.count("downloads.jobs", status="cancelled")
+            self.ui_updates.cancel(self.status_label)
+            self.status_label.setText("Téléchargement annulé.")
+
+    def on_download_finished(self, job):
+        metrics.count("downloads.jobs", status="finished")
+        self.ui_updates.cancel(self.status_label)
+        self.status_label.setText(f"Téléchargement réussi : {job.filename}")
+        self.refresh_all_file_lists(job.filename)
+
+    def selected_download_id(self):
+        item = self.download_queue_list.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole) if item is not None else None
+
+    def cancel_selected_download(self):
+        job_id = self.selected_download_id()
+        if job_id is not None:
+            self.download_manager.cancel(job_id)
+
+    def retry_selected_download(self):
+        job_id = self.selected_download_id()
+        if job_id is not None:
+            self.download_manager.retry(job_id)
+
+    def set_native_codec(self, checked):
+        self.download_manager.native_codec = checked
+        self.config["download_native_codec"] = checked
+        self.save_config(self.config)
+
+    def set_max_concurrent_downloads(self, value):
+        self.download_manager.set_max_concurrent(value)
+        self.config["max_concurrent_downloads"] = value
+        self.save_config(self.config)
+
+    def refresh_all_file_lists(self, new_track_name):
+        self.record_added([new_track_name])
+        self.add_library_track(new_track_name)
+        self.queue_metadata([self.track_path(new_track_name)])
+        self.queue_loudness([self.track_path(new_track_name)])
+
+        if self.current_playlist_name == "Toutes les pistes":
+            self.select_combo_track(new_track_name)
+
+    # MISE À JOUR INCRÉMENTALE DE LA BIBLIOTHÈQUE
+
+    def on_library_changed(self, added, removed, renamed, rewritten=()):
+        """Applique un lot de changements du dossier audio ; le coût dépend de la taille du lot, pas de la bibliothèque.
+
+        `rewritten` : pistes modifiées sur place, dont les tags, la sonie et l'aperçu sont à refaire.
+        """
+        metrics.count("library.changes", len(added), kind="added")
+        metrics.count("library.changes", len(removed), kind="removed")
+        metrics.count("library.changes", len(renamed), kind="renamed")
+        metrics.count("library.changes", len(rewritten), kind="rewritten")
+        for old_name, new_name in renamed:
+            self.playlists.rename_track(old_name, new_name)
+        # Écoutes et date d'ajout suivent la piste renommée
+        if renamed:
+            self.play_stats_store.rename([(self.track_path(old), self.track_path(new)) for old, new in renamed])
+            for old_name, new_name in renamed:
+                if old_name in self.track_stats:
+                    self.track_stats[new_name] = self.track_stats.pop(old_name)
+        if removed:
+            self.play_stats_store.forget([self.track_path(name) for name in removed])
+        self.record_added(added)
+
+        for name in removed + [old for old, _ in renamed]:
+            self.remove_library_track(name)
+        for name in added + [new for _, new in renamed]:
+            self.add_library_track(name)
+        new_paths = [self.track_path(name) for name in added + [new for _, new in renamed]]
+        self.queue_metadata(new_paths)
+        self.queue_loudness(new_paths)
+        if rewritten:
+            self.invalidate_tracks(rewritten)
+
+        if renamed:
+            self.save_playlists()
+            if self.current_playlist_name != "Toutes les pistes":
+                self.update_files_combo()
+
+        self.status_label.setText(
+            f"Bibliothèque mise à jour : +{len(added)} / -{len(removed)} / {len(renamed)} renommée(s)"
+            f" / {len(rewritten)} modifiée(s)."
+        )
+
+    def invalidate_tracks(self, names):
+        """Pistes réécrites sur place : tags, sonie, aperçu et copie locale sont refaits à partir du fichier."""
+        paths = [self.track_path(name) for name in names]
+        for name in names:
+            # En attendant la nouvelle mesure, la piste est jouée sans correction
+            if self.loudness.pop(name, None) is not None:
+                self.apply_track_gain(name)
+        if self.readahead is not None:
+            for path in paths:
+                self.readahead.discard(path)
+        self.queue_metadata(paths)
+        self.queue_loudness(paths)
+        # L'aperçu en cache est lié au mtime : celui de la piste en cours est recalculé
+        current = self.current_track_name()
+        if current in names:
+            self.show_waveform(current)
+
+    def add_library_track(self, name):
+        # Les vues (pistes, pistes disponibles) suivent via rowsInserted
+        # Une insertion avant la piste affichée décale l'index du combo : ce n'est pas un choix
+        self.combo.blockSignals(True)
+        row = self.library_model.insert_sorted(name)
+        self.combo.blockSignals(False)
+        if row < 0:
+            return
+        if self.current_playlist_files is self.all_files_in_folder:
+            self.play_queue.row_inserted(row)
+            self.preload_next_track()
+        if self.search_index is not None:
+            self.search_index.add(name, *self.search_texts(name))
+        self.smart_playlists.tracks_added([name])
+        if self.current_playlist_name != "Toutes les pistes":
+            self.update_add_track_button()
+
+    def remove_library_track(self, name):
+        self.combo.blockSignals(True)
+        row = self.library_model.remove_text(name)
+        self.combo.blockSignals(False)
+        if row < 0:
+            return
+        if self.current_playlist_files is self.all_files_in_folder:
+            self.play_queue.row_removed(row)
+            self.preload_next_track()
+        self.metadata.pop(name, None)
+        self.loudness.pop(name, None)
+        self.track_stats.pop(name, None)
+        self.smart_playlists.tracks_removed([name])
+        if self.readahead is not None:
+            self.readahead.discard(self.track_path(name))
+        if self.search_index is not None:
+            self.search_index.remove(name)
+        if self.current_playlist_name != "Toutes les pistes":
+            self.update_add_track_button()
+
+    def record_added(self, names):
+        """Date d'ajout des pistes apparues (règle « ajoutée < N » des playlists intelligentes)."""
+        names = [name for name in names if name not in self.track_stats]
+        if not names:
+            return
+        now = int(time.time())
+        self.play_stats_store.record_added([self.track_path(name) for name in names], now)
+        for name in names:
+            self.track_stats[name] = {"added": now, "plays": 0}
+
+    def library_names(self, names_by_root):
+        """Noms de piste de toutes les racines ({racine: noms relatifs}), triés."""
+        names = []
+        for root, relative_names in names_by_root.items():
+            label = self.roots.label_of(root)
+            names.extend(self.roots.name_of(label, name) for name in relative_names)
+        names.sort()
+        return names
+
+    def scan_library(self):
+        """Met la liste issue de l'index à jour avec les dossiers (après le premier affichage)."""
+        if self.config.get("library_cold_scan", False) or not self.all_files_in_folder:
+            # Scan à froid demandé, ou index vide (premier lancement) : liste reconstruite d'un bloc
+            self.reload_library(cold=self.config.get("library_cold_scan", False))
+            return
+        try:
+            changes = self.library.refresh_roots(self.roots.paths())
+        except OSError:
+            return
+        added, removed, renamed, rewritten = [], [], [], []
+        for root, (root_added, root_removed, root_renamed, root_rewritten) in changes.items():
+            label = self.roots.label_of(root)
+            added += [self.roots.name_of(label, name) for name in root_added]
+            removed += [self.roots.name_of(label, name) for name in root_removed]
+            renamed += [(self.roots.name_of(label, old), self.roots.name_of(label, new)) for old, new in root_renamed]
+            rewritten += [self.roots.name_of(label, name) for name in root_rewritten]
+        if added or removed or renamed or rewritten:
+            self.on_library_changed(added, removed, renamed, rewritten)
+
+    def rescan_library(self):
+        """Scan à froid des dossiers de la bibliothèque (tous les fichiers sont relus, en parallèle)."""
+        self.status_label.setText("Scan de la bibliothèque...")
+        QApplication.processEvents()
+
+        self.reload_library(cold=True)
+        self.status_label.setText(f"Bibliothèque rescannée : {len(self.all_files_in_folder)} pistes.")
+
+    def reload_library(self, cold):
+        """Relit la liste complète des dossiers et remplace celle des vues."""
+        self.set_library_names(self.library_names(self.library.scan_roots(self.roots.paths(), cold=cold)))
+
+    def set_library_names(self, names):
+        self.all_files_in_folder = names
+        self.playlists.set_computed("Toutes les pistes", self.all_files_in_folder)
+        self.library_model.set_items(self.all_files_in_folder)
+        self.search_index = None
+        self.start_metadata_pipeline()
+        self.start_loudness_pipeline()
+        if self.smart_playlists.built:
+            self.rebuild_smart_playlists()
+
+        self.update_available_tracks_combo()
+        if self.current_playlist_name == "Toutes les pistes":
+            current = self.play_queue.current()
+            self.current_playlist_files = self.playlists["Toutes les pistes"]
+            self.play_queue.set_tracks(self.current_playlist_files)
+            if current is not None:
+                self.play_queue.jump(self.library_model.row_of(current[1]))
+            self.update_files_combo()
+
+    def add_library_root(self):
+        """Ajoute un dossier de musique : seul ce dossier est parcouru, les autres gardent leur index."""
+        path = QFileDialog.getExistingDirectory(self, "Ajouter un dossier de musique", os.path.expanduser("~"))
+        if not path:
+            return
+        label = self.roots.new_label(path)
+        if not self.roots.add(label, path):
+            QMessageBox.warning(self, "Dossier déjà présent",
+                                f"{path} est déjà dans la bibliothèque (ou contient un de ses dossiers).")
+            return
+        self.config.setdefault("library_roots", {})[label] = self.roots.extra[label]
+        self.save_config(self.config)
+
+        self.status_label.setText(f"Scan de {path}...")
+        QApplication.processEvents()
+        added = self.library_names(self.library.scan_roots([self.roots.extra[label]]))
+        self.set_library_names(sorted(self.all_files_in_folder + added))
+        self.library_watcher.watch_root(self.roots.extra[label])
+        self.status_label.setText(f"Dossier ajouté : {len(added)} piste(s).")
+
+    # DOUBLONS
+
+    def find_duplicates(self):
+        finder = DuplicateFinder(self.library.db_path)
+        if self.dedupe_pool.submit("dedupe", finder.find, self.roots):
+            self.dedupe_btn.setEnabled(False)
+            self.status_label.setText("Recherche de doublons...")
+
+    def on_duplicates_failed(self, key, error):
+        self.dedupe_btn.setEnabled(True)
+        self.status_label.setText("Échec de la recherche de doublons.")
+        QMessageBox.critical(self, "Erreur", f"Recherche de doublons impossible : {error}")
+
+    def on_duplicates_found(self, key, groups):
+        self.dedupe_btn.setEnabled(True)
+        # La bibliothèque a pu changer pendant la recherche
+        groups = [(kind, [name for name in names if self.library_model.row_of(name) >= 0]) for kind, names in groups]
+        groups = [(kind, names) for kind, names in groups if len(names) > 1]
+        if not groups:
+            self.status_label.setText("Aucun doublon trouvé.")
+            return
+
+        sizes = {}
+        for _, names in groups:
+            for name in names:
+                try:
+                    sizes[name] = os.path.getsize(self.track_path(name))
+                except OSError:
+                    sizes[name] = 0
+        plan = [(kind, pick_keeper(names, self.metadata, sizes, self.current_track_name()), names)
+                for kind, names in groups]
+
+        from duplicates_dialog import DuplicatesDialog
+        dialog = DuplicatesDialog(plan, self.describe_track, self)
+        selected = dialog.selected_plan() if dialog.exec() == QDialog.DialogCode.Accepted else []
+        if selected:
+            self.merge_duplicates(selected)
+        else:
+            self.status_label.setText(f"{len(plan)} groupe(s) de doublons trouvé(s).")
+
+    def merge_duplicates(self, plan):
+        """Met de côté les fichiers en trop de chaque groupe, puis réécrit les playlists vers le fichier gardé."""
+        merged = 0
+        failures = []
+        for keeper, names in plan:
+            for name in names:
+                if name == keeper:
+                    continue
+                path = self.track_path(name)
+                try:
+                    quarantine(path, self.roots.root_of(path))
+                except OSError as e:
+                    # Fichier resté en place (ou introuvable) : les playlists gardent leur entrée
+                    failures.append(f"{name} : {e}")
+                    continue
+                self.playlists.rename_track(name, keeper)
+                self.remove_library_track(name)
+                merged += 1
+            # Le fichier gardé a pu entrer dans une playlist exclue par une règle « hors »
+            self.smart_playlists.tracks_added([keeper])
+
+        if merged:
+            self.save_playlists()
+            if self.current_playlist_name != "Toutes les pistes":
+                self.update_files_combo()
+                self.update_available_tracks_combo()
+        if failures:
+            QMessageBox.warning(self, "Doublons", "Fichiers non déplacés :\n" + "\n".join(failures))
+        self.status_label.setText(
+            f"Doublons fusionnés : {merged} fichier(s) déplacé(s) dans « {QUARANTINE_DIR} »."
+        )
+
+    # MÉTADONNÉES
+
+    def start_metadata_pipeline(self):
+        """Charge les tags en cache et envoie les fichiers nouveaux ou modifiés au pool."""
+        for label, root in self.roots.items():
+            cached, stale = self.metadata_store.load_folder(root)
+            self.metadata.update((self.roots.name_of(label, name), info) for name, info in cached.items())
+            self.queue_metadata(stale)
+
+    def queue_metadata(self, paths):
+        for start in range(0, len(paths), METADATA_BATCH_SIZE):
+            batch = paths[start:start + METADATA_BATCH_SIZE]
+            self.metadata_pool.submit(tuple(batch), read_metadata_batch, batch)
+
+    def on_metadata_batch(self, key, infos):
+        self.metadata_store.store(infos)
+        names = []
+        for info in infos:
+            name = self.roots.name_for_path(info["path"])
+            if name is None:
+                continue
+            self.metadata[name] = info
+            names.append(name)
+            if self.search_index is not None and name in self.search_index:
+                self.search_index.add(name, *self.search_texts(name))
+        self.smart_playlists.tracks_changed(names, METADATA)
+
+    def describe_track(self, track_name):
+        return describe(self.metadata.get(track_name))
+
+    def search_texts(self, track_name):
+        info = self.metadata.get(track_name)
+        if not info:
+            return ()
+        return (info["artist"], info["album"], info["title"])
+
+    # NORMALISATION DU VOLUME
+
+    def start_loudness_pipeline(self):
+        """Charge les mesures en cache et analyse le reste de la bibliothèque en tâche de fond."""
+        if not self.loudness_enabled:
+            return
+        for label, root in self.roots.items():
+            self.loudness.update((self.roots.name_of(label, name), info)
+                                 for name, info in self.loudness_store.load_folder(root).items())
+        for name in self.upcoming_track_names():
+            self.apply_track_gain(name)
+        # Les pistes en cours et suivante passent avant le reste de la bibliothèque
+        self.queue_loudness([self.track_path(name) for name in self.upcoming_track_names()])
+        self.queue_loudness([self.track_path(name) for name in self.all_files_in_folder
+                             if name not in self.loudness])
+
+    def queue_loudness(self, paths):
+        if not self.loudness_enabled:
+            return
+        paths = [path for path in paths if self.roots.name_for_path(path) not in self.loudness]
+        for start in range(0, len(paths), LOUDNESS_BATCH_SIZE):
+            batch = paths[start:start + LOUDNESS_BATCH_SIZE]
+            self.loudness_pool.submit(tuple(batch), analyze_batch, batch)
+
+    def on_loudness_batch(self, key, infos):
+        self.loudness_store.store(infos)
+        for info in infos:
+            name = self.roots.name_for_path(info["path"])
+            if name is None:
+                continue
+            self.loudness[name] = info
+            # Piste déjà chargée (en cours ou préchargée) : son gain s'applique dès maintenant
+            self.apply_track_gain(name)
+
+    def upcoming_track_names(self):
+        names = []
+        for entry in (self.play_queue.current(), self.play_queue.peek_next()):
+            if entry is not None:
+                names.append(entry[1])
+        return names
+
+    def apply_track_gain(self, track_name):
+        """Règle le gain de la piste si un lecteur l'a chargée ; jamais d'attente de l'analyse."""
+        gain = track_gain(self.loudness.get(track_name)) if self.loudness_enabled else 1.0
+        self.media_player.set_source_gain(QUrl.fromLocalFile(self.track_path(track_name)), gain)
+
+    def set_loudness_normalization(self, enabled):
+        self.loudness_enabled = enabled
+        self.config["loudness_normalization"] = enabled
+        self.save_config(self.config)
+        if enabled:
+            self.start_loudness_pipeline()
+        for name in self.upcoming_track_names():
+            self.apply_track_gain(name)
+
+    # APERÇU DE LA FORME D'ONDE
+
+    def show_waveform(self, track_name):
+        """Affiche l'aperçu en cache de la piste ; sinon barre simple jusqu'à ce qu'il soit calculé."""
+        if not waveform.AVAILABLE:
+            return
+        path = self.track_path(track_name)
+        self.progress_slider.set_peaks(self.waveform_cache.load(path))
+        self.queue_waveforms([path] + [self.track_path(name)
+                                       for _, name in self.play_queue.peek_upcoming(WAVEFORM_PREFETCH)])
+
+    def queue_waveforms(self, paths):
+        for path in paths:
+            if not self.waveform_cache.has(path):
+                self.waveform_pool.submit(path, waveform.generate, path, self.waveform_cache.cache_dir)
+
+    def on_waveform_ready(self, path, cache_file):
+        if self.current_track_name() is not None and path == self.track_path(self.current_track_name()):
+            self.progress_slider.set_peaks(self.waveform_cache.load(path))
+
+    # RECHERCHE
+
+    def build_search_index(self):
+        self.search_index = TrigramIndex()
+        for name in self.all_files_in_folder:
+            self.search_index.add(name, *self.search_texts(name))
+
+    def on_search_text_changed(self, text):
+        if not text.strip():
+            self.search_results.hide()
+            self.search_model.set_items([])
+            return
+
+        if self.search_index is None:
+            self.build_search_index()
+
+        self.search_model.set_items(self.search_index.search(text))
+        self.search_results.setVisible(True)
+
+    def on_search_result_activated(self, index):
+        """Joue la piste choisie, dans la playlist active si elle y figure, sinon dans 'Toutes les pistes'."""
+        track_name = self.search_model.items()[index.row()]
+
+        if track_name not in self.current_playlist_files:
+            row = self.playlist_names_model.row_of("Toutes les pistes")
+            if row < 0:
+                return
+            self.playlist_combo.setCurrentIndex(row)
+
+        row = self.current_files_model().row_of(track_name)
+        if row >= 0:
+            self.load_track(row)
+            self.media_player.play()
+
+    # MESURES
+
+    def show_stats_panel(self):
+        if self.stats_panel is None:
+            # Le module n'est chargé qu'à la première ouverture
+            from stats_panel import StatsPanel
+            self.stats_panel = StatsPanel(metrics, self, self.readahead)
+            self.stats_panel.enabled_changed.connect(self.set_instrumentation)
+        self.stats_panel.show()
+        self.stats_panel.raise_()
+
+    def set_instrumentation(self, enabled):
+        self.config["instrumentation"] = enabled
+        self.save_config(self.config)
+
+    # FONCTIONS DE GESTION DE PLAYLIST
+
+    def save_playlists(self):
+        """Rend durables les modifications des playlists (journal, compacté périodiquement)."""
+        try:
+            with metrics.span("playlists.save_ms"):
+                self.playlists.save()
+        except Exception as e:
+            QMessageBox.critical(self, "Erreur de Sauvegarde", f"Impossible de sauvegarder les playlists : {e}")
+
+    def load_playlists(self):
+        """Ouvre le stockage des playlists (seule la playlist active sera décodée) et y ajoute 'Toutes les pistes'."""
+        try:
+            playlists = PlaylistStore(computed=("Toutes les pistes",))
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur de Fichier",
+                                f"Le fichier de playlists est corrompu ({e}). Création d'une nouvelle liste.")
+            # On garde les fichiers illisibles de côté plutôt que de les écraser
+            for path in (PLAYLIST_SNAPSHOT_FILE, PLAYLIST_JOURNAL_FILE):
+                if os.path.exists(path):
+                    os.replace(path, path + ".corrompu")
+            playlists = PlaylistStore(legacy_path=None, computed=("Toutes les pistes",))
+
+        playlists.set_computed("Toutes les pistes", self.all_files_in_folder)
+        return playlists
+
+    def create_new_playlist(self):
+        name = self.new_playlist_name_input.text().strip()
+
+        if not name or name in self.playlists:
+            QMessageBox.warning(self, "Erreur", "Nom invalide ou déjà existant.")
+            return
+
+        self.playlists.create(name)
+        self.save_playlists()
+
+        self.playlist_names_model.append(name)
+        row = self.playlist_names_model.row_of(name)
+        self.playlist_names_model.ensure_fetched(row)
+        self.playlist_combo.setCurrentIndex(row)
+        self.new_playlist_name_input.clear()
+        self.status_label.setText(f"Playlist '{name}' créée et sélectionnée.")
+
+    def create_smart_playlist(self):
+        name = self.new_playlist_name_input.text().strip()
+
+        if not name or name in self.playlists:
+            QMessageBox.warning(self, "Erreur", "Nom invalide ou déjà existant.")
+            return
+
+        text, ok = QInputDialog.getText(
+            self, "Playlist intelligente",
+            f"Règles, séparées par « ; » :\n{RULES_HELP}",
+            text="top 25"
+        )
+        if not ok:
+            return
+        try:
+            self.smart_playlists.create(name, parse_rules(text), self.all_files_in_folder)
+        except ValueError as e:
+            QMessageBox.warning(self, "Règles invalides", str(e))
+            return
+        self.save_playlists()
+
+        self.playlist_names_model.append(name)
+        row = self.playlist_names_model.row_of(name)
+        self.playlist_names_model.ensure_fetched(row)
+        self.playlist_combo.setCurrentIndex(row)
+        self.new_playlist_name_input.clear()
+
+    def load_track_stats(self):
+        for label, root in self.roots.items():
+            self.track_stats.update((self.roots.name_of(label, name), stats)
+                                    for name, stats in self.play_stats_store.load_folder(root).items())
+
+    def rebuild_smart_playlists(self):
+        """Matérialise les playlists intelligentes sur toute la bibliothèque (démarrage, rechargement)."""
+        self.load_track_stats()
+        self.smart_playlists.build(self.all_files_in_folder)
+        if self.current_playlist_name in self.smart_playlists:
+            current = self.play_queue.current()
+            self.play_queue.set_tracks(self.current_playlist_files)
+            self.update_files_combo()
+            if current is not None:
+                row = self.playlist_model.row_of(current[1])
+                if row >= 0:
+                    self.play_queue.jump(row)
+                    self.select_combo_row(row)
+                else:
+                    # Sortie de la playlist : la piste en cours continue, hors playlist
+                    self.play_queue.play_next(current[1])
+                    self.play_queue.next()
+            self.preload_next_track()
+
+    def edit_smart_playlist(self, tracks, row, name):
+        """Ligne insérée (ou retirée si `name` est None) dans une playlist intelligente."""
+        if tracks is not self.current_playlist_files:
+            if name is None:
+                del tracks[row]
+            else:
+                tracks.insert(row, name)
+            return
+        # Playlist affichée : le modèle modifie la liste et prévient la vue, la file suit
+        self.combo.blockSignals(True)
+        if name is None:
+            self.playlist_model.remove_row(row)
+            self.play_queue.row_removed(row)
+        else:
+            self.playlist_model.insert_row(row, name)
+            self.play_queue.row_inserted(row)
+        self.combo.blockSignals(False)
+        self.preload_next_track()
+
+    def add_track_to_current_playlist(self):
+        selected_track = self.all_tracks_combo.currentText()
+
+        if not selected_track:
+            QMessageBox.warning(self, "Attention", "Aucune piste disponible à ajouter.")
+            return
+
+        if not self.is_modifiable(self.current_playlist_name):
+            QMessageBox.warning(self, "Attention",
+                                f"Vous ne pouvez pas modifier la playlist '{self.current_playlist_name}' : "
+                                "elle est calculée.")
+            return
+
+        self.playlist_model.append(selected_track)
+        self.play_queue.rows_appended(1)
+        self.preload_next_track()
+        self.playlists.record_append(self.current_playlist_name, selected_track)
+        self.save_playlists()
+        self.smart_playlists.playlist_changed(self.current_playlist_name, [selected_track])
+
+        self.available_model.refresh(selected_track)
+        self.update_add_track_button()
+
+        self.status_label.setText(f"Piste ajoutée à '{self.current_playlist_name}'.")
+        self.select_combo_track(selected_track)
+
+        # Fonctions de lecture
+
+    def format_time(self, milliseconds):
+        # Même rendu que QTime.toString("mm:ss"), sans objet intermédiaire
+        seconds = max(0, milliseconds) // 1000
+        return f"{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+    def load_initial_playlist(self):
+        if self.current_playlist_files and self.play_queue.current() is None:
+            self.load_track(0)
+
+    def change_playlist(self, playlist_name):
+        if not self.media_player.is_stopped():
+            self.media_player.stop()
+
+        self.current_playlist_name = playlist_name
+        self.current_playlist_files = self.playlists.get(playlist_name, [])
+        self.play_queue.set_tracks(self.current_playlist_files)
+        self.media_player.clear_next()
+
+        self.update_files_combo()
+        self.update_available_tracks_combo()
+
+        smart = self.smart_playlists.get(playlist_name)
+        if smart is not None:
+            self.status_label.setText(f"Playlist chargée : {playlist_name} ({format_rules(smart.rules)})")
+        else:
+            self.status_label.setText(f"Playlist chargée : {playlist_name}")
+
+    def current_files_model(self):
+        """'Toutes les pistes' est affichée directement par le modèle de la bibliothèque."""
+        if self.current_playlist_files is self.all_files_in_folder:
+            return self.library_model
+        return self.playlist_model
+
+    def update_files_combo(self):
+        model = self.current_files_model()
+        if model is self.playlist_model:
+            self.playlist_model.set_items(self.current_playlist_files)
+
+        self.combo.blockSignals(True)
+        if self.combo.model() is not model:
+            self.combo.setModel(model)
+        if self.current_playlist_files:
+            self.combo.setCurrentIndex(0)
+        self.combo.blockSignals(False)
+
+    def select_combo_row(self, row):
+        """Sélectionne une ligne du combo des pistes, même si elle n'est pas encore chargée."""
+        self.current_files_model().ensure_fetched(row)
+        self.combo.blockSignals(True)
+        self.combo.setCurrentIndex(row)
+        self.combo.blockSignals(False)
+
+    def select_combo_track(self, track_name):
+        row = self.current_files_model().row_of(track_name)
+        if row >= 0:
+            self.current_files_model().ensure_fetched(row)
+            self.combo.setCurrentIndex(row)
+
+    def select_track_from_row(self, row):
+        """Piste choisie dans la liste : par sa ligne, ce qui distingue les doublons."""
+        if row >= 0:
+            self.load_track(row)
+
+    def track_path(self, track_name):
+        return self.roots.path_of(track_name)
+
+    def load_track(self, index):
+        entry = self.play_queue.jump(index)
+        if entry is not None:
+            self.load_entry(entry)
+
+    def load_entry(self, entry):
+        """Charge une entrée de la file de lecture : (ligne dans la playlist ou None, nom)."""
+        with metrics.span("ui.load_entry_ms"):
+            row, track_name = entry
+            self.play_counted = False
+            path_audiofile = self.track_path(track_name)
+
+            self.status_label.setText(f"Piste sélectionnée : {track_name}")
+            if row is not None:
+                self.select_combo_row(row)
+            self.media_player.setSource(QUrl.fromLocalFile(path_audiofile))
+            # Gain connu : appliqué tout de suite ; sinon la piste est analysée et le gain arrive ensuite
+            self.apply_track_gain(track_name)
+            self.queue_loudness([path_audiofile])
+            self.show_waveform(track_name)
+
+            # Durée connue par les tags : affichée sans attendre durationChanged
+            info = self.metadata.get(track_name)
+            if info and info["duration_ms"]:
+                self.update_duration(info["duration_ms"])
+            self.preload_next_track()
+
+    def preload_next_track(self):
+        """Charge la piste suivante dans le second lecteur pour un enchaînement sans blanc."""
+        self.prefetch_tracks()
+        entry = self.play_queue.peek_next() if self.play_queue.current() is not None else None
+        if entry is None:
+            self.media_player.clear_next()
+            return
+        self.media_player.set_next_source(QUrl.fromLocalFile(self.track_path(entry[1])), entry)
+        self.apply_track_gain(entry[1])
+        self.queue_loudness([self.track_path(entry[1])])
+
+    def prefetch_tracks(self):
+        """Demande au cache de lecture anticipée la piste en cours et les suivantes."""
+        if self.readahead is None:
+            return
+        entries = [self.play_queue.current()] + self.play_queue.peek_upcoming(DEFAULT_READAHEAD_TRACKS - 1)
+        self.readahead.prefetch([self.track_path(entry[1]) for entry in entries if entry is not None])
+
+    def on_readahead_loaded(self, path):
+        # La piste préchargée lisait encore l'original : elle passe sur la copie locale
+        entry = self.play_queue.peek_next() if self.play_queue.current() is not None else None
+        if entry is not None and self.track_path(entry[1]) == path:
+            self.media_player.reload_next()
+
+    def on_track_advanced(self, tag):
+        """Le moteur est passé seul à la piste préchargée : on met l'interface à jour."""
+        if tag is None or tag == self.play_queue.peek_next():
+            row, track_name = self.play_queue.next()
+        else:
+            # La file a changé depuis le préchargement : c'est `tag` qui joue, la file le rejoint
+            row, track_name = tag
+            if row is None or not (0 <= row < len(self.current_playlist_files)) \
+                    or self.current_playlist_files[row] != track_name:
+                row = self.current_files_model().row_of(track_name)
+            if row >= 0:
+                row, track_name = self.play_queue.jump(row)
+            else:
+                # Piste sortie de la playlist entre-temps : jouée hors playlist
+                self.play_queue.play_next(track_name)
+                row, track_name = self.play_queue.next()
+
+        self.status_label.setText(f"Lecture en cours : {track_name}")
+        if row is not None:
+            self.select_combo_row(row)
+        self.show_waveform(track_name)
+        self.play_counted = False
+        self.count_play()
+        self.preload_next_track()
+
+    def count_play(self, *args):
+        """Compte une écoute quand la piste chargée commence à jouer (une fois par chargement)."""
+        track_name = self.current_track_name()
+        if self.play_counted or track_name is None or not self.media_player.is_playing():
+            return
+        self.play_counted = True
+        now = int(time.time())
+        stats = self.track_stats.setdefault(track_name, {"added": now, "plays": 0})
+        stats["plays"] = self.play_stats_store.record_play(self.track_path(track_name), now)
+        self.smart_playlists.tracks_changed([track_name], PLAYS)
+
+    def current_track_name(self):
+        entry = self.play_queue.current()
+        return entry[1] if entry is not None else None
+
+    def selected_track_for_queue(self):
+        """Piste visée par « Lire ensuite » / « Ajouter à la file » : résultat de recherche, sinon la liste."""
+        index = self.search_results.currentIndex()
+        if self.search_results.isVisible() and index.isValid():
+            return None, self.search_model.items()[index.row()]
+        row = self.combo.currentIndex()
+        if row >= 0:
+            return row, self.current_playlist_files[row]
+        return None, None
+
+    def play_selected_next(self):
+        row, track_name = self.selected_track_for_queue()
+        if track_name is None:
+            return
+        self.play_queue.play_next(track_name, row)
+        self.preload_next_track()
+        self.status_label.setText(f"À suivre : {track_name}")
+
+    def add_selected_to_queue(self):
+        row, track_name = self.selected_track_for_queue()
+        if track_name is None:
+            return
+        self.play_queue.add_to_queue(track_name, row)
+        self.preload_next_track()
+        self.status_label.setText(f"Ajoutée à la file ({len(self.play_queue.upcoming())} à suivre) : {track_name}")
+
+    def set_shuffle(self, enabled):
+        self.play_queue.set_shuffle(enabled)
+        self.preload_next_track()
+        self.config["shuffle"] = enabled
+        self.save_config(self.config)
+
+    def toggle_play_pause(self):
+        if self.media_player.is_playing():
+            self.media_player.pause()
+            self.status_label.setText("Pause activée")
+        elif self.media_player.is_paused():
+            self.media_player.play()
+            self.status_label.setText(f"Lecture reprise : {self.current_track_name()}")
+        else:
+            if self.play_queue.current() is None and self.current_playlist_files:
+                self.load_track(0)
+            elif self.play_queue.current() is None:
+                self.status_label.setText("Erreur : La playlist est vide. Ajoutez des pistes manuellement.")
+                return
+
+            self.media_player.play()
+            self.status_label.setText(f"Lecture en cours : {self.current_track_name()}")
+
+    def update_play_pause_button(self, state):
+        # Signal relayé du lecteur actif : son état est déjà `state`
+        if self.media_player.is_playing():
+            self.play_pause_btn.setText("⏸ PAUSE")
+            self.play_pause_btn.setProperty("status", "Pause")
+        else:
+            self.play_pause_btn.setText("▶ PLAY")
+            self.play_pause_btn.setProperty("status", "Play")
+        self.play_pause_btn.style().polish(self.play_pause_btn)
+
+    def stop_track(self):
+        self.media_player.stop()
+        self.status_label.setText("Lecture stoppée")
+
+    def next_track(self):
+        if self.play_queue.peek_next() is None: return
+        if self.media_player.advance_to_next():
+            return
+        self.load_entry(self.play_queue.next())
+        self.media_player.play()
+
+    def prev_track(self):
+        entry = self.play_queue.previous()
+        if entry is None: return
+        self.load_entry(entry)
+        self.media_player.play()
+
+    def set_volume(self, volume):
+        self.media_player.setVolume(volume / 100)
+
+    def set_crossfade(self, value):
+        self.media_player.set_crossfade(value)
+        self.config["crossfade_ms"] = value
+        self.save_config(self.config)
+
+    def update_duration(self, duration):
+        self.progress_slider.setMaximum(duration)
+        self.duration_text = self.format_time(duration)
+        self.shown_second = 0
+        self.ui_updates.cancel(self.time_label)
+        self.time_label.setText(f"00:00 / {self.duration_text}")
+
+    def update_progress(self, position):
+        if self.is_user_seeking:
+            return
+        self.ui_updates.set_value(self.progress_slider, position)
+        second = position // 1000
+        if second != self.shown_second:
+            self.shown_second = second
+            self.ui_updates.set_text(self.time_label, f"{self.format_time(position)} / {self.duration_text}")
+
+    def show_update_rates(self, applied, dropped, redundant):
+        metrics.observe("ui.updates_per_s", applied, kind="applied")
+        metrics.observe("ui.updates_per_s", dropped, kind="dropped")
+        self.time_label.setToolTip(
+            f"Mises à jour de l'affichage : {applied}/s appliquées, {dropped}/s regroupées, {redundant}/s inutiles"
+        )
+
+    def start_seek(self):
+        self.is_user_seeking = True
+        # Une position en attente ferait sauter la poignée pendant le glissement
+        self.ui_updates.cancel(self.progress_slider)
+        self.ui_updates.cancel(self.time_label)
+
+    def seek_preview(self, position):
+        duration = self.media_player.duration()
+        self.time_label.setText(f"{self.format_time(position)} / {self.format_time(duration)}")
+
+    def end_seek(self):
+        seek_position = self.progress_slider.value()
+        self.media_player.setPosition(seek_position)
+        self.is_user_seeking = False
+        self.shown_second = None
+
+    def handle_media_status(self, status):
+        if self.media_player.is_end_of_media(status):
+            print("Piste terminée : passage à la suivante.")
+            self.next_track()
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    player = MusicPlayer()
+    player.show()
+
+
+    sys.exit(app.exec())
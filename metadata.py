@@ -0,0 +1,147 @@
+import os
+from library import tree_bounds, relative_name
+
+try:
+    import mutagen
+except ImportError:
+    # Sans mutagen on se contente des tags ID3v1 (pas de durée ni de débit)
+    mutagen = None
+
+METADATA_FIELDS = ("title", "artist", "album", "duration_ms", "bitrate")
+# Nombre de fichiers lus par tâche envoyée au pool
+BATCH_SIZE = 100
+
+
+def _first(values):
+    if isinstance(values, (list, tuple)):
+        values = values[0] if values else None
+    if values is None:
+        return None
+    return str(values).strip() or None
+
+
+def _read_id3v1(path):
+    with open(path, "rb") as f:
+        try:
+            f.seek(-128, os.SEEK_END)
+        except OSError:
+            return {}
+        tag = f.read(128)
+    if not tag.startswith(b"TAG"):
+        return {}
+
+    def field(raw):
+        return raw.split(b"\0", 1)[0].decode("latin-1").strip() or None
+
+    return {"title": field(tag[3:33]), "artist": field(tag[33:63]), "album": field(tag[63:93])}
+
+
+def read_metadata(path):
+    """Lit les tags et propriétés audio d'un fichier (exécuté dans un processus du pool)."""
+    st = os.stat(path)
+    info = dict.fromkeys(METADATA_FIELDS)
+    info.update(path=path, mtime=st.st_mtime_ns)
+
+    if mutagen is None:
+        info.update(_read_id3v1(path))
+        return info
+
+    try:
+        audio = mutagen.File(path, easy=True)
+    except Exception:
+        audio = None
+    if audio is None:
+        return info
+
+    tags = audio.tags or {}
+    for field in ("title", "artist", "album"):
+        info[field] = _first(tags.get(field))
+    if audio.info is not None:
+        length = getattr(audio.info, "length", 0) or 0
+        bitrate = getattr(audio.info, "bitrate", 0) or 0
+        info["duration_ms"] = int(length * 1000) or None
+        info["bitrate"] = bitrate // 1000 or None
+    return info
+
+
+def read_metadata_batch(paths):
+    results = []
+    for path in paths:
+        try:
+            results.append(read_metadata(path))
+        except OSError:
+            continue  # Fichier disparu entre-temps
+    return results
+
+
+def format_duration(milliseconds):
+    seconds = milliseconds // 1000
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def describe(info):
+    """Texte court pour une info-bulle : « Artiste — Titre · Album · 3:25 · 192 kb/s »."""
+    if not info:
+        return None
+    parts = []
+    if info.get("artist") and info.get("title"):
+        parts.append(f"{info['artist']} — {info['title']}")
+    elif info.get("title"):
+        parts.append(info["title"])
+    if info.get("album"):
+        parts.append(info["album"])
+    if info.get("duration_ms"):
+        parts.append(format_duration(info["duration_ms"]))
+    if info.get("bitrate"):
+        parts.append(f"{info['bitrate']} kb/s")
+    return " · ".join(parts) or None
+
+
+class MetadataStore:
+    """Cache des métadonnées dans la base de l'index, clé chemin + mtime.
+
+    Une entrée n'est valable que si son mtime est celui que l'index connaît pour
+    le fichier : au redémarrage, seuls les fichiers modifiés sont relus.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS metadata (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                title TEXT,
+                artist TEXT,
+                album TEXT,
+                duration_ms INTEGER,
+                bitrate INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    def load_folder(self, folder):
+        """Retourne ({nom relatif: infos} en cache, [chemins à relire]) pour les pistes indexées sous `folder`."""
+        folder = os.path.abspath(folder)
+        cached = {}
+        stale = []
+        rows = self.conn.execute("""
+            SELECT t.path, t.mtime, m.mtime, m.title, m.artist, m.album, m.duration_ms, m.bitrate
+            FROM tracks t LEFT JOIN metadata m ON m.path = t.path
+            WHERE t.path >= ? AND t.path < ?
+        """, tree_bounds(folder))
+        for path, mtime, cached_mtime, *values in rows:
+            if cached_mtime is None or cached_mtime != mtime:
+                stale.append(path)
+            else:
+                info = dict(zip(METADATA_FIELDS, values))
+                info.update(path=path, mtime=cached_mtime)
+                cached[relative_name(folder, path)] = info
+        return cached, stale
+
+    def store(self, infos):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metadata (path, mtime, title, artist, album, duration_ms, bitrate) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(info["path"], info["mtime"]) + tuple(info[field] for field in METADATA_FIELDS) for info in infos]
+            )
@@ -0,0 +1,172 @@
+import bisect
+from PyQt6.QtCore import Qt, QAbstractListModel, QSortFilterProxyModel, QModelIndex
+
+# Nombre de lignes exposées à la vue à chaque fetchMore
+FETCH_BATCH_SIZE = 500
+
+
+class LazyListModel(QAbstractListModel):
+    """Modèle de liste de chaînes chargé par paquets, mis à jour ligne par ligne.
+
+    La liste passée au constructeur n'est pas copiée : le modèle la modifie en place
+    et émet rowsInserted/rowsRemoved pour que les vues ne soient jamais reconstruites.
+    Si `sorted_items` est vrai, la liste est supposée triée (recherche dichotomique).
+    `describe`, s'il est fourni, donne l'info-bulle d'un élément (ex. tags de la piste).
+    """
+
+    def __init__(self, items=None, sorted_items=False, describe=None, parent=None):
+        super().__init__(parent)
+        self.sorted_items = sorted_items
+        self.describe = describe
+        self._items = items if items is not None else []
+        self._fetched = min(len(self._items), FETCH_BATCH_SIZE)
+
+    def items(self):
+        return self._items
+
+    def set_items(self, items):
+        self.beginResetModel()
+        self._items = items
+        self._fetched = min(len(items), FETCH_BATCH_SIZE)
+        self.endResetModel()
+
+    # API Qt
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._fetched
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._fetched:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._items[index.row()]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            text = self._items[index.row()]
+            return (self.describe(text) if self.describe is not None else None) or text
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fetched < len(self._items)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH_SIZE, len(self._items) - self._fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, self._fetched + count - 1)
+        self._fetched += count
+        self.endInsertRows()
+
+    # Accès et modifications incrémentales
+
+    def ensure_fetched(self, row):
+        """Expose au moins les lignes 0..row à la vue (pour sélectionner une ligne encore non chargée)."""
+        if row < self._fetched or row >= len(self._items):
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, row)
+        self._fetched = row + 1
+        self.endInsertRows()
+
+    def row_of(self, text):
+        """Position de `text` dans la liste, ou -1."""
+        if self.sorted_items:
+            row = bisect.bisect_left(self._items, text)
+            return row if row < len(self._items) and self._items[row] == text else -1
+        try:
+            return self._items.index(text)
+        except ValueError:
+            return -1
+
+    def insert_row(self, row, text):
+        if row <= self._fetched:
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._items.insert(row, text)
+            self._fetched += 1
+            self.endInsertRows()
+        else:
+            # Ligne pas encore chargée par la vue : aucun signal nécessaire
+            self._items.insert(row, text)
+
+    def remove_row(self, row):
+        if row < self._fetched:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._items[row]
+            self._fetched -= 1
+            self.endRemoveRows()
+        else:
+            del self._items[row]
+
+    def append(self, text):
+        self.insert_row(len(self._items), text)
+
+    def extend(self, texts):
+        """Ajoute plusieurs éléments à la fin en une seule notification."""
+        if not texts:
+            return
+        start = len(self._items)
+        if start == self._fetched:
+            self.beginInsertRows(QModelIndex(), start, start + len(texts) - 1)
+            self._items.extend(texts)
+            self._fetched += len(texts)
+            self.endInsertRows()
+        else:
+            self._items.extend(texts)
+
+    def insert_sorted(self, text):
+        """Insère `text` à sa place dans une liste triée ; retourne la ligne, ou -1 s'il y est déjà."""
+        row = bisect.bisect_left(self._items, text)
+        if row < len(self._items) and self._items[row] == text:
+            return -1
+        self.insert_row(row, text)
+        return row
+
+    def remove_text(self, text):
+        """Retire `text` ; retourne son ancienne ligne, ou -1 s'il était absent."""
+        row = self.row_of(text)
+        if row >= 0:
+            self.remove_row(row)
+        return row
+
+    def notify_changed(self, row):
+        if row < self._fetched:
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index)
+
+
+class AvailableTracksProxyModel(QSortFilterProxyModel):
+    """Pistes de la bibliothèque absentes de la playlist active.
+
+    Le conteneur exclu (la playlist elle-même, qui sait tester l'appartenance) est
+    tenu à jour par l'appelant ; `refresh` ne réévalue que la ligne concernée,
+    jamais toute la bibliothèque.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # None : aucune piste disponible (playlist non modifiable)
+        self._excluded = None
+
+    def set_excluded(self, excluded):
+        """Change de playlist active : seul cas où tout le filtre est recalculé."""
+        self._excluded = excluded
+        self.invalidateFilter()
+
+    def refresh(self, text):
+        """`text` vient d'entrer dans le conteneur exclu ou d'en sortir."""
+        if self._excluded is not None:
+            self._notify_source(text)
+
+    def has_rows(self):
+        return self.rowCount() > 0 or self.canFetchMore(QModelIndex())
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self._excluded is None:
+            return False
+        return self.sourceModel().items()[source_row] not in self._excluded
+
+    def _notify_source(self, text):
+        source = self.sourceModel()
+        row = source.row_of(text)
+        if row >= 0:
+            source.notify_changed(row)
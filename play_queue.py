@@ -0,0 +1,211 @@
+import random
+from collections import deque
+
+# Nombre de pistes jouées gardées pour « précédent »
+HISTORY_SIZE = 200
+
+
+class PlayQueue:
+    """File de lecture indépendante de Qt : playlist en cours, file « à suivre » et historique.
+
+    Une entrée est un couple (ligne dans la playlist, nom de la piste) ; la ligne est
+    None pour une piste ajoutée à la file qui ne vient pas de la playlist en cours.
+    L'ordre aléatoire est une permutation calculée une fois (reproductible avec
+    `seed`) et son inverse : sauter, avancer et reculer coûtent O(1). Une piste
+    ajoutée y prend une place au hasard après la piste en cours, une piste retirée
+    en sort : ce qui a déjà été joué ne bouge pas.
+    La liste `tracks` n'est pas copiée ; l'appelant signale ses modifications
+    par `row_inserted` / `row_removed` / `rows_appended`.
+    """
+
+    def __init__(self, tracks=None, seed=None, history_size=HISTORY_SIZE):
+        self.tracks = tracks if tracks is not None else []
+        self.seed = seed
+        self.shuffle = False
+        self._order = None
+        self._position_of = None
+        self._random = None
+        self._position = -1
+        self._current = None
+        self._upcoming = deque()
+        self._history = deque(maxlen=history_size)
+
+    # Lecture de l'état
+
+    def current(self):
+        return self._current
+
+    def upcoming(self):
+        return list(self._upcoming)
+
+    def history(self):
+        return list(self._history)
+
+    def peek_next(self):
+        """Entrée que `next()` retournera (pour précharger), sans rien changer."""
+        if self._upcoming:
+            return self._checked(self._upcoming[0])
+        if not self.tracks:
+            return None
+        row = self._row_at((self._position + 1) % len(self.tracks))
+        return row, self.tracks[row]
+
+    def peek_upcoming(self, count):
+        """Les `count` prochaines entrées que `next()` retournera, dans l'ordre (pour précharger)."""
+        entries = [self._checked(entry) for entry in list(self._upcoming)[:count]]
+        if self.tracks:
+            position = self._position
+            for _ in range(min(count - len(entries), len(self.tracks))):
+                position = (position + 1) % len(self.tracks)
+                row = self._row_at(position)
+                entries.append((row, self.tracks[row]))
+        return entries
+
+    # Navigation
+
+    def set_tracks(self, tracks):
+        """Change de playlist : la file « à suivre » est gardée, l'historique non."""
+        self.tracks = tracks
+        self._position = -1
+        self._current = None
+        self._history.clear()
+        self._rebuild_order()
+
+    def jump(self, row):
+        if not (0 <= row < len(self.tracks)):
+            return None
+        self._position = self._position_of[row] if self._order is not None else row
+        return self._set_current((row, self.tracks[row]))
+
+    def next(self):
+        if self._upcoming:
+            entry = self._checked(self._upcoming.popleft())
+            if entry[0] is not None:
+                # Piste de la playlist : la suite reprend après elle
+                self._position = self._position_of[entry[0]] if self._order is not None else entry[0]
+            return self._set_current(entry)
+        if not self.tracks:
+            return None
+        self._position = (self._position + 1) % len(self.tracks)
+        row = self._row_at(self._position)
+        return self._set_current((row, self.tracks[row]))
+
+    def previous(self):
+        if self._history:
+            entry = self._checked(self._history.pop())
+            if entry[0] is not None:
+                self._position = self._position_of[entry[0]] if self._order is not None else entry[0]
+            self._current = entry
+            return entry
+        if not self.tracks:
+            return None
+        self._position = (self._position - 1) % len(self.tracks)
+        row = self._row_at(self._position)
+        self._current = (row, self.tracks[row])
+        return self._current
+
+    # File « à suivre »
+
+    def play_next(self, track, row=None):
+        self._upcoming.appendleft((row, track))
+
+    def add_to_queue(self, track, row=None):
+        self._upcoming.append((row, track))
+
+    def clear_queue(self):
+        self._upcoming.clear()
+
+    # Aléatoire
+
+    def set_shuffle(self, enabled, seed=None):
+        """Active l'ordre aléatoire ; la piste en cours garde sa place, la suite suit la permutation."""
+        if seed is not None:
+            self.seed = seed
+        self.shuffle = enabled
+        self._rebuild_order()
+        if self._current is not None and self._current[0] is not None:
+            row = self._current[0]
+            self._position = self._position_of[row] if self._order is not None else row
+
+    # Modifications de la playlist
+
+    def rows_appended(self, count):
+        """`count` pistes ont été ajoutées à la fin de `tracks`."""
+        if self._order is None or count <= 0:
+            return
+        start = len(self._order)
+        for row in range(start, start + count):
+            self._order.insert(self._random_position(), row)
+        self._index_order()
+
+    def row_inserted(self, row):
+        if self._current is not None and self._current[0] is not None and self._current[0] >= row:
+            self._current = (self._current[0] + 1, self._current[1])
+        if self._order is None:
+            if self._position >= row:
+                self._position += 1
+        else:
+            self._order = [other + 1 if other >= row else other for other in self._order]
+            self._order.insert(self._random_position(), row)
+            self._index_order()
+            self._sync_position()
+
+    def row_removed(self, row):
+        if self._current is not None and self._current[0] is not None:
+            if self._current[0] == row:
+                self._current = (None, self._current[1])
+            elif self._current[0] > row:
+                self._current = (self._current[0] - 1, self._current[1])
+        if self._order is None:
+            if self._position >= row:
+                self._position -= 1
+        else:
+            position = self._position_of[row]
+            del self._order[position]
+            if position <= self._position:
+                # Piste déjà jouée (ou en cours) : la suivante reste la même
+                self._position -= 1
+            self._order = [other - 1 if other > row else other for other in self._order]
+            self._index_order()
+            self._sync_position()
+
+    # Interne
+
+    def _set_current(self, entry):
+        if self._current is not None:
+            self._history.append(self._current)
+        self._current = entry
+        return entry
+
+    def _checked(self, entry):
+        """L'entrée, sans sa ligne si la playlist a changé depuis qu'elle a été enregistrée."""
+        row, track = entry
+        if row is not None and (row >= len(self.tracks) or self.tracks[row] != track):
+            return None, track
+        return entry
+
+    def _row_at(self, position):
+        return self._order[position] if self._order is not None else position
+
+    def _rebuild_order(self):
+        if not self.shuffle:
+            self._order = None
+            self._position_of = None
+            return
+        self._random = random.Random(self.seed)
+        self._order = list(range(len(self.tracks)))
+        self._random.shuffle(self._order)
+        self._index_order()
+
+    def _index_order(self):
+        self._position_of = [0] * len(self._order)
+        for position, row in enumerate(self._order):
+            self._position_of[row] = position
+
+    def _random_position(self):
+        """Place d'une nouvelle piste dans l'ordre aléatoire : n'importe où après la position courante."""
+        return self._random.randint(self._position + 1, len(self._order))
+
+    def _sync_position(self):
+        if self._current is not None and self._current[0] is not None:
+            self._position = self._position_of[self._current[0]]
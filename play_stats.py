@@ -0,0 +1,71 @@
+import os
+import time
+from library import tree_bounds, relative_name
+
+NS_PER_SECOND = 1_000_000_000
+
+
+class PlayStatsStore:
+    """Date d'ajout et nombre d'écoutes des pistes, dans la base de l'index (clé chemin).
+
+    Contrairement aux tags, ces valeurs ne se recalculent pas depuis le fichier :
+    elles suivent la piste quand elle est renommée ou déplacée.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS play_stats (
+                path TEXT PRIMARY KEY,
+                added INTEGER NOT NULL,
+                plays INTEGER NOT NULL DEFAULT 0,
+                last_played INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    def load_folder(self, folder, now=None):
+        """{nom relatif: {"added", "plays"}} des pistes indexées sous `folder`.
+
+        Une piste encore inconnue (bibliothèque d'avant le suivi des ajouts) reçoit
+        la date de son fichier, ramenée à `now` si elle est dans le futur.
+        """
+        folder = os.path.abspath(folder)
+        now = int(now if now is not None else time.time())
+        low, high = tree_bounds(folder)
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR IGNORE INTO play_stats (path, added, plays)
+                SELECT path, MIN(mtime / ?, ?), 0 FROM tracks WHERE path >= ? AND path < ?
+            """, (NS_PER_SECOND, now, low, high))
+        rows = self.conn.execute("""
+            SELECT t.path, s.added, s.plays
+            FROM tracks t JOIN play_stats s ON s.path = t.path
+            WHERE t.path >= ? AND t.path < ?
+        """, (low, high))
+        return {relative_name(folder, path): {"added": added, "plays": plays} for path, added, plays in rows}
+
+    def record_added(self, paths, when):
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO play_stats (path, added, plays) VALUES (?, ?, 0)",
+                                  [(path, int(when)) for path in paths])
+
+    def record_play(self, path, when):
+        """Compte une écoute de `path` ; retourne le nouveau total."""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO play_stats (path, added, plays, last_played) VALUES (?, ?, 1, ?)
+                ON CONFLICT(path) DO UPDATE SET plays = plays + 1, last_played = excluded.last_played
+            """, (path, int(when), int(when)))
+        return self.conn.execute("SELECT plays FROM play_stats WHERE path = ?", (path,)).fetchone()[0]
+
+    def rename(self, pairs):
+        """Reporte les statistiques sur le nouveau chemin de chaque (ancien, nouveau)."""
+        with self.conn:
+            for old, new in pairs:
+                self.conn.execute("DELETE FROM play_stats WHERE path = ?", (new,))
+                self.conn.execute("UPDATE play_stats SET path = ? WHERE path = ?", (new, old))
+
+    def forget(self, paths):
+        with self.conn:
+            self.conn.executemany("DELETE FROM play_stats WHERE path = ?", [(path,) for path in paths])
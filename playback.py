@@ -0,0 +1,340 @@
+import time
+from collections import deque
+from PyQt6.QtCore import QObject, QTimer, QUrl, pyqtSignal
+from instrumentation import metrics
+
+DEFAULT_CROSSFADE_MS = 0
+FADE_STEP_MS = 40
+# Nombre de mesures de latence de changement de piste conservées
+LATENCY_HISTORY = 100
+
+
+def _multimedia():
+    """PyQt6.QtMultimedia, importé à la création des lecteurs : le charger au démarrage retarde la fenêtre."""
+    from PyQt6 import QtMultimedia
+    return QtMultimedia
+
+
+class _Deck:
+    """Un lecteur et sa sortie audio : la piste en cours ou la suivante préchargée."""
+
+    def __init__(self, parent):
+        multimedia = _multimedia()
+        self.player = multimedia.QMediaPlayer(parent)
+        self.output = multimedia.QAudioOutput(parent)
+        self.player.setAudioOutput(self.output)
+        self.fade = 1.0
+        # Gain propre à la piste chargée (normalisation du volume)
+        self.gain = 1.0
+        self.tag = None
+        # URL de la piste, même quand le lecteur lit une copie locale ; `stream` garde cette copie ouverte
+        self.url = QUrl()
+        self.stream = None
+
+    def load(self, url, stream=None):
+        """Charge `url`, ou à sa place `stream` : un QIODevice ou l'URL d'une copie locale."""
+        if isinstance(stream, QUrl):
+            self.player.setSource(stream)
+        elif stream is not None:
+            self.player.setSourceDevice(stream, url)
+        else:
+            self.player.setSource(url)
+        # Remplacé après le changement de source : l'ancien périphérique n'est plus lu
+        self.url = url
+        self.stream = stream
+
+    def is_ready(self):
+        status = _multimedia().QMediaPlayer.MediaStatus
+        return self.player.mediaStatus() in (status.LoadedMedia, status.BufferedMedia)
+
+
+class GaplessPlayer(QObject):
+    """Moteur de lecture à deux lecteurs : la piste suivante est préchargée pendant la lecture.
+
+    Expose le sous-ensemble de l'API de QMediaPlayer utilisé par la fenêtre. En fin de
+    piste (ou `crossfade_ms` avant la fin), le lecteur de réserve prend le relais sans
+    rouvrir de fichier, puis `advanced` est émis avec l'étiquette passée à `set_next_source`.
+    Les lecteurs (et donc le backend multimédia) ne sont créés qu'au premier chargement.
+    `stream_provider(url)`, s'il est défini, peut fournir une copie locale de la piste
+    (voir `ReadAheadCache.stream_for`) ; il n'est appelé qu'aux vrais chargements.
+    """
+
+    positionChanged = pyqtSignal(int)
+    durationChanged = pyqtSignal(int)
+    mediaStatusChanged = pyqtSignal(object)
+    playbackStateChanged = pyqtSignal(object)
+    advanced = pyqtSignal(object)
+
+    def __init__(self, crossfade_ms=DEFAULT_CROSSFADE_MS, parent=None):
+        super().__init__(parent)
+        self.crossfade_ms = crossfade_ms
+        self.volume = 1.0
+        self._deck_pair = None
+        self.stream_provider = None
+        self._active = 0
+        self._fading_out = None
+        self._fade_start = 0.0
+        # (url, étiquette) demandée pendant un fondu, chargée dans le lecteur qui s'éteint à la fin du fondu
+        self._pending_next = None
+
+        # Mesures : (type de changement, latence en ms) jusqu'à ce que le son progresse réellement
+        self.switch_latencies = deque(maxlen=LATENCY_HISTORY)
+        self._switch_started = None
+        self._switch_kind = None
+        self._source_not_played = False
+        # Jeton de la mesure setSource → média chargé (None si les mesures sont désactivées)
+        self._load_started = None
+
+        self.fade_timer = QTimer(self)
+        self.fade_timer.setInterval(FADE_STEP_MS)
+        self.fade_timer.timeout.connect(self._fade_step)
+
+    @property
+    def _decks(self):
+        if self._deck_pair is None:
+            # Initialiser le backend (FFmpeg, périphériques audio) coûte cher : fait au premier besoin
+            self._deck_pair = [_Deck(self), _Deck(self)]
+            for index, deck in enumerate(self._deck_pair):
+                deck.player.positionChanged.connect(lambda position, i=index: self._on_position(i, position))
+                deck.player.durationChanged.connect(lambda duration, i=index: self._on_duration(i, duration))
+                deck.player.mediaStatusChanged.connect(lambda status, i=index: self._on_media_status(i, status))
+                deck.player.playbackStateChanged.connect(lambda state, i=index: self._on_playback_state(i, state))
+            self._apply_volumes()
+        return self._deck_pair
+
+    def is_created(self):
+        return self._deck_pair is not None
+
+    @property
+    def active(self):
+        return self._decks[self._active]
+
+    @property
+    def standby(self):
+        return self._decks[1 - self._active]
+
+    # API de type QMediaPlayer
+
+    def setSource(self, url):
+        self._finish_fade()
+        self._switch_started = None
+        self._source_not_played = True
+        self._load_started = metrics.start()
+        self.active.tag = None
+        self.active.gain = 1.0
+        self._load(self.active, url)
+
+    def play(self):
+        if self._source_not_played:
+            # La mesure d'un changement manuel part du premier play() après setSource
+            self._source_not_played = False
+            self._start_switch_measure("manuel")
+        self.active.player.play()
+
+    def pause(self):
+        self._finish_fade()
+        self.active.player.pause()
+
+    def stop(self):
+        if not self.is_created():
+            return
+        self._finish_fade()
+        self._switch_started = None
+        self.active.player.stop()
+
+    def playbackState(self):
+        if not self.is_created():
+            return _multimedia().QMediaPlayer.PlaybackState.StoppedState
+        return self.active.player.playbackState()
+
+    # États testés sans que l'appelant importe QtMultimedia
+
+    def is_playing(self):
+        return self.is_created() and self.playbackState() == _multimedia().QMediaPlayer.PlaybackState.PlayingState
+
+    def is_paused(self):
+        return self.is_created() and self.playbackState() == _multimedia().QMediaPlayer.PlaybackState.PausedState
+
+    def is_stopped(self):
+        return not self.is_created() or self.playbackState() == _multimedia().QMediaPlayer.PlaybackState.StoppedState
+
+    @staticmethod
+    def is_end_of_media(status):
+        return status == _multimedia().QMediaPlayer.MediaStatus.EndOfMedia
+
+    def duration(self):
+        return self.active.player.duration() if self.is_created() else 0
+
+    def position(self):
+        return self.active.player.position() if self.is_created() else 0
+
+    def setPosition(self, position):
+        self._finish_fade()
+        self.active.player.setPosition(position)
+
+    def setVolume(self, volume):
+        self.volume = volume
+        self._apply_volumes()
+
+    def set_source_gain(self, url, gain):
+        """Gain (0..1) de la piste `url`, sur le lecteur qui l'a chargée (active ou préchargée)."""
+        if not self.is_created():
+            return
+        for deck in self._decks:
+            if deck.url == url and deck.gain != gain:
+                deck.gain = gain
+                self._apply_volumes()
+
+    # Préchargement et fondu
+
+    def set_next_source(self, url, tag=None):
+        """Précharge la piste suivante dans le lecteur de réserve (à la fin du fondu s'il en sort encore)."""
+        deck = self.standby
+        if deck is self._fading_out:
+            self._pending_next = (url, tag)
+            return
+        deck.tag = tag
+        if deck.url != url:
+            deck.gain = 1.0
+            deck.player.stop()
+            self._load(deck, url)
+
+    def reload_next(self):
+        """Recharge la piste préchargée, par exemple quand sa copie locale vient d'être prête."""
+        if not self.is_created():
+            return
+        deck = self.standby
+        if deck is self._fading_out or deck.url.isEmpty():
+            return
+        deck.player.stop()
+        self._load(deck, deck.url)
+
+    def clear_next(self):
+        if not self.is_created():
+            return
+        deck = self.standby
+        if deck is self._fading_out:
+            self._pending_next = None
+            return
+        deck.tag = None
+        deck.player.stop()
+        deck.load(QUrl())
+
+    def _load(self, deck, url):
+        stream = self.stream_provider(url) if self.stream_provider is not None and not url.isEmpty() else None
+        deck.load(url, stream)
+
+    def set_crossfade(self, crossfade_ms):
+        self.crossfade_ms = max(0, crossfade_ms)
+
+    def advance_to_next(self):
+        """Passe tout de suite à la piste préchargée ; False si elle n'est pas prête."""
+        if not self._can_advance():
+            return False
+        self._advance("manuel")
+        return True
+
+    def last_switch_latency_ms(self):
+        return self.switch_latencies[-1][1] if self.switch_latencies else None
+
+    def _can_advance(self):
+        return self.standby.tag is not None and self.standby.is_ready() and self._fading_out is None
+
+    def _advance(self, kind):
+        """Bascule sur le lecteur de réserve (déjà chargé) et le démarre."""
+        self._source_not_played = False
+        self._start_switch_measure(kind)
+        old = self.active
+        self._active = 1 - self._active
+        new = self.active
+
+        if kind == "fondu":
+            self._fading_out = old
+            self._fade_start = time.monotonic()
+            new.fade = 0.0
+            self.fade_timer.start()
+        else:
+            old.player.stop()
+            new.fade = 1.0
+        self._apply_volumes()
+
+        new.player.setPosition(0)
+        new.player.play()
+        self.durationChanged.emit(new.player.duration())
+        self.advanced.emit(new.tag)
+
+    def _fade_step(self):
+        if self._fading_out is None:
+            self.fade_timer.stop()
+            return
+        progress = (time.monotonic() - self._fade_start) * 1000 / max(1, self.crossfade_ms)
+        if progress >= 1.0:
+            self._finish_fade()
+            return
+        self.active.fade = progress
+        self._fading_out.fade = 1.0 - progress
+        self._apply_volumes()
+
+    def _finish_fade(self):
+        if self._fading_out is None:
+            return
+        self.fade_timer.stop()
+        deck = self._fading_out
+        deck.player.stop()
+        deck.fade = 1.0
+        # La piste qui vient de s'éteindre ne doit pas être reprise comme « suivante »
+        deck.tag = None
+        self._fading_out = None
+        self.active.fade = 1.0
+        self._apply_volumes()
+        pending, self._pending_next = self._pending_next, None
+        if pending is not None:
+            self.set_next_source(*pending)
+
+    def _apply_volumes(self):
+        for deck in self._deck_pair or ():
+            deck.output.setVolume(self.volume * deck.fade * deck.gain)
+
+    def _start_switch_measure(self, kind):
+        self._switch_started = time.perf_counter()
+        self._switch_kind = kind
+
+    # Signaux des deux lecteurs : seuls ceux du lecteur actif sont relayés
+
+    def _on_position(self, index, position):
+        if index != self._active:
+            return
+        if self._switch_started is not None and position > 0:
+            latency = (time.perf_counter() - self._switch_started) * 1000
+            self.switch_latencies.append((self._switch_kind, latency))
+            self._switch_started = None
+            metrics.observe("playback.switch_ms", latency, kind=self._switch_kind)
+        self.positionChanged.emit(position)
+
+        if self.crossfade_ms > 0 and self._can_advance():
+            duration = self.active.player.duration()
+            if duration > self.crossfade_ms and duration - position <= self.crossfade_ms:
+                self._advance("fondu")
+
+    def _on_duration(self, index, duration):
+        if index == self._active:
+            self.durationChanged.emit(duration)
+
+    def _on_media_status(self, index, status):
+        # Chemin fréquent : les étiquettes ne sont construites que si les mesures sont actives
+        if metrics.enabled:
+            metrics.count("playback.media_status", status=status.name,
+                          deck="active" if index == self._active else "standby")
+        if index != self._active:
+            return
+        if self._load_started is not None and self.active.is_ready():
+            metrics.finish("playback.load_ms", self._load_started)
+            self._load_started = None
+        if self.is_end_of_media(status) and self._can_advance():
+            self._advance("enchaîné")
+            return
+        self.mediaStatusChanged.emit(status)
+
+    def _on_playback_state(self, index, state):
+        if index == self._active:
+            self.playbackStateChanged.emit(state)
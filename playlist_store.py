@@ -0,0 +1,483 @@
+import os
+import json
+import tempfile
+from array import array
+from collections import Counter
+
+# Fichiers de stockage des playlists
+PLAYLIST_SNAPSHOT_FILE = "playlists.snapshot"
+PLAYLIST_JOURNAL_FILE = "playlists.journal"
+# Ancien format (un seul JSON réécrit à chaque modification), migré au premier lancement
+LEGACY_PLAYLIST_FILE = "playlists.json"
+
+# 1 : playlists en listes de noms ; 2 : table des pistes + playlists en identifiants
+SNAPSHOT_VERSION = 2
+# Nombre d'enregistrements du journal au-delà duquel save() compacte
+COMPACT_EVERY = 200
+
+
+def atomic_write(path, data):
+    """Écrit `data` (bytes) dans un fichier temporaire puis le renomme : jamais de fichier tronqué."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+class TrackTable:
+    """Table des pistes : chaque nom de fichier est stocké une fois et désigné par un entier.
+
+    Les identifiants ne sont jamais réattribués : renommer une piste change le nom
+    associé à son identifiant, sans toucher aux playlists qui le référencent.
+    """
+
+    def __init__(self, names=()):
+        self._names = list(names)
+        self._ids = {name: track_id for track_id, name in enumerate(self._names)}
+
+    def __len__(self):
+        return len(self._names)
+
+    def names(self):
+        return self._names
+
+    def find(self, name):
+        return self._ids.get(name)
+
+    def id_of(self, name):
+        """Identifiant de `name`, créé s'il n'existe pas encore."""
+        track_id = self._ids.get(name)
+        if track_id is None:
+            track_id = len(self._names)
+            self._names.append(name)
+            self._ids[name] = track_id
+        return track_id
+
+    def name_of(self, track_id):
+        return self._names[track_id]
+
+    def rename(self, old, new):
+        """Renomme sur place ; False si `new` a déjà son propre identifiant (fusion à faire playlist par playlist)."""
+        track_id = self._ids.get(old)
+        if track_id is None:
+            return True
+        if new in self._ids:
+            return False
+        del self._ids[old]
+        self._ids[new] = track_id
+        self._names[track_id] = new
+        return True
+
+
+class TrackList:
+    """Playlist vue comme une liste de noms, stockée en `array('I')` d'identifiants de la table.
+
+    Quatre octets par entrée au lieu d'une chaîne ; le test d'appartenance passe
+    par un compteur d'identifiants construit au premier besoin puis tenu à jour.
+    """
+
+    def __init__(self, table, ids=()):
+        self._table = table
+        self._ids = array("I", ids)
+        self._counts = None
+
+    def ids(self):
+        return self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._table.name_of(track_id) for track_id in self._ids[index]]
+        return self._table.name_of(self._ids[index])
+
+    def __iter__(self):
+        names = self._table.names()
+        return (names[track_id] for track_id in self._ids)
+
+    def __contains__(self, name):
+        track_id = self._table.find(name)
+        if track_id is None:
+            return False
+        if self._counts is None:
+            self._counts = Counter(self._ids)
+        return self._counts[track_id] > 0
+
+    def index(self, name):
+        track_id = self._table.find(name)
+        if track_id is None:
+            raise ValueError(f"{name!r} absent de la playlist")
+        return self._ids.index(track_id)
+
+    def append(self, name):
+        self.insert(len(self._ids), name)
+
+    def extend(self, names):
+        ids = [self._table.id_of(name) for name in names]
+        self._ids.extend(ids)
+        if self._counts is not None:
+            self._counts.update(ids)
+
+    def insert(self, index, name):
+        track_id = self._table.id_of(name)
+        self._ids.insert(index, track_id)
+        if self._counts is not None:
+            self._counts[track_id] += 1
+
+    def __setitem__(self, index, name):
+        track_id = self._table.id_of(name)
+        if self._counts is not None:
+            self._counts[self._ids[index]] -= 1
+            self._counts[track_id] += 1
+        self._ids[index] = track_id
+
+    def __delitem__(self, index):
+        if self._counts is not None:
+            self._counts[self._ids[index]] -= 1
+        del self._ids[index]
+
+    def replace(self, old, new):
+        """Remplace toutes les occurrences de `old` par `new`."""
+        old_id = self._table.find(old)
+        if old_id is None:
+            return
+        new_id = self._table.id_of(new)
+        for i, track_id in enumerate(self._ids):
+            if track_id == old_id:
+                self._ids[i] = new_id
+        self._counts = None
+
+
+class PlaylistStore:
+    """Playlists persistées en instantané + journal d'ajouts, chargées à la demande.
+
+    L'instantané commence par un en-tête (noms et position de chaque playlist),
+    suivi de la table des pistes puis d'une ligne JSON d'identifiants par playlist :
+    au démarrage seul l'en-tête et le journal sont lus, la table et une playlist ne
+    sont décodées que lorsqu'on y accède. Chaque
+    modification ajoute une petite ligne au journal ; `save()` compacte le tout
+    dans un nouvel instantané (fichier temporaire + renommage) quand le journal
+    devient long. Les playlists calculées (ex. toutes les pistes du dossier) ne
+    sont jamais écrites ; des playlists intelligentes, seules les règles le sont
+    (en-tête de l'instantané et journal), leur contenu étant recalculé.
+
+    `store[nom]` retourne une `TrackList`, modifiée en place par l'appelant ;
+    chaque modification doit être signalée par la méthode `record_*` correspondante.
+    Le journal, lui, garde des noms : il reste lisible quelle que soit la table.
+    Avec `read_only=True` (autre processus, ex. le serveur HTTP), rien n'est jamais
+    écrit : une fin de journal tronquée est ignorée au lieu d'être coupée.
+    """
+
+    def __init__(self, snapshot_path=PLAYLIST_SNAPSHOT_FILE, journal_path=PLAYLIST_JOURNAL_FILE,
+                 legacy_path=LEGACY_PLAYLIST_FILE, computed=(), read_only=False):
+        self.snapshot_path = snapshot_path
+        self.read_only = read_only
+        self.journal_path = journal_path
+        self.legacy_path = legacy_path
+        self._computed_names = set(computed)
+        self._computed = {}
+        self._smart = {}
+        self._order = []
+        self._loaded = {}
+        self._offsets = {}
+        self._pending = {}
+        self._body_start = 0
+        self._table = None
+        self._table_span = None
+        self._snapshot_version = SNAPSHOT_VERSION
+        self._seq = 0
+        self._journal_records = 0
+        self._journal = None
+
+        self._load()
+
+    # Lecture
+
+    @property
+    def tracks(self):
+        """Table des pistes, lue dans l'instantané au premier besoin."""
+        if self._table is None:
+            if self._table_span is not None:
+                self._table = TrackTable(json.loads(self._read_span(*self._table_span)))
+            else:
+                self._table = TrackTable()
+        return self._table
+
+    def keys(self):
+        computed = [name for name in self._computed if name not in self._order]
+        return computed + self._order
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, name):
+        return name in self._computed or name in self._loaded or name in self._offsets
+
+    def __getitem__(self, name):
+        if name in self._computed:
+            return self._computed[name]
+        if name not in self:
+            raise KeyError(name)
+        return self._materialize(name)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def is_loaded(self, name):
+        return name in self._computed or name in self._loaded
+
+    def is_computed(self, name):
+        return name in self._computed
+
+    def smart_rules(self):
+        """Règles des playlists intelligentes : {nom: [[type, valeur], ...]}."""
+        return dict(self._smart)
+
+    # Modifications
+
+    def set_computed(self, name, tracks):
+        """Déclare une playlist calculée (non persistée) ; elle est listée en premier."""
+        self._computed_names.add(name)
+        self._computed[name] = tracks
+
+    def define_smart(self, name, rules):
+        """Enregistre les règles d'une playlist intelligente ; son contenu est fourni par `set_computed`."""
+        if name in self._order:
+            raise ValueError(f"La playlist '{name}' existe déjà.")
+        self._smart[name] = rules
+        self._log({"op": "smart", "name": name, "rules": rules})
+
+    def create(self, name):
+        if name in self:
+            raise ValueError(f"La playlist '{name}' existe déjà.")
+        self._loaded[name] = TrackList(self.tracks)
+        self._order.append(name)
+        self._log({"op": "create", "name": name})
+
+    def record_append(self, name, track):
+        """Journalise l'ajout de `track` à la fin de la playlist `name` (déjà fait par l'appelant)."""
+        self._log({"op": "append", "name": name, "track": track})
+
+    def record_extend(self, name, tracks):
+        """Journalise l'ajout de plusieurs pistes d'un coup (un seul enregistrement)."""
+        self._log({"op": "extend", "name": name, "tracks": list(tracks)})
+
+    def rename_track(self, old, new):
+        """Remplace `old` par `new` dans toutes les playlists persistées."""
+        record = {"op": "rename_track", "old": old, "new": new}
+        self._rename(record)
+        self._log(record)
+
+    def flush(self):
+        if self._journal is not None:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def save(self):
+        """Rend les modifications durables ; compacte si le journal est devenu long."""
+        if self._journal_records >= COMPACT_EVERY:
+            self.compact()
+        else:
+            self.flush()
+
+    def compact(self):
+        """Réécrit l'instantané (atomiquement) et vide le journal."""
+        lines = []
+        for name in self._order:
+            if name in self._loaded or self._pending.get(name):
+                lines.append(_encode(self._materialize(name).ids().tolist()))
+            elif name in self._offsets:
+                lines.append(self._read_raw(name))
+            else:
+                lines.append(b"[]")
+        # La table est recopiée telle quelle si elle n'a jamais été lue
+        table_line = _encode(self.tracks.names()) if self._table is not None or self._table_span is None \
+            else self._read_span(*self._table_span)
+
+        offsets = []
+        position = len(table_line) + 1
+        for name, line in zip(self._order, lines):
+            offsets.append([name, position, len(line)])
+            position += len(line) + 1
+
+        header = _encode({"version": SNAPSHOT_VERSION, "seq": self._seq,
+                          "tracks": [0, len(table_line)], "playlists": offsets, "smart": self._smart})
+        atomic_write(self.snapshot_path,
+                     header + b"\n" + table_line + b"\n" + b"".join(line + b"\n" for line in lines))
+
+        self._body_start = len(header) + 1
+        self._table_span = (0, len(table_line))
+        self._snapshot_version = SNAPSHOT_VERSION
+        self._offsets = {name: (offset, length) for name, offset, length in offsets}
+        self._pending = {}
+
+        # L'instantané contient déjà tout : les enregistrements restants seraient ignorés (seq)
+        self._close_journal()
+        atomic_write(self.journal_path, b"")
+        self._journal_records = 0
+
+    def close(self):
+        if self._journal_records:
+            self.compact()
+        self._close_journal()
+
+    # Interne
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            self._read_header()
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            self._migrate_legacy()
+
+        if os.path.exists(self.journal_path):
+            self._replay_journal()
+
+    def _read_header(self):
+        with open(self.snapshot_path, "rb") as f:
+            header_line = f.readline()
+        header = json.loads(header_line)
+        if header.get("version") not in (1, SNAPSHOT_VERSION):
+            raise ValueError(f"Version d'instantané inconnue : {header.get('version')}")
+        self._snapshot_version = header["version"]
+        self._body_start = len(header_line)
+        self._seq = header.get("seq", 0)
+        if "tracks" in header:
+            self._table_span = tuple(header["tracks"])
+        self._smart = header.get("smart", {})
+        for name, offset, length in header["playlists"]:
+            self._order.append(name)
+            self._offsets[name] = (offset, length)
+        if self._snapshot_version == 1:
+            # Ancien instantané en noms : converti une fois en table + identifiants
+            for name in self._order:
+                self._materialize(name)
+            if not self.read_only:
+                self.compact()
+
+    def _migrate_legacy(self):
+        with open(self.legacy_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("Format de playlists inattendu.")
+        for name, tracks in data.items():
+            if name in self._computed_names:
+                continue
+            self._order.append(name)
+            playlist = TrackList(self.tracks)
+            playlist.extend(tracks)
+            self._loaded[name] = playlist
+        self.compact()
+
+    def _replay_journal(self):
+        last_seq = self._seq
+        valid_length = 0
+        with open(self.journal_path, "rb" if self.read_only else "rb+") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal : tout ce qui précède est valide,
+                    # on coupe le fichier pour que les prochains ajouts ne s'y collent pas
+                    if not self.read_only:
+                        f.truncate(valid_length)
+                    break
+                valid_length += len(line)
+                self._journal_records += 1
+                if record.get("seq", 0) <= self._seq:
+                    continue
+                last_seq = record["seq"]
+                self._replay(record)
+        self._seq = last_seq
+
+    def _replay(self, record):
+        op = record["op"]
+        if op == "create":
+            if record["name"] not in self:
+                self._order.append(record["name"])
+                self._loaded[record["name"]] = TrackList(self.tracks)
+        elif op == "rename_track":
+            self._rename(record)
+        elif op == "smart":
+            self._smart[record["name"]] = record["rules"]
+        elif record["name"] in self._loaded:
+            self._apply(self._loaded[record["name"]], record)
+        elif record["name"] in self:
+            self._pending.setdefault(record["name"], []).append(record)
+
+    def _rename(self, record):
+        # Cas courant : seul le nom de la table change, aucune playlist n'est touchée
+        if not self.tracks.rename(record["old"], record["new"]):
+            self._apply_to_all(record)
+
+    def _apply_to_all(self, record):
+        for name in self._order:
+            if name in self._loaded:
+                self._apply(self._loaded[name], record)
+            else:
+                self._pending.setdefault(name, []).append(record)
+
+    def _apply(self, tracks, record):
+        op = record["op"]
+        if op == "append":
+            tracks.append(record["track"])
+        elif op == "extend":
+            tracks.extend(record["tracks"])
+        elif op == "rename_track":
+            tracks.replace(record["old"], record["new"])
+
+    def _materialize(self, name):
+        tracks = self._loaded.get(name)
+        if tracks is not None:
+            return tracks
+        tracks = TrackList(self.tracks)
+        if name in self._offsets:
+            values = json.loads(self._read_raw(name))
+            if self._snapshot_version == 1:
+                tracks.extend(values)
+            else:
+                tracks.ids().extend(values)
+        for record in self._pending.pop(name, []):
+            self._apply(tracks, record)
+        self._loaded[name] = tracks
+        return tracks
+
+    def _read_raw(self, name):
+        return self._read_span(*self._offsets[name])
+
+    def _read_span(self, offset, length):
+        with open(self.snapshot_path, "rb") as f:
+            f.seek(self._body_start + offset)
+            return f.read(length)
+
+    def _log(self, record):
+        if self.read_only:
+            raise ValueError("Playlists ouvertes en lecture seule.")
+        self._seq += 1
+        record["seq"] = self._seq
+        if self._journal is None:
+            self._journal = open(self.journal_path, "ab")
+        self._journal.write(_encode(record) + b"\n")
+        self._journal_records += 1
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,161 @@
+import os
+import shutil
+import hashlib
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, QBuffer, QByteArray, QIODevice, QUrl, pyqtSignal
+from tasks import TaskPool
+from instrumentation import metrics
+
+# Sous-dossier du dossier de spool réservé au cache (vidé au démarrage et à la fermeture)
+SPOOL_SUBDIR = "readahead"
+# Piste en cours + pistes suivantes lues à l'avance
+DEFAULT_READAHEAD_TRACKS = 3
+
+
+def read_track(path, budget, spool_path=None):
+    """Lit `path` en entier (ou le copie dans `spool_path`) ; None s'il dépasse `budget`.
+
+    Exécuté dans un thread : sur un partage réseau, c'est ici que se paient les allers-retours.
+    """
+    size = os.stat(path).st_size
+    if size > budget:
+        return None
+    if spool_path is not None:
+        tmp_path = spool_path + ".part"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, spool_path)
+        return size, None
+    with open(path, "rb") as f:
+        return size, f.read()
+
+
+class ReadAheadCache(QObject):
+    """Copies locales (mémoire ou spool sur disque local) de la piste en cours et des suivantes.
+
+    Le budget en octets est tenu en LRU : `prefetch` marque les pistes demandées
+    comme les plus récentes puis lit en tâche de fond celles qui manquent, une à
+    la fois pour ne pas disputer le débit à la lecture. `stream_for` rend au
+    lecteur un QBuffer (mode mémoire) ou l'URL du fichier copié (mode spool), ou
+    None : le lecteur lit alors le fichier d'origine. `loaded(chemin)` signale
+    chaque copie devenue disponible.
+    """
+
+    loaded = pyqtSignal(str)
+
+    def __init__(self, budget_bytes, spool_dir=None, parent=None):
+        super().__init__(parent)
+        self.budget = budget_bytes
+        self.spool_dir = os.path.join(spool_dir, SPOOL_SUBDIR) if spool_dir else None
+        # chemin → (taille, QByteArray en mode mémoire ou chemin du spool)
+        self._entries = OrderedDict()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Copies supprimées en échec (encore ouvertes par un lecteur sous Windows), retentées plus tard
+        self._stale_spool = []
+        # Pistes oubliées pendant leur lecture : le résultat, devenu faux, sera ignoré
+        self._discarded = set()
+        self.pool = TaskPool(max_workers=1, parent=self)
+        self.pool.finished.connect(self._on_loaded)
+        self.pool.failed.connect(self._on_failed)
+        if self.spool_dir:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+            os.makedirs(self.spool_dir, exist_ok=True)
+
+    def prefetch(self, paths):
+        """Garde `paths` (par ordre de priorité) en cache ; les absents sont lus en tâche de fond."""
+        for path in reversed(paths):
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        for path in paths:
+            if path not in self._entries:
+                self.pool.submit(path, read_track, path, self.budget, self._spool_path(path))
+
+    def stream_for(self, url):
+        """Source locale de `url` pour le lecteur (QBuffer ou QUrl), None en cas d'absence."""
+        path = url.toLocalFile()
+        entry = self._entries.get(path)
+        if entry is None:
+            self.misses += 1
+            metrics.count("readahead.lookups", result="miss")
+            return None
+        self.hits += 1
+        metrics.count("readahead.lookups", result="hit")
+        self._entries.move_to_end(path)
+        _, data = entry
+        if isinstance(data, str):
+            return QUrl.fromLocalFile(data)
+        buffer = QBuffer()
+        # QByteArray partagé (copie à l'écriture) : aucune recopie des octets
+        buffer.setData(data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        return buffer
+
+    def discard(self, path):
+        """Oublie la copie de `path` (fichier supprimé, renommé ou remplacé)."""
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._release(entry)
+        if self.pool.is_pending(path):
+            self._discarded.add(path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "used_bytes": self.used_bytes, "budget_bytes": self.budget, "entries": len(self._entries)}
+
+    def close(self):
+        self.pool.shutdown()
+        self._entries.clear()
+        self.used_bytes = 0
+        if self.spool_dir:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def _spool_path(self, path):
+        if not self.spool_dir:
+            return None
+        # L'extension est gardée : FFmpeg s'en sert pour reconnaître le format
+        digest = hashlib.sha1(path.encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.spool_dir, digest + os.path.splitext(path)[1])
+
+    def _on_loaded(self, path, result):
+        if path in self._discarded:
+            self._discarded.discard(path)
+            return
+        if result is None or path in self._entries:
+            return
+        size, data = result
+        if data is None:
+            data = self._spool_path(path)
+        else:
+            data = QByteArray(data)
+        self._evict(size)
+        self._entries[path] = (size, data)
+        self.used_bytes += size
+        self.loaded.emit(path)
+
+    def _on_failed(self, path, error):
+        # Fichier illisible ou disparu : le lecteur lira l'original, qui signalera l'erreur
+        self._discarded.discard(path)
+
+    def _evict(self, incoming):
+        while self._entries and self.used_bytes + incoming > self.budget:
+            _, entry = self._entries.popitem(last=False)
+            self._release(entry)
+            self.evictions += 1
+            metrics.count("readahead.evictions")
+
+    def _release(self, entry):
+        size, data = entry
+        self.used_bytes -= size
+        if isinstance(data, str):
+            self._stale_spool.append(data)
+        remaining = []
+        for spool_path in self._stale_spool:
+            try:
+                os.remove(spool_path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                remaining.append(spool_path)
+        self._stale_spool = remaining
@@ -0,0 +1,181 @@
+import re
+import bisect
+import heapq
+import string
+import unicodedata
+from itertools import islice
+from collections import Counter, defaultdict
+
+DEFAULT_LIMIT = 50
+# Nombre maximal de candidats examinés en recherche approximante
+MAX_FUZZY_CANDIDATES = 3000
+# Part minimale des trigrammes de la requête qu'un résultat approximatif doit contenir
+MIN_FUZZY_RATIO = 0.5
+
+
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation})
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+_NON_WORD = re.compile(r"[^\w\s]|_")
+
+
+def normalize(text):
+    """Minuscules, sans accents, ponctuation remplacée par des espaces."""
+    text = text.lower()
+    if not text.isascii():
+        text = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+        return " ".join(_NON_WORD.sub(" ", text).split())
+    return " ".join(text.translate(_PUNCTUATION).split())
+
+
+def trigrams(text):
+    """Trigrammes d'un texte indexé ; les espaces aux bords marquent débuts et fins de mots."""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def query_trigrams(q):
+    """Trigrammes d'une requête : pas d'espace final, le dernier mot peut être en cours de frappe."""
+    padded = f" {q}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Index de recherche sur les noms (et tags) des pistes.
+
+    Les préfixes de mots sont résolus par un vocabulaire trié ; les trigrammes
+    servent à retrouver les résultats malgré les fautes de frappe.
+    """
+
+    def __init__(self):
+        self._texts = {}
+        self._lengths = {}
+        self._postings = defaultdict(set)
+        self._words = defaultdict(set)
+        self._vocabulary = []
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __contains__(self, key):
+        return key in self._texts
+
+    def add(self, key, *extra_texts):
+        """Indexe (ou ré-indexe) `key` ; les textes supplémentaires (artiste, album...) sont cherchables aussi."""
+        if key in self._texts:
+            self.remove(key)
+        base = key.rsplit(".", 1)[0]
+        text = normalize(" ".join((base,) + tuple(t for t in extra_texts if t)))
+        self._texts[key] = text
+        self._lengths[key] = len(text)
+        for gram in trigrams(text):
+            self._postings[gram].add(key)
+        for word in set(text.split()):
+            keys = self._words[word]
+            if not keys:
+                bisect.insort(self._vocabulary, word)
+            keys.add(key)
+
+    def remove(self, key):
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        del self._lengths[key]
+        for gram in trigrams(text):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._postings[gram]
+        for word in set(text.split()):
+            keys = self._words.get(word)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._words[word]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Retourne au plus `limit` clés, les meilleures d'abord."""
+        q = normalize(query)
+        if not q:
+            return []
+        words = set(q.split())
+        # Mots d'une ou deux lettres : leurs préfixes couvrent une grande part de la bibliothèque,
+        # l'union de leurs pistes coûterait plus cher que de vérifier le texte des candidats
+        short_words = [f" {word}" for word in words if len(word) < 3]
+        if len(short_words) == len(words):
+            return self._search_short(q, limit)
+
+        # 1. Pistes dont les mots commencent par chacun des mots de la requête,
+        # les noms les plus courts en tête : ce sont ceux où la requête pèse le plus
+        word_matches = sorted((self._keys_with_prefix(word) for word in words if len(word) >= 3), key=len)
+        exact = word_matches[0]
+        for keys in word_matches[1:]:
+            if not exact:
+                break
+            exact = exact & keys
+        if short_words:
+            exact = {key for key in exact if all(word in f" {self._texts[key]}" for word in short_words)}
+
+        results = heapq.nsmallest(limit, exact, key=self._lengths.__getitem__)
+        if len(results) >= limit:
+            return results
+
+        grams = query_trigrams(q)
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+
+        # 2. Complément approximatif (fautes de frappe) : candidats tirés des trigrammes les plus rares
+        candidates = set()
+        for posting in postings:
+            if len(candidates) >= MAX_FUZZY_CANDIDATES:
+                break
+            candidates.update(islice(posting, MAX_FUZZY_CANDIDATES - len(candidates)))
+        candidates -= exact
+
+        hits = Counter()
+        for posting in postings:
+            hits.update(candidates & posting)
+
+        needed = max(1, int(len(grams) * MIN_FUZZY_RATIO + 0.5))
+        scored = [(-count, self._lengths[key], key) for key, count in hits.items() if count >= needed]
+        fuzzy = [key for _, _, key in heapq.nsmallest(limit - len(results), scored)]
+        return results + fuzzy
+
+    def _prefix_range(self, prefix):
+        """Bornes [début, fin) des mots du vocabulaire qui commencent par `prefix`."""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        return start, bisect.bisect_left(self._vocabulary, prefix + "\uffff", start)
+
+    def _keys_with_prefix(self, prefix):
+        start, end = self._prefix_range(prefix)
+        if end - start == 1:
+            return self._words[self._vocabulary[start]]
+        keys = set()
+        for word in self._vocabulary[start:end]:
+            keys |= self._words[word]
+        return keys
+
+    def _search_short(self, q, limit):
+        """Requêtes d'un ou deux caractères : préfixes de mots par le vocabulaire trié, arrêt à `limit` résultats.
+
+        Les candidats viennent du préfixe qui couvre le moins de mots du vocabulaire ;
+        les autres mots de la requête sont vérifiés sur le texte de chaque candidat.
+        """
+        ranges = sorted(((self._prefix_range(word), word) for word in set(q.split())),
+                        key=lambda item: item[0][1] - item[0][0])
+        (start, end), _ = ranges[0]
+        others = [f" {word}" for _, word in ranges[1:]]
+        results = []
+        seen = set()
+        for i in range(start, end):
+            for key in self._words[self._vocabulary[i]]:
+                if key in seen:
+                    continue
+                seen.add(key)
+                text = f" {self._texts[key]}"
+                if all(word in text for word in others):
+                    results.append(key)
+                    if len(results) >= limit:
+                        return results
+        return results
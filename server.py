@@ -0,0 +1,472 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.parse import urlsplit, unquote, quote
+from library import LibraryIndex, LibraryRoots, LIBRARY_DB_FILE
+from playlist_store import PlaylistStore, PLAYLIST_SNAPSHOT_FILE, PLAYLIST_JOURNAL_FILE
+from instrumentation import metrics
+
+# Même fichier de configuration que la fenêtre (dossier audio, mesures)
+CONFIG_FILE = "config.json"
+ALL_TRACKS = "Toutes les pistes"
+# Index propre au serveur : library.db appartient à la fenêtre, qui l'écrit de son côté
+SERVER_DB_FILE = "server_library.db"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Au-delà, les nouvelles connexions reçoivent un 503 : la mémoire reste bornée quel que soit le nombre de clients
+MAX_CONNECTIONS = 256
+# Taille maximale de la ligne de requête et des en-têtes (une requête plus grosse est refusée)
+MAX_HEADER_BYTES = 16 * 1024
+MAX_HEADERS = 64
+KEEP_ALIVE_TIMEOUT = 15
+# Délai minimal entre deux vérifications du dossier audio
+LIBRARY_CHECK_INTERVAL = 2.0
+# Lectures des playlists recommencées si la fenêtre compacte l'instantané pendant la lecture
+PLAYLIST_READ_ATTEMPTS = 3
+
+AUDIO_TYPES = {
+    ".mp3": "audio/mpeg", ".m4a": "audio/mp4", ".aac": "audio/aac", ".opus": "audio/ogg",
+    ".ogg": "audio/ogg", ".webm": "audio/webm", ".flac": "audio/flac", ".wav": "audio/wav",
+}
+REASONS = {
+    200: "OK", 206: "Partial Content", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 416: "Range Not Satisfiable", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message="", headers=()):
+        super().__init__(message or REASONS.get(status, ""))
+        self.status = status
+        self.headers = list(headers)
+
+
+class Request:
+    __slots__ = ("method", "path", "version", "headers")
+
+    def __init__(self, method, path, version, headers):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def parse_range(header, size):
+    """(début, fin incluse) demandés par l'en-tête Range, ou None pour servir tout le fichier.
+
+    Plusieurs plages ou un en-tête illisible donnent le fichier entier (permis par
+    la RFC 9110) ; une plage qui commence après la fin du fichier lève un 416.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, sep, last = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            # Suffixe : les `last` derniers octets
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise HttpError(416, headers=[("Content-Range", f"bytes */{size}")])
+            return max(0, size - length), size - 1
+        first = int(first)
+        last = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        raise HttpError(416, headers=[("Content-Range", f"bytes */{size}")])
+    if first < 0 or last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def _json_body(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class LibraryServer:
+    """Serveur HTTP asyncio de la bibliothèque : index des pistes, playlists et fichiers audio.
+
+    Routes (GET ou HEAD) :
+        /api/tracks             pistes de toutes les racines (nom, taille, URL)
+        /api/playlists          playlists et nombre de pistes
+        /api/playlists/<nom>    pistes d'une playlist
+        /audio/<nom>            le fichier, avec prise en charge de `Range`
+
+    Les fichiers partent par `loop.sendfile` (sendfile(2) sur une socket TCP, sans
+    copie en espace utilisateur) ; rien n'est lu en mémoire. Le serveur n'écrit rien
+    de la fenêtre : il tient son propre index (`db_path`, jamais library.db) et les
+    playlists sont rechargées quand la fenêtre modifie leurs fichiers.
+
+    L'index vit dans un thread dédié, où sa connexion SQLite est ouverte : les
+    vérifications et les scans n'y bloquent pas la boucle, qui continue de servir.
+    """
+
+    def __init__(self, roots, db_path=SERVER_DB_FILE, snapshot_path=PLAYLIST_SNAPSHOT_FILE,
+                 journal_path=PLAYLIST_JOURNAL_FILE, max_connections=MAX_CONNECTIONS):
+        if os.path.abspath(db_path) == os.path.abspath(LIBRARY_DB_FILE):
+            raise ValueError(f"{LIBRARY_DB_FILE} est l'index de la fenêtre : le serveur a besoin de sa propre base.")
+        self.roots = roots
+        self.db_path = db_path
+        # Ouvert au premier scan, dans le thread de `_executor`, et utilisé uniquement là
+        self.library = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="library-index")
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.max_connections = max_connections
+        self.connections = 0
+        self.server = None
+        # nom → (taille, mtime_ns), noms triés, et la liste JSON déjà encodée
+        self._entries = {}
+        self._names = []
+        self._tracks_body = None
+        self._checked_at = 0.0
+        self._playlists = None
+        self._playlists_stamp = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        await self.refresh_library(force=True)
+        self.server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self._executor.submit(self._close_library)
+        self._executor.shutdown(wait=True)
+
+    # Données
+
+    async def refresh_library(self, force=False):
+        """Relit les racines qui ont changé (au plus une vérification toutes les LIBRARY_CHECK_INTERVAL s).
+
+        La vérification et le scan tournent dans le thread de l'index ; entre-temps
+        les autres requêtes sont servies avec la liste précédente.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < LIBRARY_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        entries = await asyncio.get_running_loop().run_in_executor(self._executor, self._scan, force)
+        if entries is None:
+            return
+        self._entries = entries
+        self._names = list(entries)
+        self._tracks_body = None
+
+    def _scan(self, force):
+        """Dans le thread de l'index : {nom: (taille, mtime_ns)} triés, ou None si rien n'a changé."""
+        if self.library is None:
+            self.library = LibraryIndex(self.db_path)
+        roots = [root for root in self.roots.paths() if force or not self.library.is_current(root)]
+        if not roots:
+            return None
+        self.library.scan_roots(roots)
+        entries = {}
+        for label, root in self.roots.items():
+            for name, size, mtime in self.library.entries_in(root):
+                entries[self.roots.name_of(label, name)] = (size, mtime)
+        return dict(sorted(entries.items()))
+
+    def _close_library(self):
+        if self.library is not None:
+            self.library.close()
+            self.library = None
+
+    def track_count(self):
+        return len(self._entries)
+
+    def tracks_body(self):
+        if self._tracks_body is None:
+            self._tracks_body = _json_body({"tracks": [
+                {"name": name, "size": size, "url": "/audio/" + quote(name)}
+                for name, (size, _) in self._entries.items()
+            ]})
+        return self._tracks_body
+
+    def playlists(self):
+        """Le magasin de playlists, rouvert si la fenêtre a écrit dans l'instantané ou le journal."""
+        stamp = self._playlists_files_stamp()
+        if self._playlists is None or stamp != self._playlists_stamp:
+            self._playlists, self._playlists_stamp = self._read_playlists(stamp)
+        self._playlists.set_computed(ALL_TRACKS, self._names)
+        return self._playlists
+
+    def _read_playlists(self, stamp):
+        """(magasin entièrement lu, tampon des fichiers lus).
+
+        Le magasin lit ses playlists à la demande, par position dans l'instantané : une
+        compaction de la fenêtre entre deux lectures ferait lire l'instantané suivant aux
+        anciennes positions. Tout est donc lu d'un coup, puis le tampon est revérifié ;
+        s'il a changé, la lecture recommence sur les nouveaux fichiers.
+        """
+        for attempt in range(PLAYLIST_READ_ATTEMPTS):
+            try:
+                # Sans migration de l'ancien format : le serveur n'écrit jamais les playlists
+                store = PlaylistStore(self.snapshot_path, self.journal_path, legacy_path=None,
+                                      computed=(ALL_TRACKS,), read_only=True)
+                store.tracks
+                for name in store.keys():
+                    store[name]
+            except ValueError:
+                # Instantané remplacé en pleine lecture : illisible aux positions de l'ancien
+                if attempt == PLAYLIST_READ_ATTEMPTS - 1:
+                    raise
+                stamp = self._playlists_files_stamp()
+                continue
+            current = self._playlists_files_stamp()
+            if current == stamp:
+                break
+            stamp = current
+        return store, stamp
+
+    def _playlists_files_stamp(self):
+        return tuple(self._stat(path) for path in (self.snapshot_path, self.journal_path))
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        if self.connections >= self.max_connections:
+            metrics.count("server.rejected")
+            await self.send_error(writer, HttpError(503, "Trop de connexions."), keep_alive=False,
+                                  extra=[("Retry-After", "1")])
+            writer.close()
+            return
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HttpError as e:
+                    await self.send_error(writer, e, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if not await self.respond(request, writer):
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_request(self, reader):
+        """Requête suivante de la connexion, ou None si le client l'a fermée."""
+        try:
+            line = await reader.readline()
+            if not line:
+                return None
+            parts = line.decode("latin-1").split()
+            if len(parts) != 3:
+                raise HttpError(400, "Ligne de requête invalide.")
+            headers = {}
+            total = len(line)
+            while True:
+                line = await reader.readline()
+                total += len(line)
+                if total > MAX_HEADER_BYTES or len(headers) > MAX_HEADERS:
+                    raise HttpError(431)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, sep, value = line.decode("latin-1").partition(":")
+                if not sep:
+                    raise HttpError(400, "En-tête invalide.")
+                headers[name.strip().lower()] = value.strip()
+        except (ValueError, asyncio.LimitOverrunError):
+            # Ligne plus longue que la limite du lecteur
+            raise HttpError(431)
+        return Request(parts[0], parts[1], parts[2], headers)
+
+    async def respond(self, request, writer):
+        """Traite une requête ; retourne False si la connexion doit être fermée."""
+        keep_alive = request.keep_alive()
+        try:
+            if request.method not in ("GET", "HEAD"):
+                raise HttpError(405, headers=[("Allow", "GET, HEAD")])
+            if "content-length" in request.headers or "transfer-encoding" in request.headers:
+                # GET sans corps : un corps éventuel n'est pas lu, la connexion ne peut pas être réutilisée
+                keep_alive = False
+            path = unquote(urlsplit(request.path).path)
+            await self.refresh_library()
+            if path.startswith("/audio/"):
+                await self.send_file(request, writer, path[len("/audio/"):], keep_alive)
+            else:
+                await self.send_json(request, writer, self.route_api(path), keep_alive)
+        except HttpError as e:
+            await self.send_error(writer, e, keep_alive, head=request.method == "HEAD")
+        except ConnectionError:
+            return False
+        except Exception as e:
+            await self.send_error(writer, HttpError(500, f"Erreur interne : {e}"), keep_alive=False)
+            return False
+        return keep_alive
+
+    def route_api(self, path):
+        if path == "/api/tracks":
+            return self.tracks_body()
+        if path == "/api/playlists":
+            playlists = self.playlists()
+            return _json_body({"playlists": [
+                {"name": name, "count": len(playlists[name]), "url": "/api/playlists/" + quote(name, safe="")}
+                for name in playlists.keys()
+            ]})
+        if path.startswith("/api/playlists/"):
+            name = path[len("/api/playlists/"):]
+            playlists = self.playlists()
+            if name not in playlists:
+                raise HttpError(404, f"Playlist inconnue : {name}")
+            return _json_body({"name": name, "tracks": list(playlists[name])})
+        raise HttpError(404)
+
+    async def send_json(self, request, writer, body, keep_alive):
+        headers = [("Content-Type", "application/json; charset=utf-8"), ("Content-Length", str(len(body)))]
+        writer.write(self.head(200, headers, keep_alive))
+        if request.method != "HEAD":
+            writer.write(body)
+        await writer.drain()
+        metrics.count("server.requests", kind="api", status=200)
+
+    async def send_file(self, request, writer, name, keep_alive):
+        # Seuls les noms de l'index sont servis : aucun chemin construit à partir de la requête
+        if name not in self._entries:
+            raise HttpError(404, f"Piste inconnue : {name}")
+        try:
+            f = open(self.roots.path_of(name), "rb")
+        except OSError:
+            raise HttpError(404, f"Piste introuvable : {name}")
+        with f:
+            st = os.fstat(f.fileno())
+            size = st.st_size
+            etag = f'"{size:x}-{st.st_mtime_ns:x}"'
+            if request.headers.get("if-none-match") == etag:
+                writer.write(self.head(304, [("ETag", etag)], keep_alive))
+                await writer.drain()
+                metrics.count("server.requests", kind="audio", status=304)
+                return
+
+            byte_range = None
+            if_range = request.headers.get("if-range")
+            if if_range is None or if_range == etag:
+                byte_range = parse_range(request.headers.get("range"), size)
+            headers = [
+                ("Content-Type", AUDIO_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")),
+                ("Accept-Ranges", "bytes"), ("ETag", etag),
+                ("Last-Modified", formatdate(st.st_mtime, usegmt=True)),
+            ]
+            if byte_range is None:
+                status, offset, count = 200, 0, size
+            else:
+                status, offset, count = 206, byte_range[0], byte_range[1] - byte_range[0] + 1
+                headers.append(("Content-Range", f"bytes {byte_range[0]}-{byte_range[1]}/{size}"))
+            headers.append(("Content-Length", str(count)))
+
+            writer.write(self.head(status, headers, keep_alive))
+            # Les en-têtes partent avant : sendfile écrit directement sur la socket
+            await writer.drain()
+            if request.method != "HEAD" and count:
+                await asyncio.get_running_loop().sendfile(writer.transport, f, offset, count)
+                metrics.count("server.bytes_sent", count)
+            metrics.count("server.requests", kind="audio", status=status)
+
+    async def send_error(self, writer, error, keep_alive, head=False, extra=()):
+        body = _json_body({"error": str(error)})
+        headers = [("Content-Type", "application/json; charset=utf-8"), ("Content-Length", str(len(body)))]
+        writer.write(self.head(error.status, headers + error.headers + list(extra), keep_alive))
+        if not head:
+            writer.write(body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        metrics.count("server.requests", kind="error", status=error.status)
+
+    @staticmethod
+    def head(status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 f"Date: {formatdate(usegmt=True)}",
+                 "Access-Control-Allow-Origin: *",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def load_config():
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            config = json.load(f)
+        return config if isinstance(config, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+async def run(server, host, port):
+    host, port = await server.start(host, port)
+    print(f"Bibliothèque servie sur http://{host}:{port}/ ({server.track_count()} pistes)", flush=True)
+    await server.serve_forever()
+
+
+def main():
+    """Point d'entrée sans interface : aucun module Qt n'est importé."""
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Serveur HTTP de la bibliothèque (index, playlists, fichiers audio).")
+    parser.add_argument("--folder", default=config.get("audio_folder_path"), help="Dossier audio (config.json par défaut)")
+    parser.add_argument("--host", default=config.get("server_host", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=config.get("server_port", DEFAULT_PORT),
+                        help="0 : port libre choisi par le système")
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS)
+    parser.add_argument("--db", default=SERVER_DB_FILE, help="Index du serveur (distinct de celui de la fenêtre)")
+    args = parser.parse_args()
+
+    if not args.folder or not os.path.isdir(args.folder):
+        print("Dossier audio introuvable : lancez d'abord l'application ou passez --folder.", file=sys.stderr)
+        return 1
+    metrics.enabled = config.get("instrumentation", False)
+    roots = LibraryRoots(args.folder, config.get("library_roots"))
+    try:
+        server = LibraryServer(roots, db_path=args.db, max_connections=args.max_connections)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    try:
+        asyncio.run(run(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
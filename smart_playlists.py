@@ -0,0 +1,286 @@
+"""Playlists intelligentes : des règles sur les pistes, un résultat tenu à jour.
+
+Chaque playlist est matérialisée une fois (`build`) puis suit les événements de
+la bibliothèque (ajout, suppression, tags, écoutes, ajouts à une autre
+playlist) : seule la piste concernée est réévaluée, et seulement par les
+playlists dont une règle dépend de ce qui a changé. Sélectionner la playlist ne
+coûte donc rien. Les règles sont enregistrées avec les autres playlists.
+
+Syntaxe des règles, séparées par « ; » :
+
+    contient live; ajoutée < 7; durée < 300; hors Favoris; top 50
+"""
+import time
+import heapq
+import bisect
+
+NAME_CONTAINS = "name_contains"
+ADDED_WITHIN_DAYS = "added_within_days"
+DURATION_BELOW = "duration_below"
+NOT_IN_PLAYLIST = "not_in_playlist"
+MOST_PLAYED = "most_played"
+
+# Mot-clé de la syntaxe → (règle, valeur numérique ?)
+KEYWORDS = {
+    "contient": (NAME_CONTAINS, False),
+    "ajoutée": (ADDED_WITHIN_DAYS, True),
+    "ajoutee": (ADDED_WITHIN_DAYS, True),
+    "durée": (DURATION_BELOW, True),
+    "duree": (DURATION_BELOW, True),
+    "hors": (NOT_IN_PLAYLIST, False),
+    "top": (MOST_PLAYED, True),
+}
+FORMATS = {
+    NAME_CONTAINS: "contient {}",
+    ADDED_WITHIN_DAYS: "ajoutée < {}",
+    DURATION_BELOW: "durée < {}",
+    NOT_IN_PLAYLIST: "hors {}",
+    MOST_PLAYED: "top {}",
+}
+
+# Événements auxquels une règle est sensible (en plus des ajouts et suppressions de pistes)
+METADATA = "metadata"
+PLAYS = "plays"
+RULE_FIELDS = {DURATION_BELOW: METADATA, MOST_PLAYED: PLAYS}
+
+RULES_HELP = "contient <texte> · ajoutée < <jours> · durée < <secondes> · hors <playlist> · top <N>"
+
+DAY_SECONDS = 24 * 3600
+
+
+def parse_rules(text):
+    """Règles [[type, valeur]] d'un texte comme « contient live; top 20 » ; ValueError si illisible."""
+    rules = []
+    for clause in text.split(";"):
+        clause = clause.strip()
+        if not clause:
+            continue
+        keyword, _, value = clause.partition(" ")
+        if keyword.lower() not in KEYWORDS:
+            raise ValueError(f"Règle inconnue : « {clause} ».\nRègles possibles : {RULES_HELP}")
+        kind, numeric = KEYWORDS[keyword.lower()]
+        value = value.strip()
+        if numeric:
+            value = value.lstrip("<").strip()
+            if not value.isdigit() or int(value) <= 0:
+                raise ValueError(f"Nombre entier positif attendu : « {clause} ».")
+            value = int(value)
+        elif not value:
+            raise ValueError(f"Texte attendu : « {clause} ».")
+        if kind == MOST_PLAYED and any(rule[0] == MOST_PLAYED for rule in rules):
+            raise ValueError("Une seule règle « top » par playlist.")
+        rules.append([kind, value])
+    if not rules:
+        raise ValueError("Aucune règle.")
+    return rules
+
+
+def format_rules(rules):
+    return "; ".join(FORMATS[kind].format(value) for kind, value in rules)
+
+
+class SmartPlaylist:
+    """Résultat matérialisé d'une playlist à règles.
+
+    `_ranked` garde, triées, les clés de toutes les pistes qui passent les filtres :
+    (nom,) ou, avec « top N », (-écoutes, nom). `tracks` en est le début (les N
+    premières) : une piste qui change ne déplace donc qu'une ou deux lignes.
+    """
+
+    def __init__(self, name, rules):
+        self.name = name
+        self.rules = rules
+        self.limit = None
+        self.filters = []
+        for kind, value in rules:
+            if kind == MOST_PLAYED:
+                self.limit = value
+            elif kind == NAME_CONTAINS:
+                self.filters.append((kind, value.casefold()))
+            else:
+                self.filters.append((kind, value))
+        self.fields = {RULE_FIELDS[kind] for kind, _ in rules if kind in RULE_FIELDS}
+        self.excluded_playlists = {value for kind, value in rules if kind == NOT_IN_PLAYLIST}
+        self.window_days = min((value for kind, value in rules if kind == ADDED_WITHIN_DAYS), default=None)
+        self.tracks = []
+        self._ranked = []
+        self._keys = {}
+        # (date de sortie de la fenêtre « ajoutée < N », nom) des pistes retenues
+        self._expiries = []
+
+    def __len__(self):
+        return len(self.tracks)
+
+
+class SmartPlaylists:
+    """Les playlists intelligentes de `store` (un PlaylistStore), évaluées sur les infos des pistes.
+
+    `metadata` et `stats` sont les dictionnaires {nom: infos} tenus par
+    l'application (tags ; date d'ajout et écoutes). Chaque ligne insérée ou retirée
+    passe par `edit(tracks, ligne, nom)` (nom None : retrait), ce qui permet à
+    l'appelant de faire suivre le modèle affiché ; par défaut la liste est modifiée
+    directement.
+    """
+
+    def __init__(self, store, metadata, stats, edit=None, clock=time.time):
+        self.store = store
+        self.metadata = metadata
+        self.stats = stats
+        self.edit = edit or _edit_list
+        self.clock = clock
+        self.built = False
+        self._playlists = {}
+        for name, rules in store.smart_rules().items():
+            self._playlists[name] = SmartPlaylist(name, rules)
+            store.set_computed(name, self._playlists[name].tracks)
+
+    def __contains__(self, name):
+        return name in self._playlists
+
+    def names(self):
+        return list(self._playlists)
+
+    def get(self, name):
+        return self._playlists.get(name)
+
+    def create(self, name, rules, library):
+        """Enregistre une nouvelle playlist et la matérialise sur `library` ; ValueError si impossible."""
+        if name in self.store:
+            raise ValueError(f"La playlist '{name}' existe déjà.")
+        for target in {value for kind, value in rules if kind == NOT_IN_PLAYLIST}:
+            # Seules les playlists manuelles peuvent être exclues : pas de chaîne de dépendances
+            if target not in self.store or self.store.is_computed(target):
+                raise ValueError(f"« hors {target} » : il faut une playlist existante et non calculée.")
+        self.store.define_smart(name, rules)
+        playlist = SmartPlaylist(name, rules)
+        self._playlists[name] = playlist
+        self.store.set_computed(name, playlist.tracks)
+        if self.built:
+            self._build(playlist, library)
+        return playlist
+
+    def build(self, library):
+        """Matérialise toutes les playlists (démarrage, bibliothèque rechargée) ; ensuite tout est incrémental."""
+        for playlist in self._playlists.values():
+            self._build(playlist, library)
+        self.built = True
+
+    # Événements
+
+    def tracks_added(self, names):
+        self._update(self._playlists.values(), names, True)
+
+    def tracks_removed(self, names):
+        self._update(self._playlists.values(), names, False)
+
+    def tracks_changed(self, names, field):
+        """Les infos `field` (METADATA, PLAYS) de `names` ont changé."""
+        self._update([playlist for playlist in self._playlists.values() if field in playlist.fields], names, True)
+
+    def playlist_changed(self, playlist_name, names):
+        """`names` ont été ajoutées à (ou renommées dans) la playlist manuelle `playlist_name`."""
+        self._update([playlist for playlist in self._playlists.values()
+                      if playlist_name in playlist.excluded_playlists], names, True)
+
+    def expire(self):
+        """Retire les pistes sorties de la fenêtre « ajoutée < N » ; ne coûte rien tant qu'aucune n'expire."""
+        if not self.built:
+            return
+        now = self.clock()
+        for playlist in self._playlists.values():
+            due = []
+            while playlist._expiries and playlist._expiries[0][0] <= now:
+                due.append(heapq.heappop(playlist._expiries)[1])
+            keys = {name: playlist._keys[name] for name in due if name in playlist._keys}
+            self._update([playlist], list(keys), True)
+            for name, key in keys.items():
+                # Toujours retenue (date d'ajout avancée entre-temps) et pas réinsérée : nouvelle échéance
+                if playlist._keys.get(name) == key:
+                    heapq.heappush(playlist._expiries, (self._expiry(playlist, name), name))
+
+    # Interne
+
+    def _update(self, playlists, names, present):
+        if not self.built:
+            return
+        now = self.clock()
+        for playlist in playlists:
+            for name in names:
+                new_key = self._key(playlist, name) if present and self._matches(playlist, name, now) else None
+                old_key = playlist._keys.get(name)
+                if new_key == old_key:
+                    continue
+                if old_key is not None:
+                    self._remove(playlist, name, old_key)
+                if new_key is not None:
+                    self._insert(playlist, name, new_key)
+
+    def _build(self, playlist, library):
+        now = self.clock()
+        keys = [self._key(playlist, name) for name in library if self._matches(playlist, name, now)]
+        keys.sort()
+        playlist._ranked = keys
+        playlist._keys = {key[-1]: key for key in keys}
+        playlist._expiries = []
+        if playlist.window_days is not None:
+            playlist._expiries = [(self._expiry(playlist, key[-1]), key[-1]) for key in keys]
+            heapq.heapify(playlist._expiries)
+        # Remplacée en place : le stockage et l'appelant gardent la même liste
+        playlist.tracks[:] = [key[-1] for key in keys[:playlist.limit]]
+
+    def _matches(self, playlist, name, now):
+        for kind, value in playlist.filters:
+            if kind == NAME_CONTAINS:
+                if value not in name.casefold():
+                    return False
+            elif kind == ADDED_WITHIN_DAYS:
+                added = self.stats.get(name, {}).get("added")
+                if added is None or added <= now - value * DAY_SECONDS:
+                    return False
+            elif kind == DURATION_BELOW:
+                duration_ms = (self.metadata.get(name) or {}).get("duration_ms")
+                if not duration_ms or duration_ms >= value * 1000:
+                    return False
+            elif kind == NOT_IN_PLAYLIST:
+                excluded = self.store.get(value)
+                if excluded is not None and name in excluded:
+                    return False
+        # « top N » : parmi les pistes déjà écoutées
+        return playlist.limit is None or self.stats.get(name, {}).get("plays", 0) > 0
+
+    def _key(self, playlist, name):
+        if playlist.limit is None:
+            return (name,)
+        return (-self.stats.get(name, {}).get("plays", 0), name)
+
+    def _expiry(self, playlist, name):
+        return self.stats[name]["added"] + playlist.window_days * DAY_SECONDS
+
+    def _insert(self, playlist, name, key):
+        row = bisect.bisect_left(playlist._ranked, key)
+        playlist._ranked.insert(row, key)
+        playlist._keys[name] = key
+        if playlist.window_days is not None:
+            heapq.heappush(playlist._expiries, (self._expiry(playlist, name), name))
+        if playlist.limit is None or row < playlist.limit:
+            if playlist.limit is not None and len(playlist.tracks) >= playlist.limit:
+                # La dernière du top en sort
+                self.edit(playlist.tracks, playlist.limit - 1, None)
+            self.edit(playlist.tracks, row, name)
+
+    def _remove(self, playlist, name, key):
+        row = bisect.bisect_left(playlist._ranked, key)
+        del playlist._ranked[row]
+        del playlist._keys[name]
+        if playlist.limit is None or row < playlist.limit:
+            self.edit(playlist.tracks, row, None)
+            if playlist.limit is not None and len(playlist._ranked) >= playlist.limit:
+                # La suivante du classement entre dans le top
+                self.edit(playlist.tracks, playlist.limit - 1, playlist._ranked[playlist.limit - 1][-1])
+
+
+def _edit_list(tracks, row, name):
+    if name is None:
+        del tracks[row]
+    else:
+        tracks.insert(row, name)
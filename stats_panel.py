@@ -0,0 +1,129 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QPlainTextEdit, QFileDialog, QMessageBox
+)
+from PyQt6.QtCore import QTimer, pyqtSignal
+from PyQt6.QtGui import QFontDatabase
+from playlist_store import atomic_write
+
+REFRESH_INTERVAL_MS = 1000
+
+
+def _describe(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ", ".join(f"{key}={value}" for key, value in labels.items()) + "}"
+
+
+def _render_readahead(stats):
+    used_mb = stats["used_bytes"] / (1024 * 1024)
+    budget_mb = stats["budget_bytes"] / (1024 * 1024)
+    return [
+        "Cache de lecture anticipée",
+        f"  {stats['entries']} piste(s), {used_mb:.1f} / {budget_mb:.1f} Mo",
+        f"  {stats['hits']} succès, {stats['misses']} échec(s), {stats['evictions']} éviction(s)",
+    ]
+
+
+def render(snapshot, readahead=None):
+    """Texte du panneau : une ligne par mesure (dernières valeurs) puis une par compteur.
+
+    `readahead` (résultat de `ReadAheadCache.stats()`) ajoute l'état du cache en fin de
+    texte ; ses compteurs sont tenus même quand les mesures sont désactivées.
+    """
+    lines = []
+    if not snapshot["enabled"]:
+        lines.append("Mesures désactivées.\n")
+    if snapshot["series"]:
+        lines.append(f"{'Mesure':<46} {'n':>6} {'dernière':>9} {'p50':>9} {'p90':>9} {'p99':>9}")
+        for series in snapshot["series"]:
+            quantiles = series["quantiles"]
+            values = [series["last"]] + [quantiles.get(q) for q in ("0.5", "0.9", "0.99")]
+            columns = " ".join(f"{value:9.1f}" if value is not None else f"{'-':>9}" for value in values)
+            lines.append(f"{_describe(series['name'], series['labels']):<46} {series['count']:>6} {columns}")
+    if snapshot["counters"]:
+        lines.append("")
+        lines.append(f"{'Compteur':<46} {'total':>6}")
+        for counter in snapshot["counters"]:
+            lines.append(f"{_describe(counter['name'], counter['labels']):<46} {counter['value']:>6}")
+    if not snapshot["series"] and not snapshot["counters"]:
+        lines.append("Aucune mesure pour l'instant.")
+    if readahead is not None:
+        lines.append("")
+        lines.extend(_render_readahead(readahead))
+    return "\n".join(lines)
+
+
+class StatsPanel(QDialog):
+    """Fenêtre des mesures de performance, actualisée chaque seconde tant qu'elle est visible."""
+
+    enabled_changed = pyqtSignal(bool)
+
+    def __init__(self, metrics, parent=None, readahead=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.readahead = readahead
+        self.setWindowTitle("Mesures de performance")
+        self.resize(720, 420)
+        layout = QVBoxLayout(self)
+
+        self.enabled_check = QCheckBox("Mesures activées")
+        self.enabled_check.setChecked(metrics.enabled)
+        self.enabled_check.toggled.connect(self.set_enabled)
+        layout.addWidget(self.enabled_check)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addWidget(self.text)
+
+        buttons = QHBoxLayout()
+        json_btn = QPushButton("Exporter JSON...")
+        json_btn.clicked.connect(lambda: self.export("JSON (*.json)", self.metrics.to_json))
+        prometheus_btn = QPushButton("Exporter Prometheus...")
+        prometheus_btn.clicked.connect(lambda: self.export("Prometheus (*.prom *.txt)", self.metrics.to_prometheus))
+        reset_btn = QPushButton("Remettre à zéro")
+        reset_btn.clicked.connect(self.reset)
+        buttons.addWidget(json_btn)
+        buttons.addWidget(prometheus_btn)
+        buttons.addWidget(reset_btn)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def refresh(self):
+        readahead = self.readahead.stats() if self.readahead is not None else None
+        text = render(self.metrics.snapshot(), readahead)
+        if text != self.text.toPlainText():
+            # Garde la position de défilement pendant la lecture du tableau
+            scroll = self.text.verticalScrollBar().value()
+            self.text.setPlainText(text)
+            self.text.verticalScrollBar().setValue(scroll)
+
+    def set_enabled(self, enabled):
+        self.metrics.enabled = enabled
+        self.enabled_changed.emit(enabled)
+        self.refresh()
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()
+
+    def export(self, file_filter, serialize):
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter les mesures", "", file_filter)
+        if not path:
+            return
+        try:
+            atomic_write(path, serialize().encode("utf-8"))
+        except OSError as e:
+            QMessageBox.critical(self, "Erreur d'export", f"Impossible d'écrire {path} : {e}")
@@ -0,0 +1,60 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class TaskPool(QObject):
+    """Pool de tâches de fond (threads ou processus) dont les résultats arrivent par signaux Qt.
+
+    Chaque tâche a une clé ; une clé déjà en cours n'est pas soumise deux fois.
+    Les résultats sont toujours livrés dans le thread GUI.
+    """
+
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+    _completed = pyqtSignal(object, object)
+
+    def __init__(self, processes=False, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.processes = processes
+        self.max_workers = max_workers
+        self._executor = None
+        self._in_flight = set()
+        self._completed.connect(self._on_completed)
+
+    def submit(self, key, fn, *args):
+        if key in self._in_flight:
+            return False
+        if self._executor is None:
+            # Créé à la première tâche : aucun processus lancé tant qu'il n'y a rien à faire
+            if self.processes:
+                # "spawn" : ne jamais forker un processus qui fait tourner Qt
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+        self._in_flight.add(key)
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda f, key=key: self._completed.emit(key, f))
+        return True
+
+    def is_pending(self, key):
+        return key in self._in_flight
+
+    def pending_count(self):
+        return len(self._in_flight)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._in_flight.clear()
+
+    def _on_completed(self, key, future):
+        self._in_flight.discard(key)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.failed.emit(key, str(error))
+        else:
+            self.finished.emit(key, future.result())
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# Les modules de l'application sont à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """Application Qt sans fenêtre (signaux, QTimer, widgets hors écran)."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
@@ -0,0 +1,29 @@
+import os
+
+from dedupe import quarantine, QUARANTINE_DIR
+from library import LibraryIndex
+
+
+def test_quarantine_keeps_tree_and_never_overwrites(tmp_path):
+    root = tmp_path / "musique"
+    (root / "album").mkdir(parents=True)
+    for content in (b"un", b"deux"):
+        (root / "album" / "piste.mp3").write_bytes(content)
+        destination = quarantine(str(root / "album" / "piste.mp3"), str(root))
+        assert not (root / "album" / "piste.mp3").exists()
+        assert open(destination, "rb").read() == content
+    kept = sorted(os.listdir(root / QUARANTINE_DIR / "album"))
+    assert kept == ["piste (2).mp3", "piste.mp3"]
+
+
+def test_quarantine_is_not_indexed(tmp_path):
+    root = tmp_path / "musique"
+    root.mkdir()
+    (root / "a.mp3").write_bytes(b"a")
+    (root / "b.mp3").write_bytes(b"a")
+    quarantine(str(root / "b.mp3"), str(root))
+    library = LibraryIndex(str(tmp_path / "library.db"))
+    try:
+        assert library.scan(str(root)) == ["a.mp3"]
+    finally:
+        library.close()
@@ -0,0 +1,124 @@
+import os
+import types
+
+import pytest
+
+pytest.importorskip("PyQt6.QtCore")
+
+import downloads
+from downloads import DownloadCache, DownloadJob, DownloadWorker, _WorkerSignals
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+# Seules les exceptions de yt-dlp sont utilisées quand un `ydl_factory` est fourni
+FAKE_YT_DLP = types.SimpleNamespace(utils=types.SimpleNamespace(DownloadError=DownloadError,
+                                                                DownloadCancelled=DownloadCancelled))
+
+
+class FakeYoutubeDL:
+    """YoutubeDL hors ligne : des vidéos connues d'avance, un « téléchargement » qui écrit le MP3."""
+
+    videos = {}
+    probes = []
+    downloads = []
+
+    def __init__(self, params):
+        self.params = dict(params)
+        # Comme yt-dlp : le modèle de nom est normalisé en dictionnaire
+        self.params["outtmpl"] = {"default": params["outtmpl"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=True, process=True):
+        self.probes.append(url)
+        if url not in self.videos:
+            raise DownloadError(f"vidéo introuvable : {url}")
+        return dict(self.videos[url], webpage_url=url)
+
+    def prepare_filename(self, info):
+        name = self.params["outtmpl"]["default"]
+        for field in ("title", "id", "ext"):
+            name = name.replace(f"%({field})s", str(info[field]))
+        return name
+
+    def process_ie_result(self, info, download=True):
+        path = self.prepare_filename(info).rsplit(".", 1)[0] + ".mp3"
+        for hook in self.params["progress_hooks"]:
+            hook({"status": "downloading", "_percent_str": " 50.0%"})
+            hook({"status": "finished", "total_bytes": 3, "elapsed": 1.0})
+        with open(path, "wb") as f:
+            f.write(info["id"].encode())
+        self.downloads.append(info["id"])
+        return dict(info, requested_downloads=[{"filepath": path}])
+
+    def sanitize_info(self, info):
+        return info
+
+
+@pytest.fixture
+def fake_ydl(monkeypatch):
+    monkeypatch.setattr(downloads, "_yt_dlp", lambda: FAKE_YT_DLP)
+    monkeypatch.setattr(FakeYoutubeDL, "probes", [])
+    monkeypatch.setattr(FakeYoutubeDL, "downloads", [])
+    monkeypatch.setattr(FakeYoutubeDL, "videos", {
+        "https://example.com/watch?v=aaa": {"id": "aaa", "title": "Chanson", "ext": "webm", "extractor_key": "Fake"},
+        "https://example.com/watch?v=bbb": {"id": "bbb", "title": "Chanson", "ext": "webm", "extractor_key": "Fake"},
+        "https://short.example/aaa": {"id": "aaa", "title": "Chanson", "ext": "webm", "extractor_key": "Fake"},
+    })
+    return FakeYoutubeDL
+
+
+def test_probe_download_collision_and_cache_hits(qapp, tmp_path, fake_ydl):
+    folder = str(tmp_path / "music")
+    os.mkdir(folder)
+    cache = DownloadCache(str(tmp_path / "cache.json"))
+    signals = _WorkerSignals()
+    results = []
+    signals.finished.connect(lambda job_id, name: results.append(name))
+    signals.failed.connect(lambda job_id, message: results.append(("failed", message)))
+
+    def download(url):
+        DownloadWorker(DownloadJob(url), folder, signals, cache, ydl_factory=fake_ydl).run()
+        return results[-1]
+
+    # Sonde puis téléchargement
+    assert download("https://example.com/watch?v=aaa") == "Chanson.mp3"
+    assert fake_ydl.probes == ["https://example.com/watch?v=aaa"] and fake_ydl.downloads == ["aaa"]
+
+    # Même titre, autre vidéo : l'identifiant départage les deux fichiers
+    assert download("https://example.com/watch?v=bbb") == "Chanson [bbb].mp3"
+    assert sorted(os.listdir(folder)) == ["Chanson [bbb].mp3", "Chanson.mp3"]
+
+    # URL déjà vue : servie par le cache, sans accès au « réseau »
+    probes = len(fake_ydl.probes)
+    assert download("https://example.com/watch?v=aaa") == "Chanson.mp3"
+    assert len(fake_ydl.probes) == probes
+
+    # Même vidéo sous une autre URL : une sonde, pas de téléchargement
+    assert download("https://short.example/aaa") == "Chanson.mp3"
+    assert fake_ydl.downloads == ["aaa", "bbb"]
+
+    # Le cache survit au redémarrage
+    assert DownloadCache(str(tmp_path / "cache.json")).lookup_url("https://example.com/watch?v=bbb", folder) \
+        == "Chanson [bbb].mp3"
+
+
+def test_unknown_video_fails_without_network(qapp, tmp_path, fake_ydl):
+    cache = DownloadCache(None)
+    signals = _WorkerSignals()
+    failures = []
+    signals.failed.connect(lambda job_id, message: failures.append(message))
+    DownloadWorker(DownloadJob("https://example.com/watch?v=zzz"), str(tmp_path), signals, cache,
+                   ydl_factory=fake_ydl).run()
+    assert failures and failures[0].startswith("Erreur yt-dlp")
@@ -0,0 +1,71 @@
+import os
+
+from library import LibraryIndex
+
+
+def test_file_rewritten_in_place_updates_its_row(tmp_path):
+    music = tmp_path / "music"
+    (music / "album").mkdir(parents=True)
+    track = music / "album" / "a.mp3"
+    track.write_bytes(b"a" * 10)
+    (music / "album" / "b.mp3").write_bytes(b"b" * 10)
+    library = LibraryIndex(str(tmp_path / "library.db"))
+    try:
+        library.scan(str(music))
+
+        track.write_bytes(b"a" * 25)
+        os.utime(track, ns=(1_000_000_000, 1_000_000_000))
+        # Le réencodage sur place passe par un fichier temporaire : le dossier change
+        (music / "album" / "tmp.part").write_bytes(b"")
+        os.remove(music / "album" / "tmp.part")
+        os.utime(music / "album", ns=(2_000_000_000, 2_000_000_000))
+
+        assert library.refresh(str(music)) == ([], [], [], ["album/a.mp3"])
+        entries = dict((name, (size, mtime)) for name, size, mtime in library.entries_in(str(music)))
+        assert entries["album/a.mp3"] == (25, 1_000_000_000)
+        assert entries["album/b.mp3"][0] == 10
+    finally:
+        library.close()
+
+
+def test_refresh_dirs_reads_only_the_reported_directories(tmp_path, monkeypatch):
+    music = tmp_path / "music"
+    for folder in ("a", "a/deep", "b", "c", "untouched/x", "untouched/y"):
+        (music / folder).mkdir(parents=True)
+        (music / folder / "t.mp3").write_bytes(folder.encode())
+    (music / "c" / "gone").mkdir()
+    (music / "c" / "gone" / "g.mp3").write_bytes(b"g")
+    root = str(music)
+    library = LibraryIndex(str(tmp_path / "library.db"))
+    try:
+        library.scan(root)
+
+        (music / "a" / "deep" / "new.mp3").write_bytes(b"new")
+        os.rename(music / "b" / "t.mp3", music / "a" / "moved.mp3")
+        (music / "c" / "gone" / "g.mp3").unlink()
+        (music / "c" / "gone").rmdir()
+        (music / "c" / "fresh" / "inner").mkdir(parents=True)
+        (music / "c" / "fresh" / "inner" / "f.mp3").write_bytes(b"f")
+        reported = [music / "a", music / "a" / "deep", music / "b", music / "c"]
+
+        listed = []
+        scandir = os.scandir
+        monkeypatch.setattr(os, "scandir", lambda path: listed.append(path) or scandir(path))
+        changes = library.refresh_dirs({root: [str(path) for path in reported]})
+        monkeypatch.setattr(os, "scandir", scandir)
+
+        assert changes[root] == (["a/deep/new.mp3", "c/fresh/inner/f.mp3"], ["c/gone/g.mp3"],
+                                 [("b/t.mp3", "a/moved.mp3")], [])
+        assert not any("untouched" in path for path in listed)
+        assert str(music / "c" / "fresh" / "inner") in library.directories(root)
+        assert str(music / "c" / "gone") not in library.directories(root)
+
+        fresh = LibraryIndex(str(tmp_path / "fresh.db"))
+        try:
+            fresh.scan(root)
+            assert library.entries_in(root) == fresh.entries_in(root)
+            assert library.is_current(root)
+        finally:
+            fresh.close()
+    finally:
+        library.close()
@@ -0,0 +1,97 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import loudness
+from loudness import LoudnessMeter, integrated_loudness
+
+
+def sine(seconds, frequency=997, amplitude=1.0):
+    t = np.arange(int(seconds * loudness.SAMPLE_RATE)) / loudness.SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def test_reference_sine_on_one_channel():
+    samples = np.zeros((5 * loudness.SAMPLE_RATE, 2), np.float32)
+    samples[:, 0] = sine(5)
+    # ITU-R BS.1770 : sinus 1 kHz à 0 dBFS sur un canal = -3,01 LKFS
+    assert integrated_loudness(samples) == pytest.approx(-3.01, abs=0.05)
+
+
+def test_fed_in_pieces_matches_whole_signal():
+    rng = np.random.default_rng(1)
+    samples = np.stack([sine(30, 440, 0.3), 0.1 * rng.standard_normal(30 * loudness.SAMPLE_RATE)], axis=1)
+    samples = samples.astype(np.float32)
+    meter = LoudnessMeter()
+    start = 0
+    while start < len(samples):
+        size = int(rng.integers(1, 200_000))
+        meter.feed(samples[start:start + size])
+        start += size
+    assert meter.loudness() == pytest.approx(integrated_loudness(samples), abs=1e-6)
+    assert meter.peak == pytest.approx(float(np.abs(samples).max()))
+
+
+def test_silence_and_short_signal_have_no_loudness():
+    assert integrated_loudness(np.zeros((10 * loudness.SAMPLE_RATE, 2), np.float32)) is None
+    assert integrated_loudness(np.ones((loudness.SAMPLE_RATE // 5, 2), np.float32)) is None
+
+
+class FakeFFmpeg:
+    """Processus FFmpeg simulé : le PCM est servi par un tube lu morceau par morceau."""
+
+    reads = []
+
+    def __init__(self, pcm, returncode=0, error=b""):
+        self.stdout = _CountingReader(pcm, self.reads)
+        self.stderr = io.BytesIO(error)
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+
+class _CountingReader(io.BytesIO):
+    def __init__(self, data, reads):
+        super().__init__(data)
+        self._reads = reads
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self._reads.append(len(data))
+        return data
+
+
+def test_analyze_streams_the_decoded_pcm(tmp_path, monkeypatch):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"")
+    # Un peu plus de deux blocs de décodage
+    samples = np.stack([sine(45, 440, 0.5)] * 2, axis=1)
+    reads = []
+    monkeypatch.setattr(FakeFFmpeg, "reads", reads)
+    monkeypatch.setattr(loudness.subprocess, "Popen", lambda *args, **kwargs: FakeFFmpeg(samples.tobytes()))
+
+    result = loudness.analyze(str(path))
+
+    block = loudness.DECODE_FRAMES * 8
+    assert [size for size in reads if size] == [block, block, len(samples) * 8 - 2 * block]
+    assert result["lufs"] == pytest.approx(integrated_loudness(samples), abs=1e-6)
+    assert result["peak"] == pytest.approx(0.5, abs=1e-3)
+
+
+def test_decoding_error_is_reported(tmp_path, monkeypatch):
+    path = tmp_path / "broken.mp3"
+    path.write_bytes(b"")
+    monkeypatch.setattr(loudness.subprocess, "Popen",
+                        lambda *args, **kwargs: FakeFFmpeg(b"", returncode=1, error=b"Invalid data"))
+    with pytest.raises(RuntimeError, match="Invalid data"):
+        loudness.analyze(str(path))
+    assert loudness.analyze_batch([str(path)])[0]["lufs"] is None
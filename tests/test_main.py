@@ -0,0 +1,116 @@
+import os
+import json
+
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+from library import LibraryIndex
+from test_playback import FakeDeck
+
+
+@pytest.fixture
+def player(qapp, tmp_path, monkeypatch):
+    """Fenêtre sur une petite bibliothèque déjà indexée, lecteurs simulés, sans tâches de fond."""
+    import main
+
+    folder = tmp_path / "musique"
+    folder.mkdir()
+    for name in ("A", "B", "C", "D"):
+        (folder / f"{name}.mp3").write_bytes(b"")
+    (tmp_path / "config.json").write_text(json.dumps(
+        {"audio_folder_path": str(folder), "shuffle_seed": 1, "loudness_normalization": False}))
+    monkeypatch.chdir(tmp_path)
+    index = LibraryIndex()
+    index.scan(str(folder))
+    index.close()
+
+    window = main.MusicPlayer()
+    window.media_player._deck_pair = [FakeDeck(), FakeDeck()]
+    monkeypatch.setattr(window.media_player, "is_playing", lambda: True)
+    monkeypatch.setattr(window.media_player, "is_stopped", lambda: False)
+    # Ni décodage ni forme d'onde : les fichiers sont vides
+    monkeypatch.setattr(window, "show_waveform", lambda name: None)
+    monkeypatch.setattr(window, "queue_loudness", lambda paths: None)
+    yield window
+    window.playlists.close()
+    window.library.close()
+
+
+def advance(window):
+    assert window.media_player.advance_to_next()
+    return window.play_queue.current()
+
+
+def test_insert_after_current_track_is_preloaded(player):
+    player.load_track(1)
+    player.add_library_track("Ba.mp3")
+    assert player.media_player.standby.tag == (2, "Ba.mp3")
+    assert advance(player) == (2, "Ba.mp3")
+
+
+def test_shuffle_append_is_preloaded(player):
+    player.play_queue.set_shuffle(True)
+    player.load_track(0)
+    for name in ("X1.mp3", "X2.mp3", "X3.mp3"):
+        player.add_library_track(name)
+    assert player.media_player.standby.tag == player.play_queue.peek_next()
+    expected = player.play_queue.peek_next()
+    assert advance(player) == expected
+
+
+def test_advance_follows_the_engine_when_the_queue_moved_since_preload(player):
+    player.load_track(1)
+    assert player.media_player.standby.tag == (2, "C.mp3")
+    # File modifiée sans nouveau préchargement : le moteur joue quand même C
+    player.play_queue.play_next("D.mp3", 3)
+    entry = advance(player)
+    assert entry == (2, "C.mp3")
+    assert player.current_track_name() == "C.mp3"
+    assert player.play_queue.history()[-1] == (1, "B.mp3")
+
+
+def test_advance_to_a_track_removed_since_preload(player):
+    player.load_track(1)
+    player.play_queue.row_removed(2)
+    del player.all_files_in_folder[2]
+    assert advance(player) == (None, "C.mp3")
+
+
+def test_smart_playlist_rebuild_keeps_the_current_track(player):
+    from smart_playlists import parse_rules
+
+    player.rebuild_smart_playlists()
+    player.playlists.create("Vide")
+    player.smart_playlists.create("Hors Vide", parse_rules("hors Vide"), player.all_files_in_folder)
+    player.change_playlist("Hors Vide")
+    player.load_track(2)
+    assert player.play_queue.current() == (2, "C.mp3")
+
+    player.rebuild_smart_playlists()
+
+    assert player.play_queue.current() == (2, "C.mp3")
+    assert player.media_player.standby.tag == (3, "D.mp3")
+    assert advance(player) == (3, "D.mp3")
+
+
+def test_rewritten_track_is_reanalysed(player, monkeypatch):
+    queued = {"metadata": [], "loudness": []}
+    monkeypatch.setattr(player, "queue_metadata", lambda paths: queued["metadata"].extend(paths))
+    monkeypatch.setattr(player, "queue_loudness", lambda paths: queued["loudness"].extend(paths))
+    shown = []
+    monkeypatch.setattr(player, "show_waveform", shown.append)
+    player.loudness["B.mp3"] = {"lufs": -8.0, "peak": 1.0}
+    player.load_track(1)
+    shown.clear()
+
+    folder = os.path.dirname(player.track_path("B.mp3"))
+    with open(player.track_path("B.mp3"), "wb") as f:
+        f.write(b"reencoded")
+    os.utime(folder, ns=(1, 1))
+    player.scan_library()
+
+    path = player.track_path("B.mp3")
+    assert path in queued["metadata"] and path in queued["loudness"]
+    assert "B.mp3" not in player.loudness
+    assert shown == ["B.mp3"]
@@ -0,0 +1,87 @@
+from play_queue import PlayQueue
+
+
+def names(count):
+    return [f"t{i}.mp3" for i in range(count)]
+
+
+def test_next_previous_and_wrap():
+    queue = PlayQueue(names(3))
+    assert [queue.next() for _ in range(4)] == [(0, "t0.mp3"), (1, "t1.mp3"), (2, "t2.mp3"), (0, "t0.mp3")]
+    assert queue.previous() == (2, "t2.mp3")
+    assert queue.previous() == (1, "t1.mp3")
+    assert queue.next() == (2, "t2.mp3")
+
+
+def test_previous_wraps_without_history():
+    queue = PlayQueue(names(3))
+    queue.jump(0)
+    assert queue.previous() == (2, "t2.mp3")
+
+
+def test_upcoming_queue_goes_first():
+    queue = PlayQueue(names(3))
+    queue.next()
+    queue.play_next("extra.mp3")
+    assert queue.next() == (None, "extra.mp3")
+    assert queue.next() == (1, "t1.mp3")
+
+
+def test_shuffle_is_a_reproducible_permutation():
+    tracks = names(20)
+    queue = PlayQueue(tracks, seed=7)
+    queue.set_shuffle(True)
+    played = [queue.next()[0] for _ in range(20)]
+    assert sorted(played) == list(range(20))
+    assert played != list(range(20))
+
+    again = PlayQueue(tracks, seed=7)
+    again.set_shuffle(True)
+    assert [again.next()[0] for _ in range(20)] == played
+
+
+def test_shuffle_insert_keeps_played_prefix_and_lands_after_cursor():
+    tracks = names(10)
+    queue = PlayQueue(tracks, seed=3)
+    queue.set_shuffle(True)
+    played = [queue.next()[1] for _ in range(4)]
+    for i in range(5):
+        tracks.insert(0, f"new{i}.mp3")
+        queue.row_inserted(0)
+    assert queue.current() == (tracks.index(played[-1]), played[-1])
+    rest = [queue.next()[1] for _ in range(len(tracks) - 4)]
+    assert set(rest) == set(tracks) - set(played)
+    # Le tour suivant rejoue le même ordre, début déjà joué compris
+    assert [queue.next()[1] for _ in range(4)] == played
+
+
+def test_shuffle_remove_current_and_played():
+    tracks = names(10)
+    queue = PlayQueue(tracks, seed=5)
+    queue.set_shuffle(True)
+    order = [queue.next()[1] for _ in range(10)]
+    queue.jump(tracks.index(order[4]))
+    following = order[5]
+
+    row = tracks.index(order[4])
+    del tracks[row]
+    queue.row_removed(row)
+    assert queue.current() == (None, order[4])
+    row = tracks.index(order[1])
+    del tracks[row]
+    queue.row_removed(row)
+
+    assert queue.next() == (tracks.index(following), following)
+    rest = [queue.next()[1] for _ in range(4)]
+    assert rest == order[6:]
+    assert [queue.next()[1] for _ in range(3)] == [order[0], order[2], order[3]]
+
+
+def test_remove_current_without_shuffle_plays_the_following_row():
+    tracks = names(5)
+    queue = PlayQueue(tracks)
+    queue.jump(2)
+    del tracks[2]
+    queue.row_removed(2)
+    assert queue.current() == (None, "t2.mp3")
+    assert queue.next() == (2, "t3.mp3")
@@ -0,0 +1,116 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtCore")
+from PyQt6.QtCore import QUrl
+
+from playback import GaplessPlayer
+
+DURATION_MS = 10_000
+CROSSFADE_MS = 2_000
+
+
+class FakeMediaPlayer:
+    def __init__(self):
+        self.playing = False
+        self.position = 0
+
+    def play(self):
+        self.playing = True
+
+    def stop(self):
+        self.playing = False
+
+    def pause(self):
+        self.playing = False
+
+    def setPosition(self, position):
+        self.position = position
+
+    def duration(self):
+        return DURATION_MS
+
+
+class FakeOutput:
+    def setVolume(self, volume):
+        self.volume = volume
+
+
+class FakeDeck:
+    """_Deck sans QtMultimedia : toute piste chargée est aussitôt prête."""
+
+    def __init__(self):
+        self.player = FakeMediaPlayer()
+        self.output = FakeOutput()
+        self.fade = 1.0
+        self.gain = 1.0
+        self.tag = None
+        self.url = QUrl()
+        self.stream = None
+
+    def load(self, url, stream=None):
+        self.url = url
+        self.stream = stream
+
+    def is_ready(self):
+        return not self.url.isEmpty()
+
+
+def url(name):
+    return QUrl.fromLocalFile(f"/musique/{name}.mp3")
+
+
+@pytest.fixture
+def player(qapp):
+    player = GaplessPlayer(CROSSFADE_MS)
+    player._deck_pair = [FakeDeck(), FakeDeck()]
+    return player
+
+
+def near_end(player):
+    """Position du lecteur actif entrée dans la zone de fondu."""
+    player._on_position(player._active, DURATION_MS - CROSSFADE_MS + 100)
+
+
+def test_two_consecutive_crossfades(player):
+    advanced = []
+    upcoming = iter(["b", "c", "d"])
+
+    def preload_next():
+        name = next(upcoming)
+        player.set_next_source(url(name), name)
+
+    def on_advanced(tag):
+        # Comme la fenêtre : la suivante est demandée dès le passage, pendant le fondu
+        advanced.append(tag)
+        preload_next()
+
+    player.advanced.connect(on_advanced)
+    player.active.load(url("a"))
+    preload_next()
+
+    near_end(player)
+    assert advanced == ["b"]
+    # Le lecteur de réserve est celui qui s'éteint : la suivante attend la fin du fondu
+    assert player.standby is player._fading_out
+    assert player.standby.url == url("a")
+
+    player._finish_fade()
+    assert player.standby.url == url("c")
+    assert player.standby.tag == "c"
+
+    near_end(player)
+    assert advanced == ["b", "c"]
+    player._finish_fade()
+    assert player.standby.url == url("d")
+
+
+def test_clear_next_during_fade_cancels_pending(player):
+    player.active.load(url("a"))
+    player.set_next_source(url("b"), "b")
+    near_end(player)
+    player.set_next_source(url("c"), "c")
+    player.clear_next()
+    player._finish_fade()
+    # L'ancienne piste active n'est plus une « suivante » possible
+    assert player.standby.tag is None
+    assert not player._can_advance()
@@ -0,0 +1,109 @@
+import os
+import asyncio
+import threading
+
+import pytest
+
+from library import LibraryRoots, LIBRARY_DB_FILE
+from server import LibraryServer
+
+
+async def get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def test_server_keeps_its_own_index_and_scans_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    music = tmp_path / "music"
+    music.mkdir()
+    (music / "a.mp3").write_bytes(b"a" * 10)
+    server = LibraryServer(LibraryRoots(str(music)), db_path=str(tmp_path / "server.db"),
+                           snapshot_path=str(tmp_path / "p.json"), journal_path=str(tmp_path / "p.log"))
+    scan_threads = []
+    scan = server._scan
+    monkeypatch.setattr(server, "_scan", lambda force: scan_threads.append(threading.current_thread()) or scan(force))
+
+    async def scenario():
+        host, port = await server.start("127.0.0.1", 0)
+        first = await get(host, port, "/api/tracks")
+        (music / "b.mp3").write_bytes(b"b" * 20)
+        server._checked_at = 0.0
+        second = await get(host, port, "/api/tracks")
+        server.server.close()
+        return first, second
+
+    try:
+        first, second = asyncio.run(scenario())
+    finally:
+        server.close()
+    assert b"a.mp3" in first and b"b.mp3" not in first
+    assert b"b.mp3" in second
+    assert scan_threads and threading.main_thread() not in scan_threads
+    assert not os.path.exists(tmp_path / LIBRARY_DB_FILE)
+
+
+def test_server_refuses_the_window_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        LibraryServer(LibraryRoots(str(tmp_path)), db_path=LIBRARY_DB_FILE)
+
+
+def window_store(tmp_path):
+    from playlist_store import PlaylistStore
+    return PlaylistStore(str(tmp_path / "p.json"), str(tmp_path / "p.log"), legacy_path=None,
+                         computed=("Toutes les pistes",))
+
+
+def test_playlists_survive_a_compaction_by_the_window(tmp_path, monkeypatch):
+    import json
+    import server as server_module
+
+    monkeypatch.chdir(tmp_path)
+    music = tmp_path / "music"
+    music.mkdir()
+    store = window_store(tmp_path)
+    for name, tracks in (("A", ["a1.mp3"]), ("B", ["b1.mp3", "b2.mp3"])):
+        store.create(name)
+        store[name].extend(tracks)
+        store.record_extend(name, tracks)
+    store.compact()
+
+    server = LibraryServer(LibraryRoots(str(music)), db_path=str(tmp_path / "server.db"),
+                           snapshot_path=str(tmp_path / "p.json"), journal_path=str(tmp_path / "p.log"))
+
+    def compact_with_new_tracks():
+        # Des pistes ajoutées devant B décalent sa position dans l'instantané
+        store["A"].extend([f"new{i}.mp3" for i in range(50)])
+        store.record_extend("A", [f"new{i}.mp3" for i in range(50)])
+        store.compact()
+
+    try:
+        assert json.loads(server.route_api("/api/playlists/B"))["tracks"] == ["b1.mp3", "b2.mp3"]
+        compact_with_new_tracks()
+        assert json.loads(server.route_api("/api/playlists/B"))["tracks"] == ["b1.mp3", "b2.mp3"]
+
+        # Compaction pendant la lecture même : entre l'en-tête et les playlists
+        opened = server_module.PlaylistStore
+
+        def open_then_compact(*args, **kwargs):
+            playlists = opened(*args, **kwargs)
+            if not compacted:
+                compacted.append(True)
+                store["B"].append("b3.mp3")
+                store.record_append("B", "b3.mp3")
+                compact_with_new_tracks()
+            return playlists
+
+        compacted = []
+        monkeypatch.setattr(server_module, "PlaylistStore", open_then_compact)
+        server._playlists_stamp = None
+        assert json.loads(server.route_api("/api/playlists/B"))["tracks"] == ["b1.mp3", "b2.mp3", "b3.mp3"]
+        assert compacted
+    finally:
+        server.close()
+        store.close()
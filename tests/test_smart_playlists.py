@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+from playlist_store import PlaylistStore
+from smart_playlists import SmartPlaylists, SmartPlaylist, parse_rules, PLAYS, METADATA, DAY_SECONDS
+
+NOW = 1_000_000_000.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = NOW
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PlaylistStore(str(tmp_path / "playlists.snapshot"), str(tmp_path / "playlists.journal"),
+                          legacy_path=None, computed=("Toutes les pistes",))
+    yield store
+    store.close()
+
+
+def make(store, library, stats, definitions, metadata=None, clock=None):
+    smart = SmartPlaylists(store, metadata if metadata is not None else {}, stats, clock=clock or Clock())
+    for name, text in definitions.items():
+        smart.create(name, parse_rules(text), library)
+    smart.build(library)
+    return smart
+
+
+def test_top_n_insert_pushes_the_last_one_out(store):
+    library = ["a.mp3", "b.mp3", "c.mp3", "d.mp3"]
+    stats = {"a.mp3": {"added": NOW, "plays": 5}, "b.mp3": {"added": NOW, "plays": 3},
+             "c.mp3": {"added": NOW, "plays": 1}, "d.mp3": {"added": NOW, "plays": 0}}
+    smart = make(store, library, stats, {"top": "top 2"})
+    top = smart.get("top")
+    assert top.tracks == ["a.mp3", "b.mp3"]
+
+    stats["c.mp3"]["plays"] = 2
+    smart.tracks_changed(["c.mp3"], PLAYS)
+    assert top.tracks == ["a.mp3", "b.mp3"]
+
+    stats["c.mp3"]["plays"] = 4
+    smart.tracks_changed(["c.mp3"], PLAYS)
+    assert top.tracks == ["a.mp3", "c.mp3"]
+
+    # Jamais écoutée : pas dans le classement, même si le top n'est pas plein
+    stats["d.mp3"]["plays"] = 9
+    smart.tracks_changed(["d.mp3"], METADATA)
+    assert top.tracks == ["a.mp3", "c.mp3"]
+    smart.tracks_changed(["d.mp3"], PLAYS)
+    assert top.tracks == ["d.mp3", "a.mp3"]
+
+
+def test_top_n_remove_promotes_the_next_one(store):
+    library = ["a.mp3", "b.mp3", "c.mp3"]
+    stats = {name: {"added": NOW, "plays": plays} for name, plays in zip(library, (3, 2, 1))}
+    smart = make(store, library, stats, {"top": "top 2"})
+    top = smart.get("top")
+
+    library.remove("a.mp3")
+    smart.tracks_removed(["a.mp3"])
+    assert top.tracks == ["b.mp3", "c.mp3"]
+    library.remove("c.mp3")
+    smart.tracks_removed(["c.mp3"])
+    assert top.tracks == ["b.mp3"]
+
+
+def test_expire_removes_old_tracks_and_keeps_readded_ones(store):
+    clock = Clock()
+    library = ["old.mp3", "new.mp3"]
+    stats = {"old.mp3": {"added": NOW - 6 * DAY_SECONDS, "plays": 0}, "new.mp3": {"added": NOW, "plays": 0}}
+    smart = make(store, library, stats, {"recent": "ajoutée < 7"}, clock=clock)
+    recent = smart.get("recent")
+    assert recent.tracks == ["new.mp3", "old.mp3"]
+
+    # Rajoutée depuis : sa date d'ajout avance sans autre événement
+    stats["old.mp3"]["added"] = NOW + 2 * DAY_SECONDS
+    clock.now = NOW + 1.5 * DAY_SECONDS
+    smart.expire()
+    assert recent.tracks == ["new.mp3", "old.mp3"]
+
+    clock.now = NOW + 7.5 * DAY_SECONDS
+    smart.expire()
+    assert recent.tracks == ["old.mp3"]
+
+    # La nouvelle échéance a bien été enregistrée
+    clock.now = NOW + 9.5 * DAY_SECONDS
+    smart.expire()
+    assert recent.tracks == []
+
+
+def test_incremental_updates_match_a_full_rebuild(store):
+    rng = random.Random(3)
+    clock = Clock()
+    library = sorted(f"t{i:02d} {'live' if i % 3 == 0 else 'studio'}.mp3" for i in range(30))
+    store.create("Fav")
+    metadata = {name: {"duration_ms": rng.randrange(60, 600) * 1000} for name in library}
+    stats = {name: {"added": NOW - rng.randrange(0, 20) * DAY_SECONDS, "plays": rng.randrange(0, 5)}
+             for name in library}
+    definitions = {"a": "contient live; durée < 300", "b": "top 5; hors Fav", "c": "ajoutée < 7",
+                   "d": "top 3; contient studio"}
+    smart = make(store, library, stats, definitions, metadata, clock)
+
+    for step in range(500):
+        roll = rng.random()
+        name = rng.choice(library)
+        if roll < 0.3:
+            stats[name]["plays"] += 1
+            smart.tracks_changed([name], PLAYS)
+        elif roll < 0.45:
+            metadata[name]["duration_ms"] = rng.randrange(60, 600) * 1000
+            smart.tracks_changed([name], METADATA)
+        elif roll < 0.55:
+            if name not in store["Fav"]:
+                store["Fav"].append(name)
+                smart.playlist_changed("Fav", [name])
+        elif roll < 0.7:
+            library.remove(name)
+            smart.tracks_removed([name])
+        elif roll < 0.85:
+            new = f"n{step:03d}{' live' if rng.random() < 0.5 else ''}.mp3"
+            library.append(new)
+            library.sort()
+            metadata[new] = {"duration_ms": 100_000}
+            stats[new] = {"added": clock.now, "plays": 0}
+            smart.tracks_added([new])
+        else:
+            clock.now += 3600 * rng.randrange(1, 30)
+            smart.expire()
+        for name in definitions:
+            playlist = smart.get(name)
+            reference = SmartPlaylist(name, playlist.rules)
+            smart._build(reference, library)
+            assert playlist.tracks == reference.tracks, (step, name)
@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+from instrumentation import Metrics
+from stats_panel import render
+
+
+def test_readahead_stats_shown_with_measurements_disabled():
+    metrics = Metrics(enabled=False)
+    stats = {"hits": 7, "misses": 2, "evictions": 1, "used_bytes": 3 * 1024 * 1024,
+             "budget_bytes": 64 * 1024 * 1024, "entries": 2}
+    text = render(metrics.snapshot(), stats)
+    assert "Mesures désactivées." in text
+    assert "2 piste(s), 3.0 / 64.0 Mo" in text
+    assert "7 succès, 2 échec(s), 1 éviction(s)" in text
+    assert "Cache de lecture anticipée" not in render(metrics.snapshot())
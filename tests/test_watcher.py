@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtCore")
+
+from library import LibraryIndex, LibraryRoots
+from watcher import LibraryWatcher
+
+
+def test_flush_refreshes_only_the_reported_directories(qapp, tmp_path):
+    music = tmp_path / "music"
+    (music / "a").mkdir(parents=True)
+    (music / "b").mkdir()
+    library = LibraryIndex(str(tmp_path / "library.db"))
+    try:
+        library.scan(str(music))
+        watcher = LibraryWatcher(library, LibraryRoots(str(music)))
+        published = []
+        watcher.changes_ready.connect(lambda *changes: published.append(changes))
+        refreshed = []
+        refresh_dirs = library.refresh_dirs
+        library.refresh_dirs = lambda changed: refreshed.append(changed) or refresh_dirs(changed)
+
+        (music / "a" / "x.mp3").write_bytes(b"x")
+        (music / "a" / "sub").mkdir()
+        watcher._on_directory_changed(str(music / "a"))
+        watcher.flush()
+
+        assert refreshed == [{str(music): [str(music / "a")]}]
+        assert published == [(["a/x.mp3"], [], [], [])]
+        assert str(music / "a" / "sub") in watcher.watcher.directories()
+    finally:
+        library.close()
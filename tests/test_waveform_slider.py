@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets")
+from PyQt6.QtCore import Qt, QPoint
+from PyQt6.QtTest import QTest
+
+from waveform_slider import WaveformSlider
+
+
+def test_click_emits_pressed_and_released_once(qapp):
+    slider = WaveformSlider("#1DB954", "#555555")
+    slider.resize(200, 30)
+    slider.setRange(0, 1000)
+    events = []
+    slider.sliderPressed.connect(lambda: events.append("pressed"))
+    slider.sliderReleased.connect(lambda: events.append("released"))
+
+    QTest.mouseClick(slider, Qt.MouseButton.LeftButton, pos=QPoint(100, 15))
+
+    assert events == ["pressed", "released"]
+    assert 400 <= slider.value() <= 600
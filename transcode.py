@@ -0,0 +1,143 @@
+"""Convertit les fichiers audio d'un dossier vers un autre format, en parallèle.
+
+Un processus FFmpeg par cœur (chacun limité à un thread) ; la progression est
+affichée fichier par fichier et un fichier d'état permet de reprendre une
+conversion interrompue sans refaire les fichiers déjà convertis.
+
+    python transcode.py ~/Musique --to opus --bitrate 128k
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from library import AUDIO_EXTENSIONS
+from playlist_store import atomic_write
+
+# Format cible : (encodeur FFmpeg, format de conteneur pour -f)
+CODECS = {
+    "mp3": ("libmp3lame", "mp3"),
+    "m4a": ("aac", "ipod"),
+    "opus": ("libopus", "opus"),
+    "flac": ("flac", "flac"),
+}
+STATE_FILE = ".transcode_state.json"
+
+
+def load_state(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"Fichier d'état illisible, conversion complète : {path}")
+        return {}
+
+
+def plan(folder, output, target, state):
+    """Liste des (source, destination) à convertir ; ignore ce que l'état marque comme fait."""
+    todo = []
+    skipped = 0
+    with os.scandir(folder) as it:
+        entries = sorted((e for e in it if e.is_file() and e.name.lower().endswith(AUDIO_EXTENSIONS)),
+                         key=lambda e: e.name)
+    for entry in entries:
+        stem, ext = os.path.splitext(entry.name)
+        if ext.lower() == "." + target:
+            continue
+        destination = os.path.join(output, stem + "." + target)
+        st = entry.stat()
+        done = state.get(entry.name)
+        if done == [st.st_size, st.st_mtime_ns, os.path.basename(destination)] and os.path.exists(destination):
+            skipped += 1
+            continue
+        todo.append((entry.path, destination))
+    return todo, skipped
+
+
+def transcode(source, destination, target, bitrate):
+    """Convertit un fichier (exécuté par un thread du pool, qui attend son processus FFmpeg)."""
+    codec, container = CODECS[target]
+    partial = destination + ".part"
+    command = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+               "-i", source, "-vn", "-map_metadata", "0", "-threads", "1", "-c:a", codec]
+    if codec != "flac":
+        command += ["-b:a", bitrate]
+    command += ["-f", container, partial]
+
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        message = result.stderr.strip().splitlines()
+        raise RuntimeError(message[-1] if message else f"ffmpeg a échoué (code {result.returncode})")
+    # Renommage seulement une fois le fichier complet : jamais de sortie tronquée
+    os.replace(partial, destination)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", help="Dossier des fichiers à convertir")
+    parser.add_argument("--to", choices=sorted(CODECS), default="opus", help="Format cible")
+    parser.add_argument("--bitrate", default="160k", help="Débit cible (ignoré pour flac)")
+    parser.add_argument("--output", help="Dossier de sortie (par défaut : <dossier>/transcode-<format>)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Conversions simultanées")
+    args = parser.parse_args()
+
+    folder = os.path.abspath(args.folder)
+    output = os.path.abspath(args.output or os.path.join(folder, f"transcode-{args.to}"))
+    os.makedirs(output, exist_ok=True)
+    state_path = os.path.join(output, STATE_FILE)
+    state = load_state(state_path)
+
+    todo, skipped = plan(folder, output, args.to, state)
+    if skipped:
+        print(f"{skipped} fichiers déjà convertis (reprise)")
+    if not todo:
+        print("Rien à convertir.")
+        return 0
+
+    total = len(todo)
+    failures = 0
+    start = time.perf_counter()
+    print(f"{total} fichiers à convertir en {args.to} avec {args.jobs} processus FFmpeg")
+    with ThreadPoolExecutor(max(1, args.jobs)) as pool:
+        futures = {pool.submit(transcode, source, destination, args.to, args.bitrate): (source, destination)
+                   for source, destination in todo}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                source, destination = futures[future]
+                name = os.path.basename(source)
+                try:
+                    seconds = future.result()
+                except (OSError, RuntimeError) as e:
+                    failures += 1
+                    print(f"[{done}/{total}] ÉCHEC {name} : {e}")
+                    continue
+                st = os.stat(source)
+                state[name] = [st.st_size, st.st_mtime_ns, os.path.basename(destination)]
+                atomic_write(state_path, json.dumps(state, ensure_ascii=False).encode("utf-8"))
+
+                elapsed = time.perf_counter() - start
+                remaining = elapsed / done * (total - done)
+                print(f"[{done}/{total}] {name} ({seconds:.1f} s) — reste environ {remaining:.0f} s")
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            print("Interrompu : relancer la même commande pour reprendre.")
+            return 130
+
+    print(f"Terminé en {time.perf_counter() - start:.1f} s, {failures} échec(s).")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import time
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# Budget d'affichage : au plus une vague de mises à jour par trame
+DEFAULT_FPS = 30
+RATE_INTERVAL_MS = 1000
+
+
+class UiUpdateScheduler(QObject):
+    """Regroupe les écritures fréquentes dans les widgets et les applique au plus `fps` fois par seconde.
+
+    Pour une même cible, seule la dernière valeur demandée pendant une trame est
+    appliquée (les précédentes sont « abandonnées ») ; une valeur identique à
+    celle déjà affichée n'est pas réécrite (« redondante »). `rates_changed`
+    publie chaque seconde les nombres de mises à jour appliquées, abandonnées
+    et redondantes.
+    """
+
+    rates_changed = pyqtSignal(int, int, int)
+
+    def __init__(self, fps=DEFAULT_FPS, parent=None):
+        super().__init__(parent)
+        # Clé -> (setter, valeur, getter ou None)
+        self._pending = {}
+        self.applied = 0
+        self.dropped = 0
+        self.redundant = 0
+        self.last_rates = (0, 0, 0)
+        self._window_start = time.monotonic()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(max(1, 1000 // fps))
+        self.timer.timeout.connect(self.flush)
+
+        self.rate_timer = QTimer(self)
+        self.rate_timer.setInterval(RATE_INTERVAL_MS)
+        self.rate_timer.timeout.connect(self._publish_rates)
+
+    def post(self, key, setter, value, getter=None):
+        """Demande `setter(value)` à la prochaine trame ; ignoré si `getter()` vaut déjà `value`."""
+        if key in self._pending:
+            self.dropped += 1
+        self._pending[key] = (setter, value, getter)
+        if not self.timer.isActive():
+            self.timer.start()
+        if not self.rate_timer.isActive():
+            self._window_start = time.monotonic()
+            self.rate_timer.start()
+
+    def set_text(self, widget, text):
+        self.post(id(widget), widget.setText, text, widget.text)
+
+    def set_value(self, widget, value):
+        self.post(id(widget), widget.setValue, value, widget.value)
+
+    def cancel(self, widget):
+        """Oublie l'écriture en attente sur `widget` (elle serait plus ancienne qu'une écriture directe)."""
+        self._pending.pop(id(widget), None)
+
+    def flush(self):
+        pending = self._pending
+        self._pending = {}
+        for setter, value, getter in pending.values():
+            if getter is not None and getter() == value:
+                self.redundant += 1
+                continue
+            setter(value)
+            self.applied += 1
+
+    def _publish_rates(self):
+        elapsed = max(time.monotonic() - self._window_start, 1e-3)
+        rates = (round(self.applied / elapsed), round(self.dropped / elapsed), round(self.redundant / elapsed))
+        idle = not (self.applied or self.dropped or self.redundant)
+        self.applied = self.dropped = self.redundant = 0
+        self._window_start = time.monotonic()
+        if rates != self.last_rates:
+            self.last_rates = rates
+            self.rates_changed.emit(*rates)
+        if idle and not self._pending:
+            # Rien à compter : le minuteur s'arrête jusqu'à la prochaine demande
+            self.rate_timer.stop()
@@ -0,0 +1,78 @@
+import time
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+DEFAULT_DEBOUNCE_MS = 400
+# Pendant une longue copie, on publie quand même un lot au moins toutes les N ms
+MAX_BATCH_DELAY_MS = 2000
+
+
+class LibraryWatcher(QObject):
+    """Surveille les racines de la bibliothèque et publie les changements par lots (ajouts, suppressions, renommages, réécritures).
+
+    Chaque dossier indexé est surveillé ; seuls les dossiers signalés depuis le
+    dernier lot sont relus (et les sous-dossiers qui y sont apparus), pas toute leur
+    racine. Les noms publiés sont ceux de `roots`.
+    """
+
+    changes_ready = pyqtSignal(list, list, list, list)
+
+    def __init__(self, library, roots, debounce_ms=DEFAULT_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self.library = library
+        self.roots = roots
+        self.debounce_ms = debounce_ms
+        self._first_event = None
+        # {racine: dossiers signalés}
+        self._pending = {}
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+        for root in roots.paths():
+            self.watch_root(root)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def watch_root(self, root):
+        """Surveille `root` et ses sous-dossiers indexés (racine ajoutée en cours de route)."""
+        self._watch(self.library.directories(root) or [root])
+
+    def _watch(self, directories):
+        watched = set(self.watcher.directories())
+        missing = [path for path in directories if path not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def _on_directory_changed(self, path):
+        root = self.roots.root_of(path)
+        if root is None:
+            return
+        self._pending.setdefault(root, set()).add(path)
+        now = time.monotonic()
+        if self._first_event is None:
+            self._first_event = now
+        # Chaque événement repousse la publication, sauf si le lot attend déjà depuis trop longtemps
+        if (now - self._first_event) * 1000 < MAX_BATCH_DELAY_MS:
+            self.timer.start(self.debounce_ms)
+        elif not self.timer.isActive():
+            self.timer.start(0)
+
+    def flush(self):
+        self._first_event = None
+        pending, self._pending = self._pending, {}
+        try:
+            changes = self.library.refresh_dirs({root: sorted(dirs) for root, dirs in pending.items()})
+        except OSError:
+            return
+        added, removed, renamed, rewritten = [], [], [], []
+        for root, (root_added, root_removed, root_renamed, root_rewritten) in changes.items():
+            label = self.roots.label_of(root)
+            added += [self.roots.name_of(label, name) for name in root_added]
+            removed += [self.roots.name_of(label, name) for name in root_removed]
+            renamed += [(self.roots.name_of(label, old), self.roots.name_of(label, new)) for old, new in root_renamed]
+            rewritten += [self.roots.name_of(label, name) for name in root_rewritten]
+            # Nouveaux sous-dossiers : surveillés dès maintenant
+            self._watch(self.library.directories(root))
+        if added or removed or renamed or rewritten:
+            self.changes_ready.emit(added, removed, renamed, rewritten)
@@ -0,0 +1,101 @@
+import os
+import hashlib
+import subprocess
+
+try:
+    import numpy as np
+except ImportError:
+    # Sans NumPy pas d'aperçu : la barre de progression reste une barre simple
+    np = None
+
+AVAILABLE = np is not None
+
+# Dossier du cache des aperçus (un petit fichier binaire par piste et par mtime)
+WAVEFORM_CACHE_DIR = "waveforms"
+# Nombre de couples (min, max) par piste, quelle que soit sa durée
+PEAK_COUNT = 1000
+# Une fréquence basse suffit pour l'enveloppe et divise le coût du décodage
+SAMPLE_RATE = 8000
+# En-tête : signature + nombre de couples (uint32 petit-boutiste)
+MAGIC = b"WFP1"
+HEADER_SIZE = 8
+
+
+def cache_file(cache_dir, path, mtime):
+    """Fichier de cache d'une piste : change avec le mtime, donc jamais réécrit."""
+    digest = hashlib.sha1(f"{os.path.abspath(path)}\0{mtime}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest + ".peaks")
+
+
+def _decode(path):
+    """Décode le fichier en mono float32 à basse fréquence."""
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-vn",
+               "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or "décodage impossible")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def compute_peaks(samples, count=PEAK_COUNT):
+    """Réduit le signal à `count` couples (min, max) en int8, sans boucle Python."""
+    peaks = np.zeros((count, 2), dtype=np.int8)
+    if not len(samples):
+        return peaks
+    # Complété par des zéros jusqu'à un multiple de `count`, puis une ligne par couple
+    per_bucket = -(-len(samples) // count)
+    padded = np.zeros(per_bucket * count, dtype=np.float32)
+    padded[:len(samples)] = samples
+    buckets = padded.reshape(count, per_bucket)
+    peaks[:, 0] = np.clip(buckets.min(axis=1) * 127, -127, 127)
+    peaks[:, 1] = np.clip(buckets.max(axis=1) * 127, -127, 127)
+    return peaks
+
+
+def generate(path, cache_dir=WAVEFORM_CACHE_DIR):
+    """Calcule et écrit l'aperçu d'un fichier (exécuté dans un processus du pool) ; retourne le fichier de cache."""
+    mtime = os.stat(path).st_mtime_ns
+    target = cache_file(cache_dir, path, mtime)
+    if os.path.exists(target):
+        return target
+    peaks = compute_peaks(_decode(path))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp = target + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(MAGIC + len(peaks).to_bytes(4, "little"))
+        f.write(peaks.tobytes())
+    os.replace(temp, target)
+    return target
+
+
+class WaveformCache:
+    """Aperçus déjà calculés, ouverts en mémoire projetée : rien n'est lu avant l'affichage."""
+
+    def __init__(self, cache_dir=WAVEFORM_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path_for(self, path):
+        try:
+            return cache_file(self.cache_dir, path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+
+    def has(self, path):
+        target = self.path_for(path)
+        return target is not None and os.path.exists(target)
+
+    def load(self, path):
+        """Tableau (PEAK_COUNT × 2) int8 projeté depuis le cache, ou None s'il n'est pas encore calculé."""
+        target = self.path_for(path)
+        if target is None:
+            return None
+        try:
+            with open(target, "rb") as f:
+                header = f.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+                return None
+            count = int.from_bytes(header[4:], "little")
+            return np.memmap(target, dtype=np.int8, mode="r", offset=HEADER_SIZE, shape=(count, 2))
+        except (OSError, ValueError):
+            return None
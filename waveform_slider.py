@@ -0,0 +1,101 @@
+from PyQt6.QtWidgets import QSlider, QStyle, QStyleOptionSlider
+from PyQt6.QtCore import Qt, QLineF
+from PyQt6.QtGui import QPainter, QPen, QColor
+
+try:
+    import numpy as np
+except ImportError:
+    # Les pics ne viennent que du cache NumPy : sans lui, `set_peaks` n'est jamais appelé
+    np = None
+
+
+class WaveformSlider(QSlider):
+    """Barre de progression horizontale qui dessine l'aperçu (min, max) de la piste.
+
+    Sans aperçu elle se dessine comme un QSlider ordinaire. Un clic place
+    directement la position sous le curseur puis suit le glissement, ce qui
+    garde `sliderPressed` / `sliderMoved` / `sliderReleased`.
+    """
+
+    def __init__(self, played_color, remaining_color, parent=None):
+        super().__init__(Qt.Orientation.Horizontal, parent)
+        self.played_color = QColor(played_color)
+        self.remaining_color = QColor(remaining_color)
+        self.setMinimumHeight(48)
+        self._peaks = None
+        # Lignes par colonne de pixels, recalculées seulement si les pics ou la largeur changent
+        self._lines = None
+
+    def set_peaks(self, peaks):
+        self._peaks = peaks
+        self._lines = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self._lines = None
+        super().resizeEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self.maximum() > self.minimum():
+            value = QStyle.sliderValueFromPosition(self.minimum(), self.maximum(),
+                                                   int(event.position().x()), self.width())
+            self.setSliderPosition(value)
+            # setSliderDown émet lui-même sliderPressed
+            self.setSliderDown(True)
+            event.accept()
+            return
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self.isSliderDown():
+            value = QStyle.sliderValueFromPosition(self.minimum(), self.maximum(),
+                                                   int(event.position().x()), self.width())
+            self.setSliderPosition(value)
+            event.accept()
+            return
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self.isSliderDown() and event.button() == Qt.MouseButton.LeftButton:
+            # setSliderDown émet lui-même sliderReleased
+            self.setSliderDown(False)
+            event.accept()
+            return
+        super().mouseReleaseEvent(event)
+
+    def paintEvent(self, event):
+        if self._peaks is None or not len(self._peaks):
+            super().paintEvent(event)
+            return
+        if self._lines is None:
+            self._lines = self._build_lines()
+
+        range_size = self.maximum() - self.minimum()
+        ratio = (self.sliderPosition() - self.minimum()) / range_size if range_size > 0 else 0.0
+        split = int(ratio * len(self._lines))
+
+        painter = QPainter(self)
+        painter.setPen(QPen(self.played_color, 1))
+        painter.drawLines(self._lines[:split])
+        painter.setPen(QPen(self.remaining_color, 1))
+        painter.drawLines(self._lines[split:])
+        painter.setPen(QPen(self.played_color, 2))
+        painter.drawLine(split, 0, split, self.height())
+
+        if self.hasFocus():
+            option = QStyleOptionSlider()
+            self.initStyleOption(option)
+            self.style().drawPrimitive(QStyle.PrimitiveElement.PE_FrameFocusRect, option, painter, self)
+        painter.end()
+
+    def _build_lines(self):
+        """Un segment vertical par colonne : min et max des pics qu'elle couvre."""
+        width = max(1, self.width())
+        middle = self.height() / 2
+        scale = (self.height() / 2 - 1) / 127
+        starts = np.linspace(0, len(self._peaks), width + 1).astype(np.intp)[:-1]
+        starts = np.minimum(starts, len(self._peaks) - 1)
+        lows = np.minimum.reduceat(self._peaks[:, 0], starts)
+        highs = np.maximum.reduceat(self._peaks[:, 1], starts)
+        return [QLineF(x + 0.5, middle - max(high, 1) * scale, x + 0.5, middle - min(low, -1) * scale)
+                for x, (low, high) in enumerate(zip(lows.tolist(), highs.tolist()))]